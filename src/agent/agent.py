@@ -4,12 +4,14 @@ Agente Conversacional - Bubbabags Marketing MVP
 Usa OpenAI directamente con function calling.
 """
 import json
+import pandas as pd
 from openai import OpenAI
 
 from src.config import settings
+
+from src.data.cube import get_rollup_cube
 from src.data.views import (
-    get_channel_summary,
-    get_campaign_performance_daily,
+    get_channel_kpis_daily,
     get_campaign_performance_monthly
 )
 from src.modeling.predict import (
@@ -30,18 +32,18 @@ client = OpenAI(api_key=settings.openai_api_key)
 def get_channel_comparison() -> str:
     """Obtiene resumen comparativo de Google Ads vs Meta Ads."""
     try:
-        df = get_channel_summary()
+        df = get_rollup_cube().slice(group_by=["channel"])
         result = []
         for _, row in df.iterrows():
             result.append({
                 "canal": row["channel"],
-                "campanas": int(row["total_campaigns"]),
-                "impresiones": int(row["total_impressions"]),
-                "clicks": int(row["total_clicks"]),
-                "costo_total": round(row["total_cost"], 2),
-                "revenue_total": round(row["total_revenue"], 2),
-                "ctr_promedio": round(row["avg_ctr"] * 100, 2),
-                "roas_promedio": round(row["avg_roas"], 2)
+                "campanas": int(row["campaigns"]),
+                "impresiones": int(row["impressions"]),
+                "clicks": int(row["clicks"]),
+                "costo_total": round(row["cost"], 2),
+                "revenue_total": round(row["revenue"], 2),
+                "ctr_promedio": round(row["ctr"] * 100, 2),
+                "roas_promedio": round(row["roas"], 2)
             })
         return json.dumps(result, ensure_ascii=False, indent=2)
     except Exception as e:
@@ -124,29 +126,19 @@ def get_predictions_info() -> str:
 def get_kpi_evolution() -> str:
     """Obtiene evolución de KPIs por día y canal."""
     try:
-        df = get_campaign_performance_daily()
+        # Agregado en la query: ~dias x canales filas
+        daily = get_channel_kpis_daily(days=14)
 
-        if df.empty:
+        if daily.empty:
             return json.dumps({"mensaje": "No hay datos disponibles"})
 
-        daily = df.groupby(["date", "channel"]).agg({
-            "impressions": "sum",
-            "clicks": "sum",
-            "cost": "sum",
-            "revenue": "sum"
-        }).reset_index()
-
-        daily["ctr"] = (daily["clicks"] / daily["impressions"] * 100).round(2)
-        daily["roas"] = (daily["revenue"] / daily["cost"]).round(2)
-        daily = daily.sort_values("date", ascending=False).head(14)
-
         result = []
         for _, row in daily.iterrows():
             result.append({
                 "fecha": str(row["date"])[:10],
                 "canal": row["channel"],
-                "ctr": float(row["ctr"]) if row["ctr"] else 0,
-                "roas": float(row["roas"]) if row["roas"] else 0,
+                "ctr": round(float(row["ctr"]) * 100, 2) if pd.notna(row["ctr"]) else 0,
+                "roas": round(float(row["roas"]), 2) if pd.notna(row["roas"]) else 0,
                 "costo": round(row["cost"], 2)
             })
 
@@ -1,12 +1,19 @@
 """
 API Simple para integración con n8n
 """
+import asyncio
 import logging
+import pandas as pd
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
-from src.data.views import get_channel_summary
+from src.data.bigquery_client import bq_breaker, run_in_query_executor
+from src.data.cube import get_rollup_cube
+from src.data.query_stats import get_query_stats
+from src.data.resilience import collect_staleness, staleness_marker
+from src.data.views import get_channel_summary_async, get_campaign_performance_monthly_async
 from src.modeling.predict import get_top_campaigns_by_predicted_roas, get_prediction_summary
 
 # Configurar logging
@@ -40,30 +47,34 @@ def root():
 
 @app.get("/api/health")
 def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "bigquery_circuit": bq_breaker.snapshot()}
 
 
 @app.get("/api/channel-summary")
-def channel_summary():
+async def channel_summary():
     """Resumen de rendimiento por canal."""
     try:
-        df = get_channel_summary()
+        with collect_staleness() as stale_reads:
+            df = await get_channel_summary_async()
         return {
             "status": "success",
-            "data": df.to_dict(orient="records")
+            "data": _records(df),
+            **staleness_marker(stale_reads)
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
 @app.get("/api/top-campaigns")
-def top_campaigns(limit: int = 5):
+async def top_campaigns(limit: int = 5):
     """Top campañas por ROAS."""
     try:
-        df = get_top_campaigns_by_predicted_roas(top_n=limit)
+        with collect_staleness() as stale_reads:
+            df = await run_in_query_executor(get_top_campaigns_by_predicted_roas, top_n=limit)
         return {
             "status": "success",
-            "data": df.to_dict(orient="records")
+            "data": _records(df),
+            **staleness_marker(stale_reads)
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -82,6 +93,83 @@ def prediction_summary():
         return {"status": "error", "message": str(e)}
 
 
+def _records(df: pd.DataFrame) -> list[dict]:
+    """Filas como dicts con NaN/NaT -> None (NaN no es JSON valido)."""
+    return df.astype(object).where(pd.notna(df), None).to_dict(orient="records")
+
+
+@app.get("/api/dashboard")
+async def dashboard(limit: int = 5):
+    """Resumen por canal, rendimiento mensual y top campañas (queries en paralelo)."""
+    try:
+        with collect_staleness() as stale_reads:
+            channels_df, monthly_df, top_df = await asyncio.gather(
+                get_channel_summary_async(),
+                get_campaign_performance_monthly_async(),
+                run_in_query_executor(get_top_campaigns_by_predicted_roas, top_n=limit),
+            )
+        return {
+            "status": "success",
+            "data": {
+                "channel_summary": _records(channels_df),
+                "monthly_performance": _records(monthly_df),
+                "top_campaigns": _records(top_df),
+            },
+            **staleness_marker(stale_reads)
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@app.get("/api/query-stats")
+def query_stats(recent: int = 50):
+    """Bytes escaneados, slot time y latencia por vista (mas caras primero)."""
+    return {
+        "status": "success",
+        "data": get_query_stats(recent)
+    }
+
+
+@app.get("/api/cube")
+async def cube_slice(
+    group_by: str = "channel",
+    channel: str = None,
+    campaign_id: str = None,
+    device: str = None,
+    start_date: str = None,
+    end_date: str = None
+):
+    """
+    Consulta el cubo de rollup local (sin BigQuery).
+    Ej: /api/cube?group_by=month,channel&start_date=2024-01-01
+    Los filtros aceptan varios valores separados por coma.
+    """
+    def split(value):
+        return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+    try:
+        with collect_staleness() as stale_reads:
+            cube = await run_in_query_executor(get_rollup_cube)
+        df = cube.slice(
+            channel=split(channel),
+            campaign_id=split(campaign_id),
+            device=split(device),
+            date_range=(start_date, end_date),
+            group_by=split(group_by),
+        )
+        if "date" in df.columns:
+            df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+        return {
+            "status": "success",
+            "data": _records(df),
+            **staleness_marker(stale_reads)
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
 @app.post("/api/ask")
 async def ask_question(request: QuestionRequest):
     """
@@ -102,8 +190,8 @@ async def ask_question(request: QuestionRequest):
         # Importar el agente
         from src.agent.agent import run_agent
         
-        # Ejecutar el agente con la pregunta
-        response = run_agent(question)
+        # Ejecutar el agente (BigQuery + OpenAI bloqueantes) fuera del event loop
+        response = await run_in_threadpool(run_agent, question)
         
         logger.info(f"Respuesta generada: {response[:100]}...")
         
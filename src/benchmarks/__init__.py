@@ -0,0 +1 @@
+﻿"""Bubbabags MVP - Marketing Intelligence Agent"""
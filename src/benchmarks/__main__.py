@@ -0,0 +1,64 @@
+"""CLI de la suite de benchmarks: python -m src.benchmarks --help"""
+import argparse
+import json
+import sys
+
+from src.benchmarks.suite import (
+    PRESETS,
+    compare_reports,
+    load_baseline,
+    print_comparison,
+    run_suite,
+    save_baseline,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks end-to-end sobre datos sinteticos")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--campaigns", type=int, help="Sobrescribe las campanas del preset")
+    parser.add_argument("--days", type=int, help="Sobrescribe los dias del preset")
+    parser.add_argument("--lookback", type=int, default=90)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="Directorio de trabajo (por defecto uno temporal)")
+    parser.add_argument("--output", help="Guardar el reporte JSON en esta ruta")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar como baseline del preset")
+    parser.add_argument("--compare", action="store_true", help="Comparar con la baseline del preset")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    campaigns, days = PRESETS[args.preset]
+    campaigns = args.campaigns or campaigns
+    days = args.days or days
+    # Con tamanos no estandar la baseline lleva su propio nombre
+    name = args.preset if (campaigns, days) == PRESETS[args.preset] else f"c{campaigns}_d{days}"
+
+    report = run_suite(campaigns, days, args.lookback, args.repeats, args.seed, args.workdir)
+    report["name"] = name
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\nReporte: {args.output}")
+
+    exit_code = 0
+    if args.compare:
+        baseline = load_baseline(name)
+        if baseline is None:
+            print(f"\nNo hay baseline para '{name}' (usar --save-baseline)")
+        else:
+            changes = compare_reports(report, baseline, args.tolerance)
+            print_comparison(changes)
+            regressions = [c for c in changes if c["regression"]]
+            if regressions:
+                print(f"\n{len(regressions)} regresiones (> {args.tolerance:.0%})")
+                exit_code = 1
+
+    if args.save_baseline:
+        print(f"\nBaseline guardada: {save_baseline(report, name)}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,384 @@
+"""
+Suite de benchmarks end-to-end sobre datos sinteticos.
+
+Genera las tablas fuente con `src.data.synthetic`, apunta el backend local
+DuckDB a esos snapshots y ejecuta el pipeline completo en un directorio de
+trabajo aislado (sin cache de queries, feature store ni modelos compartidos):
+
+    generate -> daily_facts -> views -> cube -> features -> train -> predict -> agent_tools
+
+Por etapa se reporta tiempo, throughput (filas/s), latencia p50/p95 de las
+llamadas repetidas y pico de RSS (muestreado en segundo plano). Los resultados
+se guardan como baseline por preset y las corridas siguientes se comparan
+contra ella:
+
+    python -m src.benchmarks --preset small --save-baseline
+    python -m src.benchmarks --preset small --compare
+"""
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+# (campanas, dias de historial)
+PRESETS = {
+    "tiny": (10, 90),
+    "small": (100, 180),
+    "medium": (1_000, 365),
+    "large": (10_000, 730),
+    "xlarge": (100_000, 1095),
+}
+
+# Metricas comparadas contra la baseline: True = mayor es mejor
+COMPARED_METRICS = {
+    "seconds": False,
+    "p50_ms": False,
+    "p95_ms": False,
+    "rows_per_second": True,
+    "peak_rss_mb": False,
+}
+
+
+# =============================================================================
+# MEDICION
+# =============================================================================
+def _current_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        return None
+
+
+def _max_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+class RssSampler:
+    """Pico de RSS de una etapa, muestreado en un hilo cada `interval` segundos."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self) -> "RssSampler":
+        current = _current_rss_mb()
+        if current is None:
+            return self
+        self.peak = current
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss_mb() or 0.0)
+
+    def __exit__(self, *exc) -> None:
+        if self._thread is None:
+            # Sin /proc: pico del proceso completo (monotono)
+            self.peak = _max_rss_mb()
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss_mb() or 0.0)
+
+
+def _throughput(rows: int, latencies: dict) -> float:
+    """Filas/s de una llamada tipica (p50)."""
+    return round(rows / max(latencies["p50_ms"] / 1000, 1e-9), 1)
+
+
+def _latencies(func: Callable, repeats: int) -> dict:
+    """p50/p95/max en ms de `repeats` llamadas."""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50_ms": round(float(np.percentile(times, 50)), 3),
+        "p95_ms": round(float(np.percentile(times, 95)), 3),
+        "max_ms": round(max(times), 3),
+    }
+
+
+class BenchmarkRun:
+    """Acumula los resultados de las etapas de una corrida."""
+
+    def __init__(self):
+        self.stages: dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mide tiempo y pico de RSS; la etapa agrega sus metricas al dict entregado."""
+        metrics: dict = {}
+        print(f"  {name:12} ...", end="", flush=True)
+        started = time.perf_counter()
+        with RssSampler() as sampler, redirect_stdout(StringIO()):
+            yield metrics
+        seconds = time.perf_counter() - started
+        metrics["seconds"] = round(seconds, 4)
+        metrics["peak_rss_mb"] = round(sampler.peak, 1)
+        if metrics.get("rows") and "rows_per_second" not in metrics:
+            metrics["rows_per_second"] = round(metrics["rows"] / max(seconds, 1e-9), 1)
+        self.stages[name] = metrics
+        rate = f" | {metrics['rows_per_second']:>12,.0f} filas/s" if "rows_per_second" in metrics else ""
+        print(f" {seconds:8.2f}s | RSS {sampler.peak:8.1f} MB{rate}")
+
+
+# =============================================================================
+# ENTORNO AISLADO
+# =============================================================================
+@contextmanager
+def isolated_environment(workdir: Path):
+    """
+    Apunta settings y los directorios de modelos a `workdir` durante la corrida
+    y restaura todo al salir.
+    """
+    from src.data.duckdb_backend import reload_snapshots
+    from src.modeling import predict, train
+
+    overrides = {
+        "query_backend": "duckdb",
+        "duckdb_snapshot_dir": str(workdir / "snapshots"),
+        "duckdb_path": ":memory:",
+        "query_cache_enabled": False,
+        "data_sync_mode": "full",
+        "feature_store_dir": str(workdir / "features"),
+        "train_parallel": False,
+        "train_tuning": False,
+        "model_registry_dir": str(workdir / "models" / "registry"),
+    }
+    previous = {key: getattr(settings, key) for key in overrides}
+    previous_dirs = (train.MODEL_DIR, predict.MODEL_DIR)
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    (workdir / "models").mkdir(parents=True, exist_ok=True)
+    train.MODEL_DIR = predict.MODEL_DIR = workdir / "models"
+    predict.reset_model_cache()
+    predict.BASELINE_CACHE.clear()
+    reload_snapshots()
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            setattr(settings, key, value)
+        train.MODEL_DIR, predict.MODEL_DIR = previous_dirs
+        predict.reset_model_cache()
+        predict.BASELINE_CACHE.clear()
+        reload_snapshots()
+
+
+# =============================================================================
+# SUITE
+# =============================================================================
+def run_suite(
+    campaigns: int,
+    days: int,
+    lookback_days: int = 90,
+    repeats: int = 5,
+    seed: int = 42,
+    workdir: str = None,
+    keep_workdir: bool = False
+) -> dict:
+    """Ejecuta todas las etapas y retorna el reporte (ver BenchmarkRun)."""
+    from src.data.synthetic import generate_snapshots
+
+    root = Path(workdir) if workdir else Path(tempfile.mkdtemp(prefix="bench-"))
+    lookback_days = min(lookback_days, days)
+    run = BenchmarkRun()
+    print(f"Benchmark: {campaigns} campanas x {days} dias (lookback {lookback_days}) en {root}")
+
+    try:
+        with isolated_environment(root):
+            from src.data import views
+            from src.data.cube import get_rollup_cube
+            from src.modeling import predict
+            from src.modeling.feature_store import get_features
+            from src.modeling.train import train_all_models
+
+            with run.stage("generate") as m:
+                written = generate_snapshots(str(root / "snapshots"), campaigns, days, seed=seed)
+                m["rows"] = sum(written.values())
+                m["tables"] = written
+
+            with run.stage("daily_facts") as m:
+                facts = views.get_daily_facts()
+                m["rows"] = len(facts)
+                m.update(_latencies(views.get_daily_facts, repeats))
+                m["rows_per_second"] = _throughput(len(facts), m)
+
+            with run.stage("views") as m:
+                m["rows"] = len(facts)
+                m["channel_summary"] = _latencies(views.get_channel_summary, repeats)
+                m["monthly"] = _latencies(views.get_campaign_performance_monthly, repeats)
+                m["kpis_daily"] = _latencies(lambda: views.get_channel_kpis_daily(days=14), repeats)
+                m.update({key: max(m[v][key] for v in ["channel_summary", "monthly", "kpis_daily"])
+                          for key in ["p50_ms", "p95_ms"]})
+                m["rows_per_second"] = _throughput(len(facts), m)
+
+            with run.stage("cube") as m:
+                started = time.perf_counter()
+                cube = get_rollup_cube(force=True)
+                m["build_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                m["rows"] = len(cube)
+                m.update(_latencies(lambda: cube.slice(group_by=["month", "channel", "device"]), repeats))
+                m["rows_per_second"] = _throughput(len(cube), m)
+
+            with run.stage("features") as m:
+                features_df = get_features(lookback_days, refresh=True)
+                m["rows"] = len(features_df)
+                m["cached_load"] = _latencies(lambda: get_features(lookback_days), repeats)
+
+            with run.stage("train") as m:
+                results = train_all_models(lookback_days)
+                m["rows"] = len(features_df)
+                m["models"] = {
+                    channel: {
+                        "status": result["status"],
+                        "best_model": result.get("best_model", {}).get("name"),
+                        "rmse": result.get("best_model", {}).get("metrics", {}).get("rmse"),
+                    }
+                    for channel, result in results["models"].items()
+                }
+
+            with run.stage("predict") as m:
+                # Solo canales con modelo guardado (con baseline no hay prediccion por lote)
+                rows, started = 0, time.perf_counter()
+                for channel in ["google_ads", "meta_ads"]:
+                    batch = features_df[features_df["channel"] == channel]
+                    if predict.predict_roas_batch(batch, channel) is not None:
+                        rows += len(batch)
+                m["rows"] = rows
+                if rows:
+                    m["rows_per_second"] = round(rows / (time.perf_counter() - started), 1)
+                sample = features_df.iloc[0]
+                m.update(_latencies(lambda: predict.predict_roas(
+                    str(sample["campaign_id"]), str(sample["channel"]),
+                    int(sample["impressions"]), int(sample["clicks"]), float(sample["cost"])
+                ), repeats * 10))
+                m["top_campaigns"] = _latencies(lambda: predict.get_top_campaigns_by_predicted_roas(top_n=10), repeats)
+
+            try:
+                from src.agent import agent
+            except Exception as e:
+                # El modulo del agente crea el cliente OpenAI al importarse
+                logger.warning(f"Tools del agente omitidas: {e}")
+                agent = None
+            if agent is not None:
+                with run.stage("agent_tools") as m:
+                    tools = {
+                        "get_channel_comparison": agent.get_channel_comparison,
+                        "get_top_campaigns": agent.get_top_campaigns,
+                        "get_monthly_performance": agent.get_monthly_performance,
+                        "get_predictions_info": agent.get_predictions_info,
+                        "get_kpi_evolution": agent.get_kpi_evolution,
+                    }
+                    m["tools"] = {name: _latencies(tool, repeats) for name, tool in tools.items()}
+                    m.update({key: max(t[key] for t in m["tools"].values()) for key in ["p50_ms", "p95_ms"]})
+    finally:
+        if not keep_workdir and not workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "params": {"campaigns": campaigns, "days": days, "lookback_days": lookback_days, "repeats": repeats, "seed": seed},
+        "environment": _environment(),
+        "stages": run.stages,
+    }
+
+
+def _environment() -> dict:
+    import duckdb
+    import pandas as pd
+    import xgboost as xgb
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "xgboost": xgb.__version__,
+        "duckdb": duckdb.__version__,
+    }
+
+
+# =============================================================================
+# BASELINES
+# =============================================================================
+def baseline_path(name: str) -> Path:
+    return BASELINE_DIR / f"{name}.json"
+
+
+def save_baseline(report: dict, name: str) -> Path:
+    path = baseline_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    return path
+
+
+def load_baseline(name: str) -> Optional[dict]:
+    path = baseline_path(name)
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_reports(report: dict, baseline: dict, tolerance: float = 0.2) -> list[dict]:
+    """
+    Cambios por etapa y metrica frente a la baseline. `regression` marca los
+    empeoramientos mayores a `tolerance` (0.2 = 20%).
+    """
+    changes = []
+    for stage, metrics in report["stages"].items():
+        base_metrics = baseline.get("stages", {}).get(stage)
+        if not base_metrics:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            current, base = metrics.get(metric), base_metrics.get(metric)
+            if current is None or not base:
+                continue
+            change = (current - base) / base
+            worse = -change if higher_is_better else change
+            changes.append({
+                "stage": stage,
+                "metric": metric,
+                "baseline": base,
+                "current": current,
+                "change": round(change, 4),
+                "regression": worse > tolerance,
+            })
+    return changes
+
+
+def print_comparison(changes: list[dict]) -> None:
+    print(f"\n{'ETAPA':12} {'METRICA':16} {'BASELINE':>14} {'ACTUAL':>14} {'CAMBIO':>9}")
+    for c in changes:
+        flag = "  ⚠️ REGRESION" if c["regression"] else ""
+        print(f"{c['stage']:12} {c['metric']:16} {c['baseline']:>14,.2f} {c['current']:>14,.2f} {c['change']:>+8.1%}{flag}")
@@ -10,6 +10,41 @@ class Settings(BaseSettings):
     bq_dataset: str = Field(default="production_bubbabags", alias="BQ_DATASET")
     google_credentials: str | None = Field(default=None, alias="GOOGLE_APPLICATION_CREDENTIALS")
     
+    # Backend de ejecucion de las vistas: "bigquery" o "duckdb" (snapshots Parquet locales)
+    query_backend: str = Field(default="bigquery", alias="QUERY_BACKEND")
+    duckdb_snapshot_dir: str = Field(default="data/snapshots", alias="DUCKDB_SNAPSHOT_DIR")
+    duckdb_path: str = Field(default=":memory:", alias="DUCKDB_PATH")
+    
+    # Descarga de resultados: "arrow" (Storage Read API) o "pandas". Los dtypes
+    # compactos son opt-in por llamada: execute_query(..., compact=True)
+    bq_fetch_mode: str = Field(default="arrow", alias="BQ_FETCH_MODE")
+    bq_float32_metrics: bool = Field(default=False, alias="BQ_FLOAT32_METRICS")
+    # Filas por chunk en las lecturas en streaming (execute_query_iter)
+    query_chunk_size: int = Field(default=50000, alias="QUERY_CHUNK_SIZE")
+    # Maximo de queries concurrentes desde la API async (tamano del executor)
+    bq_max_concurrency: int = Field(default=8, alias="BQ_MAX_CONCURRENCY")
+    
+    # Deadline por query (0 = sin limite), antiguedad maxima de un resultado
+    # servido como stale y circuit breaker de BigQuery
+    query_timeout_seconds: float = Field(default=20, alias="QUERY_TIMEOUT_SECONDS")
+    query_stale_max_seconds: int = Field(default=86400, alias="QUERY_STALE_MAX_SECONDS")
+    bq_breaker_failure_threshold: int = Field(default=5, alias="BQ_BREAKER_FAILURE_THRESHOLD")
+    bq_breaker_reset_seconds: int = Field(default=60, alias="BQ_BREAKER_RESET_SECONDS")
+
+    # Cache de resultados de queries (Parquet en disco, compartido entre procesos)
+    query_cache_enabled: bool = Field(default=True, alias="QUERY_CACHE_ENABLED")
+    query_cache_dir: str = Field(default=".cache/queries", alias="QUERY_CACHE_DIR")
+    query_cache_ttl_seconds: int = Field(default=300, alias="QUERY_CACHE_TTL_SECONDS")
+    query_cache_max_mb: int = Field(default=512, alias="QUERY_CACHE_MAX_MB")
+    
+    # Sincronizacion incremental de datos ("full" = rescan completo, "incremental" = watermark)
+    data_sync_mode: str = Field(default="full", alias="DATA_SYNC_MODE")
+    sync_store_dir: str = Field(default=".cache/store", alias="SYNC_STORE_DIR")
+    sync_restatement_days: int = Field(default=7, alias="SYNC_RESTATEMENT_DAYS")
+    sync_min_interval_seconds: int = Field(default=300, alias="SYNC_MIN_INTERVAL_SECONDS")
+    # Cubo de rollup en memoria (src/data/cube.py): segundos entre reconstrucciones
+    rollup_cube_ttl_seconds: int = Field(default=300, alias="ROLLUP_CUBE_TTL_SECONDS")
+    
     # OpenAI
     openai_api_key: str = Field(default="", alias="OPENAI_API_KEY")
     openai_model: str = Field(default="gpt-4", alias="OPENAI_MODEL")
@@ -23,6 +58,44 @@ class Settings(BaseSettings):
     # Streamlit
     streamlit_port: int = Field(default=8501, alias="STREAMLIT_PORT")
     
+    # Feature store versionado (datasets de entrenamiento en Parquet + .npy)
+    feature_store_enabled: bool = Field(default=True, alias="FEATURE_STORE_ENABLED")
+    feature_store_dir: str = Field(default=".cache/features", alias="FEATURE_STORE_DIR")
+
+    # Entrenamiento paralelo: canal x modelo candidato en un pool de procesos
+    train_parallel: bool = Field(default=False, alias="TRAIN_PARALLEL")
+    train_workers: int = Field(default=0, alias="TRAIN_WORKERS")  # 0 = os.cpu_count()
+
+    # Busqueda de hiperparametros con CV temporal (rolling-origin)
+    train_tuning: bool = Field(default=False, alias="TRAIN_TUNING")
+    tuning_trials: int = Field(default=30, alias="TUNING_TRIALS")
+    tuning_folds: int = Field(default=4, alias="TUNING_FOLDS")
+    tuning_workers: int = Field(default=0, alias="TUNING_WORKERS")  # 0 = os.cpu_count()
+
+    # Actualizacion incremental (warm start) de los modelos XGBoost
+    incremental_mode: str = Field(default="continue", alias="INCREMENTAL_MODE")  # continue | refresh
+    incremental_recent_days: int = Field(default=14, alias="INCREMENTAL_RECENT_DAYS")
+    incremental_extra_rounds: int = Field(default=50, alias="INCREMENTAL_EXTRA_ROUNDS")
+    incremental_holdout_days: int = Field(default=7, alias="INCREMENTAL_HOLDOUT_DAYS")
+    incremental_max_degradation: float = Field(default=0.05, alias="INCREMENTAL_MAX_DEGRADATION")
+    incremental_max_trees: int = Field(default=1000, alias="INCREMENTAL_MAX_TREES")
+    # full: el update no debe quedar por debajo de un re-entrenamiento completo;
+    # current: solo evita regresiones frente al modelo actual (no entrena la referencia)
+    incremental_guard: str = Field(default="full", alias="INCREMENTAL_GUARD")  # full | current
+
+    # Entrenamiento out-of-core (historiales largos desde el feature store)
+    ooc_chunk_rows: int = Field(default=250_000, alias="OOC_CHUNK_ROWS")
+    feature_build_window_days: int = Field(default=30, alias="FEATURE_BUILD_WINDOW_DAYS")
+    ooc_max_bin: int = Field(default=256, alias="OOC_MAX_BIN")
+    ooc_external_memory: bool = Field(default=False, alias="OOC_EXTERNAL_MEMORY")
+    ooc_cache_dir: str = Field(default=".cache/xgb_extmem", alias="OOC_CACHE_DIR")
+
+    # Registro versionado de modelos + recarga en caliente en el serving
+    model_registry_dir: str = Field(default="models/registry", alias="MODEL_REGISTRY_DIR")
+    model_registry_keep: int = Field(default=10, alias="MODEL_REGISTRY_KEEP")
+    model_reload_interval: float = Field(default=30.0, alias="MODEL_RELOAD_INTERVAL")  # segundos, 0 = en cada prediccion
+    model_engine: str = Field(default="numpy", alias="MODEL_ENGINE")  # numpy (sin importar xgboost) | xgboost
+
     # Modelo
     model_path: str = Field(default="src/modeling/artifacts/roas_model.joblib", alias="MODEL_PATH")
     model_version: str = Field(default="1.0.0", alias="MODEL_VERSION")
@@ -1,8 +1,85 @@
 ﻿"""Cliente de BigQuery."""
+from google.api_core import exceptions as google_exceptions
 from google.cloud import bigquery
+import asyncio
+import contextvars
+import functools
+import logging
 import pandas as pd
+import pyarrow as pa
+import requests
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import date, datetime
 from functools import lru_cache
+from typing import Optional
 from src.config import settings
+from src.data.cache import QueryResultCache, make_cache_key, normalize_query
+from src.data.query_stats import QueryStats, current_view, registry, stats_from_job
+from src.data.resilience import CircuitBreaker, QueryTimeoutError, note_stale_read
+
+logger = logging.getLogger(__name__)
+
+# Columnas de texto con menos de esta proporcion de valores unicos pasan a category
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas identicas en vuelo: el primer llamador (lider)
+    ejecuta la query y los concurrentes con la misma clave esperan su resultado
+    en lugar de lanzar otro job de BigQuery.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+
+    def acquire(self, key: str) -> tuple[Future, bool]:
+        """Retorna (future, es_lider)."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def peek(self, key: str) -> Optional[Future]:
+        with self._lock:
+            return self._calls.get(key)
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+
+
+_inflight = SingleFlight()
+
+bq_breaker = CircuitBreaker(
+    "bigquery",
+    failure_threshold=settings.bq_breaker_failure_threshold,
+    reset_seconds=settings.bq_breaker_reset_seconds,
+)
+
+
+# Fallos que indican BigQuery lento o caido; el resto (SQL invalido, permisos,
+# tabla inexistente) se propaga sin contar para el circuit breaker
+BREAKER_FAILURES = (
+    TimeoutError,
+    ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    google_exceptions.ServerError,
+)
+
+
+def _record_breaker_error(e: BaseException) -> None:
+    if isinstance(e, BREAKER_FAILURES):
+        bq_breaker.record_failure()
+    else:
+        bq_breaker.record_ignored()
 
 
 @lru_cache()
@@ -10,13 +87,398 @@ def get_bigquery_client() -> bigquery.Client:
     return bigquery.Client(project=settings.gcp_project_id)
 
 
-def execute_query(query: str) -> pd.DataFrame:
+@lru_cache()
+def get_query_cache() -> Optional[QueryResultCache]:
+    """Cache en disco compartido por API, UI y agente (None si esta deshabilitado)."""
+    if not settings.query_cache_enabled:
+        return None
+    return QueryResultCache(
+        cache_dir=settings.query_cache_dir,
+        ttl_seconds=settings.query_cache_ttl_seconds,
+        max_bytes=settings.query_cache_max_mb * 1024 * 1024,
+        # BigQuery conserva las claves originales; otros backends usan su propio espacio
+        namespace="" if settings.query_backend == "bigquery" else settings.query_backend,
+    )
+
+
+def _bqstorage_available() -> bool:
+    try:
+        from google.cloud import bigquery_storage  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+@lru_cache()
+def get_bqstorage_client():
+    """
+    Cliente de la Storage Read API, con credenciales resueltas por ADC igual
+    que `bigquery.Client`. None si la libreria no esta instalada o el cliente
+    no se puede crear (se descarga por la API REST).
+    """
+    if not _bqstorage_available():
+        return None
+    try:
+        from google.cloud import bigquery_storage
+        return bigquery_storage.BigQueryReadClient()
+    except Exception as e:
+        logger.warning(f"Storage Read API no disponible, usando REST: {e}")
+        return None
+
+
+def _fetch_arrow(job: bigquery.QueryJob) -> pa.Table:
+    """
+    Descarga el resultado como tabla Arrow. Usa la BigQuery Storage Read API
+    si esta instalada y accesible; si no, cae a la API REST paginada.
+    """
+    if _bqstorage_available():
+        try:
+            return job.to_arrow(create_bqstorage_client=True)
+        except Exception as e:
+            logger.warning(f"Storage Read API no disponible, usando REST: {e}")
+    return job.to_arrow(create_bqstorage_client=False)
+
+
+def compact_dtypes(df: pd.DataFrame, float32: bool = False) -> pd.DataFrame:
+    """
+    Reduce memoria: strings repetidos -> category, enteros -> el menor int
+    que los contiene y (opcional) floats -> float32.
+    """
+    n_rows = len(df)
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if n_rows and series.nunique(dropna=True) <= n_rows * CATEGORY_MAX_UNIQUE_RATIO:
+                df[col] = series.astype("category")
+        elif pd.api.types.is_integer_dtype(series) and not pd.api.types.is_extension_array_dtype(series):
+            df[col] = pd.to_numeric(series, downcast="integer")
+        elif float32 and pd.api.types.is_float_dtype(series):
+            df[col] = series.astype("float32")
+    return df
+
+
+def _scalar_type(value) -> str:
+    if isinstance(value, bool):
+        return "BOOL"
+    if isinstance(value, int):
+        return "INT64"
+    if isinstance(value, float):
+        return "FLOAT64"
+    if isinstance(value, datetime):
+        return "TIMESTAMP"
+    if isinstance(value, date):
+        return "DATE"
+    return "STRING"
+
+
+def _build_query_parameters(params: Optional[dict]) -> list:
+    """Convierte {nombre: valor} en parametros de BigQuery (@nombre en el SQL)."""
+    query_parameters = []
+    for name, value in (params or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            values = list(value)
+            array_type = _scalar_type(values[0]) if values else "STRING"
+            query_parameters.append(bigquery.ArrayQueryParameter(name, array_type, values))
+        else:
+            query_parameters.append(bigquery.ScalarQueryParameter(name, _scalar_type(value), value))
+    return query_parameters
+
+
+def _arrow_to_dataframe(table: pa.Table, compact: bool = False) -> pd.DataFrame:
+    df = table.to_pandas(date_as_object=False, split_blocks=True, self_destruct=True)
+    return _compact(df) if compact else df
+
+
+def _compact(df: pd.DataFrame) -> pd.DataFrame:
+    return compact_dtypes(df, float32=settings.bq_float32_metrics)
+
+
+def _fetch_duckdb(query: str, params: Optional[dict] = None) -> pd.DataFrame:
+    """Ejecuta la query en el backend local DuckDB (QUERY_BACKEND=duckdb)."""
+    from src.data.duckdb_backend import execute_arrow
+    
+    started = time.perf_counter()
+    df = _arrow_to_dataframe(execute_arrow(query, params))
+    total_ms = (time.perf_counter() - started) * 1000
+    registry.record(QueryStats(view=current_view(), source="duckdb", total_ms=total_ms, rows=len(df)))
+    return df
+
+
+def _fetch_dataframe(query: str, params: Optional[dict] = None) -> pd.DataFrame:
+    if settings.query_backend == "duckdb":
+        return _fetch_duckdb(query, params)
+    
+    bq_breaker.before_call()
+    started = time.perf_counter()
+    try:
+        client = get_bigquery_client()
+        # El cache de resultados de BigQuery (24 h, gratis) solo aplica a texto
+        # identico: se envia el SQL normalizado y los valores como parametros.
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=_build_query_parameters(params),
+            use_query_cache=True,
+        )
+        job = client.query(normalize_query(query), job_config=job_config)
+        
+        if settings.bq_fetch_mode != "arrow":
+            df = job.to_dataframe()
+        else:
+            df = _arrow_to_dataframe(_fetch_arrow(job))
+    except Exception as e:
+        _record_breaker_error(e)
+        raise
+    bq_breaker.record_success()
+    
+    total_ms = (time.perf_counter() - started) * 1000
+    registry.record(stats_from_job(job, current_view(), total_ms, len(df)))
+    df.attrs["bq_cache_hit"] = bool(job.cache_hit)
+    return df
+
+
+def _record_local(source: str, started: float, rows: int) -> None:
+    """Registra una respuesta servida sin lanzar un job de BigQuery."""
+    total_ms = (time.perf_counter() - started) * 1000
+    registry.record(QueryStats(view=current_view(), source=source, total_ms=total_ms, rows=rows))
+
+
+def _serve_stale(df: pd.DataFrame, age: float, reason: str, started: float) -> pd.DataFrame:
+    """Retorna el ultimo resultado bueno marcado como stale."""
+    logger.warning(f"Sirviendo resultado stale ({age:.0f}s): {reason}")
+    _record_local("stale", started, len(df))
+    note_stale_read(age, reason)
+    df.attrs["stale"] = True
+    df.attrs["stale_age_seconds"] = round(age, 1)
+    return df
+
+
+def _run_leader(key: str, future: Future, query: str, params: Optional[dict], cache) -> None:
+    """Ejecuta la query del lider y publica el resultado a todos los que esperan."""
+    try:
+        df = _fetch_dataframe(query, params)
+        if cache is not None:
+            cache.set(query, df, params)
+        future.set_result(df)
+    except BaseException as e:
+        future.set_exception(e)
+    finally:
+        _inflight.release(key)
+
+
+@lru_cache()
+def get_refresh_executor() -> ThreadPoolExecutor:
+    """Hilos donde corren las queries con deadline; siguen refrescando el cache tras un timeout."""
+    return ThreadPoolExecutor(max_workers=settings.bq_max_concurrency, thread_name_prefix="bigquery-refresh")
+
+
+def _lookup_cache(query: str, params: Optional[dict], cache) -> tuple[Optional[pd.DataFrame], Optional[tuple]]:
+    """Retorna (resultado vigente, (resultado stale, antiguedad)); cualquiera puede ser None."""
+    if cache is None:
+        return None, None
+    entry = cache.get_entry(query, params, max_age=max(settings.query_stale_max_seconds, cache.ttl_seconds))
+    if entry is None:
+        return None, None
+    if entry[1] <= cache.ttl_seconds:
+        return entry[0], None
+    return None, entry
+
+
+def _timed_out(timeout: float, stale: Optional[tuple], started: float) -> pd.DataFrame:
+    if stale is not None:
+        return _serve_stale(stale[0], stale[1], f"timeout ({timeout}s)", started)
+    raise QueryTimeoutError(f"La query supero el deadline de {timeout}s")
+
+
+def execute_query(
+    query: str,
+    params: Optional[dict] = None,
+    use_cache: bool = True,
+    compact: bool = False
+) -> pd.DataFrame:
+    """
+    Ejecuta una query. `params` se envian como parametros enlazados
+    (@nombre en el SQL), nunca interpolados en el texto.
+    
+    Espera como maximo QUERY_TIMEOUT_SECONDS. Si la query expira o falla (o el
+    circuito de BigQuery esta abierto) y hay un resultado previo en cache, se
+    sirve ese resultado con df.attrs["stale"] = True mientras el job en curso
+    actualiza el cache en segundo plano.
+    
+    Con compact=True el resultado llega con dtypes compactos (strings ->
+    category, enteros reducidos; ver compact_dtypes). Es opt-in: solo para
+    llamadores que agregan con observed=True y ensanchan antes de sumar.
+    """
+    df = _execute_query(query, params, use_cache)
+    return _compact(df) if compact else df
+
+
+def _execute_query(query: str, params: Optional[dict], use_cache: bool) -> pd.DataFrame:
+    started = time.perf_counter()
+    cache = get_query_cache() if use_cache else None
+    fresh, stale = _lookup_cache(query, params, cache)
+    if fresh is not None:
+        _record_local("result_cache", started, len(fresh))
+        return fresh
+    
+    key = make_cache_key(query, params)
+    future, is_leader = _inflight.acquire(key)
+    timeout = settings.query_timeout_seconds or None
+    if is_leader:
+        if timeout is None:
+            _run_leader(key, future, query, params, cache)
+        else:
+            context = contextvars.copy_context()
+            get_refresh_executor().submit(context.run, _run_leader, key, future, query, params, cache)
+    
+    try:
+        df = future.result(timeout=timeout)
+    except Exception as e:
+        # FutureTimeoutError es TimeoutError: solo es el deadline si el job sigue en curso
+        if isinstance(e, FutureTimeoutError) and not future.done():
+            if is_leader and settings.query_backend == "bigquery":
+                bq_breaker.record_failure()
+            return _timed_out(timeout, stale, started)
+        if stale is not None:
+            return _serve_stale(stale[0], stale[1], f"{type(e).__name__}: {e}", started)
+        raise
+    
+    if not is_leader:
+        # Cada seguidor recibe su propia copia: las vistas modifican el frame
+        _record_local("coalesced", started, len(df))
+    return df.copy()
+
+
+def _rebatch(tables, chunk_size: int):
+    """Reagrupa tablas/batches Arrow de tamano arbitrario en chunks de chunk_size filas."""
+    pending = []
+    pending_rows = 0
+    for table in tables:
+        if isinstance(table, pa.RecordBatch):
+            table = pa.Table.from_batches([table])
+        pending.append(table)
+        pending_rows += table.num_rows
+        while pending_rows >= chunk_size:
+            merged = pa.concat_tables(pending)
+            yield merged.slice(0, chunk_size)
+            rest = merged.slice(chunk_size)
+            pending = [rest]
+            pending_rows = rest.num_rows
+    if pending_rows:
+        yield pa.concat_tables(pending)
+
+
+def _iter_bigquery_arrow(query: str, params: Optional[dict] = None, chunk_size: int = 50000):
+    bq_breaker.before_call()
+    started = time.perf_counter()
     client = get_bigquery_client()
-    return client.query(query).to_dataframe()
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=_build_query_parameters(params),
+        use_query_cache=True,
+    )
+    try:
+        job = client.query(normalize_query(query), job_config=job_config)
+        rows = job.result(page_size=chunk_size)
+    except Exception as e:
+        _record_breaker_error(e)
+        raise
+    bq_breaker.record_success()
+    
+    # Las estadisticas se registran tambien si el consumidor corta la iteracion
+    total_rows = 0
+    try:
+        for batch in rows.to_arrow_iterable(bqstorage_client=get_bqstorage_client()):
+            total_rows += batch.num_rows
+            yield batch
+    finally:
+        total_ms = (time.perf_counter() - started) * 1000
+        registry.record(stats_from_job(job, current_view(), total_ms, total_rows))
+
+
+def execute_query_iter(
+    query: str,
+    params: Optional[dict] = None,
+    chunk_size: Optional[int] = None,
+    as_arrow: bool = False,
+    compact: bool = False
+):
+    """
+    Ejecuta una query y entrega el resultado por partes de `chunk_size` filas
+    (DataFrames, compactos con compact=True, o tablas Arrow con as_arrow=True), para procesar
+    historiales largos con memoria acotada. No usa el cache de resultados.
+    Las categorias de columnas category pueden variar entre chunks.
+    """
+    chunk_size = chunk_size or settings.query_chunk_size
+    if settings.query_backend == "duckdb":
+        from src.data.duckdb_backend import iter_arrow_batches
+        source = iter_arrow_batches(query, params, chunk_size)
+    else:
+        source = _iter_bigquery_arrow(query, params, chunk_size)
+    
+    started = time.perf_counter()
+    total_rows = 0
+    try:
+        for table in _rebatch(source, chunk_size):
+            total_rows += table.num_rows
+            yield table if as_arrow else _arrow_to_dataframe(table, compact)
+    finally:
+        if settings.query_backend == "duckdb":
+            _record_local("duckdb", started, total_rows)
+
+
+@lru_cache()
+def get_query_executor() -> ThreadPoolExecutor:
+    """Executor acotado para queries bloqueantes lanzadas desde codigo async."""
+    return ThreadPoolExecutor(max_workers=settings.bq_max_concurrency, thread_name_prefix="bigquery")
+
+
+async def run_in_query_executor(func, *args, **kwargs):
+    """
+    Ejecuta una funcion bloqueante de datos sin congelar el event loop.
+    Propaga el contexto (vista etiquetada, marcador de datos stale) al hilo.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_query_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+async def execute_query_async(
+    query: str,
+    params: Optional[dict] = None,
+    use_cache: bool = True,
+    compact: bool = False
+) -> pd.DataFrame:
+    """
+    Version async de execute_query (corre en el executor acotado). Si la misma
+    query ya esta en vuelo, espera su resultado sin ocupar un hilo del executor.
+    """
+    future = _inflight.peek(make_cache_key(query, params))
+    if future is not None:
+        started = time.perf_counter()
+        timeout = settings.query_timeout_seconds or None
+        try:
+            df = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            _, stale = _lookup_cache(query, params, get_query_cache() if use_cache else None)
+            return _timed_out(timeout, stale, started)
+        except Exception as e:
+            _, stale = _lookup_cache(query, params, get_query_cache() if use_cache else None)
+            if stale is None:
+                raise
+            return _serve_stale(stale[0], stale[1], f"{type(e).__name__}: {e}", started)
+        df = df.copy()
+        return _compact(df) if compact else df
+    return await run_in_query_executor(execute_query, query, params, use_cache, compact)
+
+
+def invalidate_query_cache(query: Optional[str] = None, params: Optional[dict] = None) -> int:
+    """Invalida el resultado cacheado de una query, o todo el cache si query es None."""
+    cache = get_query_cache()
+    if cache is None:
+        return 0
+    return cache.invalidate(query, params)
 
 
-def execute_query_to_dict(query: str) -> list[dict]:
-    df = execute_query(query)
+def execute_query_to_dict(query: str, params: Optional[dict] = None) -> list[dict]:
+    df = execute_query(query, params)
     return df.to_dict(orient="records")
 
 
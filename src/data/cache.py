@@ -0,0 +1,168 @@
+"""
+Cache persistente de resultados de queries en disco (Parquet).
+
+Cada resultado se guarda como un archivo Parquet cuyo nombre es el hash del
+SQL normalizado. El directorio puede montarse como volumen compartido para que
+la API, Streamlit y el agente reutilicen los mismos resultados.
+
+- TTL: una entrada expira `ttl_seconds` despues de escribirse (sigue en disco
+  y puede servirse como stale con `get_entry`).
+- LRU: el mtime del archivo se actualiza en cada lectura; al superar
+  `max_bytes` se eliminan primero las entradas menos usadas.
+- Invalidacion explicita por query o total.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+CREATED_AT_KEY = b"query_cache_created_at"
+
+
+def normalize_query(query: str) -> str:
+    """Normaliza el SQL para que espacios y saltos de linea no cambien la clave."""
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+
+def make_cache_key(query: str, params: Optional[dict] = None, namespace: str = "") -> str:
+    """Hash SHA-256 del SQL normalizado, sus parametros y el backend (namespace)."""
+    payload = f"{namespace}:{normalize_query(query)}" if namespace else normalize_query(query)
+    if params:
+        payload += "\n" + json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QueryResultCache:
+    """Cache de DataFrames en archivos Parquet con TTL y limite de tamano."""
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        ttl_seconds: int = 300,
+        max_bytes: int = 512 * 1024 * 1024,
+        namespace: str = ""
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.parquet"
+
+    def get(self, query: str, params: Optional[dict] = None) -> Optional[pd.DataFrame]:
+        """Retorna el resultado cacheado o None si no existe o expiro."""
+        entry = self.get_entry(query, params, max_age=self.ttl_seconds)
+        return entry[0] if entry is not None else None
+
+    def get_entry(
+        self,
+        query: str,
+        params: Optional[dict] = None,
+        max_age: Optional[float] = None
+    ) -> Optional[tuple[pd.DataFrame, float]]:
+        """
+        Retorna (resultado, antiguedad en segundos) aunque haya pasado el TTL,
+        siempre que la antiguedad no supere `max_age`. Sirve para stale-while-revalidate.
+        """
+        path = self._path(make_cache_key(query, params, self.namespace))
+        try:
+            table = pq.read_table(path)
+        except (FileNotFoundError, OSError, pa.ArrowInvalid):
+            return None
+
+        metadata = table.schema.metadata or {}
+        created_at = float(metadata.get(CREATED_AT_KEY, b"0"))
+        age = time.time() - created_at
+        if max_age is not None and age > max_age:
+            return None
+
+        # Marcar como usado recientemente (LRU por mtime)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return table.to_pandas(), age
+
+    def set(self, query: str, df: pd.DataFrame, params: Optional[dict] = None) -> None:
+        """Guarda un resultado. La escritura es atomica (archivo temporal + rename)."""
+        path = self._path(make_cache_key(query, params, self.namespace))
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[CREATED_AT_KEY] = str(time.time()).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._evict()
+
+    def invalidate(self, query: Optional[str] = None, params: Optional[dict] = None) -> int:
+        """Elimina la entrada de una query, o todas si query es None."""
+        if query is not None:
+            paths = [self._path(make_cache_key(query, params, self.namespace))]
+        else:
+            paths = list(self.cache_dir.glob("*.parquet"))
+
+        removed = 0
+        for path in paths:
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def size_bytes(self) -> int:
+        """Tamano total ocupado por el cache."""
+        total = 0
+        for path in self.cache_dir.glob("*.parquet"):
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _evict(self) -> None:
+        """Elimina las entradas menos usadas hasta quedar bajo max_bytes."""
+        entries = []
+        for path in self.cache_dir.glob("*.parquet"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                path.unlink()
+                logger.info(f"Cache LRU: eliminado {path.name} ({size} bytes)")
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
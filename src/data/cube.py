@@ -0,0 +1,262 @@
+"""
+Cubo de rollup local sobre el snapshot diario.
+
+Las medidas aditivas (impresiones, clicks, costo, conversiones, revenue) se
+guardan en un array float64 (filas x medidas) y cada dimension como un array de
+codigos enteros con su indice de etiquetas. Un `slice` filtra con mascaras
+booleanas y agrupa con np.bincount, sin pandas groupby ni BigQuery.
+
+Los ratios (CTR, CPC, ROAS, tasa de conversion) se derivan siempre de las
+sumas del grupo, nunca promediando ratios diarios.
+
+    cube = get_rollup_cube()
+    cube.slice(channel="google_ads", date_range=("2024-01-01", "2024-01-31"), group_by=["month", "device"])
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.config import settings
+from src.data.views import FACT_MEASURES, _safe_divide, get_daily_facts
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ["channel", "campaign_id", "device", "campaign_status"]
+GROUP_KEYS = ["date", "month"] + DIMENSIONS
+
+
+def _as_list(value) -> Optional[list]:
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+        return list(value)
+    return [value]
+
+
+def _take(values: np.ndarray, mask: Optional[np.ndarray]) -> np.ndarray:
+    return values if mask is None else values[mask]
+
+
+class RollupCube:
+    """Medidas aditivas en un array columnar con indices por dimension."""
+
+    def __init__(
+        self,
+        day_codes: np.ndarray,
+        dates: pd.DatetimeIndex,
+        codes: dict[str, np.ndarray],
+        labels: dict[str, np.ndarray],
+        measures: np.ndarray,
+        campaign_names: np.ndarray
+    ):
+        # Filas ordenadas por fecha: los rangos de fechas se resuelven con searchsorted
+        self.day_codes = day_codes
+        self.dates = dates
+        self.codes = codes
+        self.labels = labels
+        self.measures = measures
+        self.campaign_names = campaign_names
+        self.month_labels, self.month_of_day = np.unique(dates.strftime("%Y-%m"), return_inverse=True)
+        self.built_at = time.time()
+
+    # -------------------------------------------------------------------------
+    # CONSTRUCCION
+    # -------------------------------------------------------------------------
+    @classmethod
+    def from_facts(cls, df: pd.DataFrame) -> "RollupCube":
+        """Construye el cubo a partir del snapshot diario (FACT_COLUMNS)."""
+        df = df.sort_values("date", kind="stable")
+
+        day_codes, dates = pd.factorize(pd.to_datetime(df["date"]).dt.normalize(), sort=True)
+        codes, labels = {}, {}
+        for dim in DIMENSIONS:
+            dim_codes, dim_labels = pd.factorize(df[dim].astype(object).fillna(""), sort=True)
+            codes[dim] = dim_codes.astype(np.int32)
+            labels[dim] = np.asarray(dim_labels, dtype=object)
+
+        # Nombre de campana: el ultimo visto por campaign_id
+        campaign_names = np.empty(len(labels["campaign_id"]), dtype=object)
+        campaign_names[codes["campaign_id"]] = df["campaign_name"].astype(object).to_numpy()
+
+        measures = np.column_stack([
+            df[col].to_numpy(dtype=np.float64, na_value=0.0) for col in FACT_MEASURES
+        ]) if len(df) else np.empty((0, len(FACT_MEASURES)))
+
+        return cls(
+            day_codes=day_codes.astype(np.int32),
+            dates=pd.DatetimeIndex(dates),
+            codes=codes,
+            labels=labels,
+            measures=measures,
+            campaign_names=campaign_names,
+        )
+
+    def __len__(self) -> int:
+        return len(self.day_codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.measures.nbytes + self.day_codes.nbytes + sum(c.nbytes for c in self.codes.values())
+
+    # -------------------------------------------------------------------------
+    # CONSULTA
+    # -------------------------------------------------------------------------
+    def _row_range(self, date_range) -> slice:
+        if not date_range:
+            return slice(0, len(self))
+        start, end = date_range
+        lo_day = self.dates.searchsorted(pd.Timestamp(start)) if start else 0
+        hi_day = self.dates.searchsorted(pd.Timestamp(end), side="right") if end else len(self.dates)
+        lo = np.searchsorted(self.day_codes, lo_day, side="left")
+        hi = np.searchsorted(self.day_codes, hi_day, side="left")
+        return slice(lo, hi)
+
+    def _mask(self, rows: slice, filters: dict) -> Optional[np.ndarray]:
+        mask = None
+        for dim, values in filters.items():
+            values = _as_list(values)
+            if values is None:
+                continue
+            wanted = np.flatnonzero(np.isin(self.labels[dim], [str(v) for v in values]))
+            dim_mask = np.isin(self.codes[dim][rows], wanted)
+            mask = dim_mask if mask is None else mask & dim_mask
+        return mask
+
+    def _key_codes(self, key: str, rows: slice) -> tuple[np.ndarray, int]:
+        if key == "date":
+            return self.day_codes[rows], len(self.dates)
+        if key == "month":
+            return self.month_of_day[self.day_codes[rows]], len(self.month_labels)
+        return self.codes[key][rows], len(self.labels[key])
+
+    def _key_labels(self, key: str, key_codes: np.ndarray):
+        if key == "date":
+            return self.dates[key_codes]
+        if key == "month":
+            return self.month_labels[key_codes]
+        return self.labels[key][key_codes]
+
+    def slice(
+        self,
+        channel=None,
+        campaign_id=None,
+        device=None,
+        campaign_status=None,
+        date_range: tuple = None,
+        group_by: list[str] = None
+    ) -> pd.DataFrame:
+        """
+        Filtra y agrega el cubo.
+
+        Args:
+            channel, campaign_id, device, campaign_status: valor o lista de valores
+            date_range: (inicio, fin) inclusivo; cualquiera de los dos puede ser None
+            group_by: subconjunto de GROUP_KEYS; vacio = un total
+
+        Returns:
+            DataFrame con las claves, las medidas sumadas, `campaigns` (campanas
+            distintas) y los ratios ctr, cpc, conversion_rate y roas.
+        """
+        group_by = list(group_by or [])
+        unknown = [key for key in group_by if key not in GROUP_KEYS]
+        if unknown:
+            raise ValueError(f"Dimensiones no soportadas: {unknown}. Disponibles: {GROUP_KEYS}")
+
+        rows = self._row_range(date_range)
+        mask = self._mask(rows, {
+            "channel": channel,
+            "campaign_id": campaign_id,
+            "device": device,
+            "campaign_status": campaign_status,
+        })
+
+        measures = _take(self.measures[rows], mask)
+        campaigns = _take(self.codes["campaign_id"][rows], mask)
+
+        # Clave compuesta de grupo -> indice denso con np.unique
+        if group_by:
+            parts = [self._key_codes(key, rows) for key in group_by]
+            shape = [size for _, size in parts]
+            composite = np.ravel_multi_index([_take(codes, mask) for codes, _ in parts], shape)
+            unique_keys, inverse = np.unique(composite, return_inverse=True)
+        else:
+            unique_keys = np.zeros(1 if len(measures) else 0, dtype=np.int64)
+            inverse = np.zeros(len(measures), dtype=np.int64)
+        n_groups = len(unique_keys)
+
+        result = {}
+        if group_by:
+            unraveled = np.unravel_index(unique_keys, shape)
+            for key, key_codes in zip(group_by, unraveled):
+                result[key] = self._key_labels(key, key_codes)
+            if "campaign_id" in group_by:
+                result["campaign_name"] = self.campaign_names[unraveled[group_by.index("campaign_id")]]
+
+        for i, col in enumerate(FACT_MEASURES):
+            result[col] = np.bincount(inverse, weights=measures[:, i], minlength=n_groups)
+
+        # Campanas distintas por grupo: pares (grupo, campana) unicos
+        n_campaigns = max(len(self.labels["campaign_id"]), 1)
+        pairs = np.unique(inverse.astype(np.int64) * n_campaigns + campaigns)
+        result["campaigns"] = np.bincount(pairs // n_campaigns, minlength=n_groups)
+
+        out = pd.DataFrame(result)
+        for col in ["impressions", "clicks"]:
+            out[col] = out[col].astype(np.int64)
+        out["ctr"] = _safe_divide(out["clicks"], out["impressions"])
+        out["cpc"] = _safe_divide(out["cost"], out["clicks"])
+        out["conversion_rate"] = _safe_divide(out["conversions"], out["clicks"])
+        out["roas"] = _safe_divide(out["revenue"], out["cost"])
+        return out
+
+
+# =============================================================================
+# INSTANCIA COMPARTIDA
+# =============================================================================
+_cube: Optional[RollupCube] = None
+_cube_lock = threading.Lock()
+
+
+def get_rollup_cube(force: bool = False) -> RollupCube:
+    """
+    Cubo construido desde get_daily_facts(), reconstruido cada
+    ROLLUP_CUBE_TTL_SECONDS (o antes con force=True).
+    """
+    global _cube
+    with _cube_lock:
+        expired = _cube is None or time.time() - _cube.built_at > settings.rollup_cube_ttl_seconds
+        if force or expired:
+            started = time.perf_counter()
+            try:
+                facts = get_daily_facts()
+            except Exception as e:
+                if _cube is None:
+                    raise
+                # Sin datos nuevos se sigue sirviendo el cubo anterior
+                logger.warning(f"No se pudo reconstruir el cubo, se mantiene el anterior: {e}")
+                return _cube
+            _cube = RollupCube.from_facts(facts)
+            logger.info(
+                f"Cubo construido: {len(_cube)} filas, {_cube.nbytes / 1e6:.1f} MB "
+                f"en {(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+        return _cube
+
+
+if __name__ == "__main__":
+    cube = get_rollup_cube()
+    print(f"Cubo: {len(cube)} filas, {cube.nbytes / 1e6:.1f} MB")
+
+    started = time.perf_counter()
+    by_channel = cube.slice(group_by=["channel"])
+    print(f"\nPor canal ({(time.perf_counter() - started) * 1000:.2f} ms):")
+    print(by_channel[["channel", "campaigns", "cost", "revenue", "ctr", "roas"]].to_string(index=False))
+
+    started = time.perf_counter()
+    by_month = cube.slice(group_by=["month", "channel"])
+    print(f"\nPor mes y canal ({(time.perf_counter() - started) * 1000:.2f} ms):")
+    print(by_month[["month", "channel", "cost", "revenue", "roas"]].to_string(index=False))
@@ -0,0 +1,155 @@
+"""
+Backend local DuckDB para la capa de vistas.
+
+Ejecuta el mismo SQL de `views.py` sobre snapshots Parquet de `gads_campaign`
+y `meta_ads_insights_daily`, sin BigQuery. Permite pruebas y benchmarks
+offline y sirve los dashboards desde un motor columnar local.
+
+Se activa con QUERY_BACKEND=duckdb. Los snapshots se generan con:
+    python -m src.data.duckdb_backend
+"""
+import logging
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TABLES = ["gads_campaign", "meta_ads_insights_daily"]
+
+# Funciones de BigQuery que no existen en DuckDB, definidas como macros
+DUCKDB_MACROS = [
+    "CREATE OR REPLACE MACRO SAFE_DIVIDE(a, b) AS CASE WHEN b = 0 THEN NULL ELSE a / b END",
+    "CREATE OR REPLACE MACRO FORMAT_DATE(fmt, d) AS strftime(d, fmt)",
+]
+
+
+# =============================================================================
+# SHIM DE DIALECTO BigQuery -> DuckDB
+# =============================================================================
+_TABLE_REF = re.compile(r"`(?:[\w-]+\.)*(\w+)`")
+_SAFE_OFFSET = re.compile(r"\[\s*SAFE_OFFSET\(\s*(\d+)\s*\)\s*\]", re.IGNORECASE)
+_IN_UNNEST = re.compile(r"IN\s+UNNEST\(\s*@(\w+)\s*\)", re.IGNORECASE)
+_PARAM = re.compile(r"@(\w+)")
+_TYPES = {
+    re.compile(r"\bINT64\b", re.IGNORECASE): "BIGINT",
+    re.compile(r"\bFLOAT64\b", re.IGNORECASE): "DOUBLE",
+}
+
+
+def translate_sql(query: str) -> str:
+    """
+    Traduce el subconjunto de SQL de BigQuery que usan las vistas:
+    - `proyecto.dataset.tabla` -> tabla (vista sobre el snapshot Parquet)
+    - arr[SAFE_OFFSET(n)] -> arr[n + 1] (listas 1-based; fuera de rango da NULL)
+    - INT64 / FLOAT64 -> BIGINT / DOUBLE
+    - IN UNNEST(@p) -> IN (SELECT UNNEST($p)) y @p -> $p
+    SAFE_DIVIDE y FORMAT_DATE se resuelven con macros.
+    """
+    query = _TABLE_REF.sub(r"\1", query)
+    query = _SAFE_OFFSET.sub(lambda m: f"[{int(m.group(1)) + 1}]", query)
+    for pattern, replacement in _TYPES.items():
+        query = pattern.sub(replacement, query)
+    query = _IN_UNNEST.sub(r"IN (SELECT UNNEST($\1))", query)
+    return _PARAM.sub(r"$\1", query)
+
+
+# =============================================================================
+# CONEXION
+# =============================================================================
+_lock = threading.Lock()
+
+
+@lru_cache()
+def get_duckdb_connection():
+    """Conexion con macros y una vista por snapshot Parquet encontrado."""
+    import duckdb
+
+    con = duckdb.connect(settings.duckdb_path)
+    for macro in DUCKDB_MACROS:
+        con.execute(macro)
+
+    snapshot_dir = Path(settings.duckdb_snapshot_dir)
+    for table in SNAPSHOT_TABLES:
+        path = snapshot_dir / f"{table}.parquet"
+        if path.exists():
+            con.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{path.as_posix()}')")
+        else:
+            logger.warning(f"Snapshot no encontrado: {path}")
+    return con
+
+
+def _cast_hugeint(table: pa.Table) -> pa.Table:
+    """
+    SUM(BIGINT) en DuckDB es HUGEINT y llega como decimal128(38, 0); BigQuery
+    retorna INT64. Se castea para que ambos backends den los mismos dtypes.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            target = pa.int64() if field.type.scale == 0 else pa.float64()
+            table = table.set_column(i, field.name, table.column(i).cast(target))
+    return table
+
+
+def execute_arrow(query: str, params: Optional[dict] = None) -> pa.Table:
+    """Ejecuta SQL de BigQuery en DuckDB y retorna una tabla Arrow."""
+    with _lock:
+        cursor = get_duckdb_connection().cursor()
+    try:
+        cursor.execute(translate_sql(query), params or None)
+        return _cast_hugeint(cursor.fetch_arrow_table())
+    finally:
+        cursor.close()
+
+
+def iter_arrow_batches(query: str, params: Optional[dict] = None, batch_size: int = 50000):
+    """Ejecuta en DuckDB y entrega el resultado como RecordBatches (streaming)."""
+    with _lock:
+        cursor = get_duckdb_connection().cursor()
+    try:
+        cursor.execute(translate_sql(query), params or None)
+        for batch in cursor.fetch_record_batch(batch_size):
+            yield _cast_hugeint(pa.Table.from_batches([batch]))
+    finally:
+        cursor.close()
+
+
+def reload_snapshots() -> None:
+    """Vuelve a registrar las vistas (tras regenerar los Parquet)."""
+    get_duckdb_connection.cache_clear()
+
+
+# =============================================================================
+# EXPORTACION DE SNAPSHOTS DESDE BIGQUERY
+# =============================================================================
+def export_snapshots(tables: list[str] = None, snapshot_dir: str = None) -> dict:
+    """Descarga las tablas fuente completas de BigQuery a Parquet."""
+    from src.data.bigquery_client import get_bigquery_client, get_table_ref
+
+    tables = tables or SNAPSHOT_TABLES
+    out_dir = Path(snapshot_dir or settings.duckdb_snapshot_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    client = get_bigquery_client()
+    written = {}
+    for table in tables:
+        arrow_table = client.query(f"SELECT * FROM `{get_table_ref(table)}`").to_arrow()
+        path = out_dir / f"{table}.parquet"
+        pq.write_table(arrow_table, path)
+        written[table] = arrow_table.num_rows
+        logger.info(f"Snapshot {table}: {arrow_table.num_rows} filas -> {path}")
+
+    reload_snapshots()
+    return written
+
+
+if __name__ == "__main__":
+    for table, rows in export_snapshots().items():
+        print(f"{table:25} | {rows} filas")
@@ -0,0 +1,194 @@
+"""
+Instrumentacion de queries: bytes escaneados, slot time y latencia por vista.
+
+Cada ejecucion de `execute_query` genera un registro que se escribe como
+linea JSON en el log y se acumula en un registro en memoria, etiquetado con la
+funcion de vista que la origino (ver `tag_view`).
+"""
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_current_view: ContextVar[Optional[str]] = ContextVar("current_view", default=None)
+
+
+@contextmanager
+def _view_tag(name: str):
+    """Activa la etiqueta si no hay una vista externa y restaura la anterior al salir."""
+    token = _current_view.set(name) if _current_view.get() is None else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            _current_view.reset(token)
+
+
+def tag_view(func):
+    """
+    Etiqueta las queries ejecutadas dentro de `func` con su nombre.
+    Gana la vista mas externa: get_channel_summary -> get_daily_facts se
+    registra como get_channel_summary.
+    
+    En generadores la etiqueta solo esta activa mientras avanza el generador
+    interno: un generador suspendido o abandonado no la deja puesta en el
+    contexto del llamador.
+    """
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            gen = func(*args, **kwargs)
+            method, value = gen.send, None
+            while True:
+                try:
+                    with _view_tag(func.__name__):
+                        item = method(value)
+                except StopIteration as stop:
+                    return stop.value
+                try:
+                    value = yield item
+                    method = gen.send
+                except GeneratorExit:
+                    with _view_tag(func.__name__):
+                        gen.close()
+                    raise
+                except BaseException as e:
+                    method, value = gen.throw, e
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _view_tag(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def current_view() -> str:
+    return _current_view.get() or "unknown"
+
+
+@dataclass
+class QueryStats:
+    view: str
+    source: str  # "bigquery" | "duckdb" | "result_cache" | "coalesced" | "stale"
+    total_ms: float
+    rows: int
+    job_id: Optional[str] = None
+    bytes_processed: int = 0
+    bytes_billed: int = 0
+    slot_ms: int = 0
+    cache_hit: bool = False
+    queue_ms: Optional[float] = None
+    execution_ms: Optional[float] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+def stats_from_job(job, view: str, total_ms: float, rows: int) -> QueryStats:
+    """Extrae las estadisticas de un QueryJob terminado."""
+    queue_ms = execution_ms = None
+    if job.created and job.started:
+        queue_ms = (job.started - job.created).total_seconds() * 1000
+    if job.started and job.ended:
+        execution_ms = (job.ended - job.started).total_seconds() * 1000
+    return QueryStats(
+        view=view,
+        source="bigquery",
+        total_ms=total_ms,
+        rows=rows,
+        job_id=job.job_id,
+        bytes_processed=job.total_bytes_processed or 0,
+        bytes_billed=job.total_bytes_billed or 0,
+        slot_ms=job.slot_millis or 0,
+        cache_hit=bool(job.cache_hit),
+        queue_ms=queue_ms,
+        execution_ms=execution_ms,
+    )
+
+
+class QueryStatsRegistry:
+    """Acumula estadisticas por vista y conserva los ultimos registros."""
+
+    def __init__(self, max_recent: int = 500, max_latencies: int = 1000):
+        self._lock = threading.Lock()
+        self._recent: deque = deque(maxlen=max_recent)
+        self._by_view: dict[str, dict] = {}
+        self._max_latencies = max_latencies
+
+    def record(self, stats: QueryStats) -> None:
+        logger.info(json.dumps({"event": "query_stats", **asdict(stats)}))
+        with self._lock:
+            self._recent.append(stats)
+            agg = self._by_view.get(stats.view)
+            if agg is None:
+                agg = {
+                    "calls": 0,
+                    "bigquery_jobs": 0,
+                    "bq_cache_hits": 0,
+                    "result_cache_hits": 0,
+                    "coalesced": 0,
+                    "stale_served": 0,
+                    "bytes_processed": 0,
+                    "bytes_billed": 0,
+                    "slot_ms": 0,
+                    "rows": 0,
+                    "latencies_ms": deque(maxlen=self._max_latencies),
+                }
+                self._by_view[stats.view] = agg
+
+            agg["calls"] += 1
+            agg["rows"] += stats.rows
+            agg["latencies_ms"].append(stats.total_ms)
+            if stats.source == "bigquery":
+                agg["bigquery_jobs"] += 1
+                agg["bq_cache_hits"] += int(stats.cache_hit)
+                agg["bytes_processed"] += stats.bytes_processed
+                agg["bytes_billed"] += stats.bytes_billed
+                agg["slot_ms"] += stats.slot_ms
+            elif stats.source == "result_cache":
+                agg["result_cache_hits"] += 1
+            elif stats.source == "coalesced":
+                agg["coalesced"] += 1
+            elif stats.source == "stale":
+                agg["stale_served"] += 1
+
+    def summary(self) -> list[dict]:
+        """Resumen por vista, ordenado por bytes facturados (las mas caras primero)."""
+        with self._lock:
+            rows = []
+            for view, agg in self._by_view.items():
+                latencies = np.asarray(agg["latencies_ms"], dtype=float)
+                row = {k: v for k, v in agg.items() if k != "latencies_ms"}
+                row["view"] = view
+                row["p50_ms"] = float(np.percentile(latencies, 50)) if latencies.size else None
+                row["p95_ms"] = float(np.percentile(latencies, 95)) if latencies.size else None
+                row["p99_ms"] = float(np.percentile(latencies, 99)) if latencies.size else None
+                rows.append(row)
+        return sorted(rows, key=lambda r: (r["bytes_billed"], r["p95_ms"] or 0), reverse=True)
+
+    def recent(self, limit: int = 50) -> list[dict]:
+        with self._lock:
+            return [asdict(s) for s in list(self._recent)[-limit:]]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._by_view.clear()
+
+
+registry = QueryStatsRegistry()
+
+
+def get_query_stats(recent: int = 50) -> dict:
+    """Resumen por vista + ultimos registros (para exponer en la API)."""
+    return {"by_view": registry.summary(), "recent": registry.recent(recent)}
@@ -0,0 +1,135 @@
+"""
+Resiliencia frente a BigQuery lento o caido.
+
+- Deadline por query: `execute_query` espera como maximo QUERY_TIMEOUT_SECONDS.
+- Stale-while-revalidate: si la query expira, falla o el circuito esta
+  abierto, se sirve el ultimo resultado bueno del cache (marcado como stale)
+  mientras el refresco sigue en segundo plano.
+- Circuit breaker: tras N fallos consecutivos deja de lanzar jobs durante
+  BQ_BREAKER_RESET_SECONDS y luego deja pasar una sola prueba (half-open).
+  Solo cuentan los fallos transitorios (timeouts, conexion, 5xx); un error
+  de la query se propaga sin abrir el circuito.
+
+Los endpoints recogen las lecturas stale de una peticion con `collect_staleness`.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class QueryTimeoutError(TimeoutError):
+    """La query supero su deadline y no habia un resultado previo que servir."""
+
+
+class CircuitOpenError(RuntimeError):
+    """El circuito esta abierto: no se lanzan jobs hasta que pase el cooldown."""
+
+
+class CircuitBreaker:
+    """Circuit breaker de tres estados (closed -> open -> half_open -> closed)."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self) -> None:
+        """Lanza CircuitOpenError si no se permite la llamada."""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN:
+                remaining = self.reset_seconds - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(f"Circuito {self.name} abierto ({remaining:.0f}s restantes)")
+                self._state = HALF_OPEN
+            # half_open: una sola prueba a la vez
+            if self._probe_in_flight:
+                raise CircuitOpenError(f"Circuito {self.name} en prueba (half-open)")
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuito {self.name} cerrado")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Circuito {self.name} abierto tras {self._failures} fallos")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def record_ignored(self) -> None:
+        """
+        Fallo que no indica un servicio caido (p. ej. error de SQL): no cuenta
+        para abrir el circuito, solo libera la prueba half-open en curso.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            return {"name": self.name, "state": state, "consecutive_failures": self._failures}
+
+
+# =============================================================================
+# MARCADOR DE DATOS STALE POR PETICION
+# =============================================================================
+_stale_reads: ContextVar[Optional[list]] = ContextVar("stale_reads", default=None)
+
+
+@contextmanager
+def collect_staleness():
+    """Acumula las lecturas stale hechas dentro del bloque (incluidas las del executor)."""
+    reads: list[dict] = []
+    token = _stale_reads.set(reads)
+    try:
+        yield reads
+    finally:
+        _stale_reads.reset(token)
+
+
+def note_stale_read(age_seconds: float, reason: str) -> None:
+    reads = _stale_reads.get()
+    if reads is not None:
+        reads.append({"age_seconds": round(age_seconds, 1), "reason": reason})
+
+
+def staleness_marker(reads: list[dict]) -> dict:
+    """Campos a agregar a una respuesta que uso datos stale (vacio si no hubo)."""
+    if not reads:
+        return {}
+    return {
+        "stale": True,
+        "stale_age_seconds": max(r["age_seconds"] for r in reads),
+        "stale_reason": reads[0]["reason"],
+    }
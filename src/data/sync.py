@@ -0,0 +1,164 @@
+"""
+Sincronizacion incremental del snapshot diario.
+
+Mantiene un store local (un Parquet por tabla fuente) y un watermark por fuente
+sobre su columna de fecha (`event_date` / `date_start`). Cada sync solo pide a
+BigQuery los dias >= watermark - SYNC_RESTATEMENT_DAYS, de modo que se recogen
+los dias nuevos y los re-estimados (Meta re-estima los ultimos dias) y el costo
+crece con las filas nuevas, no con el historial total.
+
+El ciclo cargar estado -> sync -> guardar estado corre bajo un lock de archivo
+exclusivo, asi que varios procesos (workers de la API, entrenamiento) no pisan
+los watermarks ni el store entre si.
+"""
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from src.config import settings
+from src.data.bigquery_client import execute_query
+from src.data.views import SOURCE_CHANNELS, SOURCE_DATE_COLUMNS, _daily_facts_query, empty_facts
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "watermarks.json"
+LOCK_FILE = "sync.lock"
+
+
+def _store_dir() -> Path:
+    path = Path(settings.sync_store_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _atomic_write(path: Path, write) -> None:
+    """Escribe a un temporal del mismo directorio y lo renombra."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def _store_lock():
+    """Lock exclusivo entre procesos sobre el store (flock de LOCK_FILE)."""
+    with open(_store_dir() / LOCK_FILE, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_state() -> dict:
+    """Estado del sync: {"watermarks": {fuente: fecha}, "synced_at": epoch}."""
+    path = _store_dir() / STATE_FILE
+    if not path.exists():
+        return {"watermarks": {}, "synced_at": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_state(state: dict) -> None:
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+    _atomic_write(_store_dir() / STATE_FILE, write)
+
+
+def _load_source(source: str) -> pd.DataFrame:
+    path = _store_dir() / f"{source}.parquet"
+    if not path.exists():
+        return pd.DataFrame()
+    return pd.read_parquet(path)
+
+
+def _save_source(source: str, df: pd.DataFrame) -> None:
+    _atomic_write(_store_dir() / f"{source}.parquet", lambda tmp_path: df.to_parquet(tmp_path, index=False))
+
+
+def sync_source(source: str, state: dict, restatement_days: Optional[int] = None) -> dict:
+    """
+    Trae de BigQuery solo los dias nuevos o re-estimados de una fuente y los
+    fusiona con el store local (los dias re-consultados reemplazan a los guardados).
+    Modifica `state` en memoria: el llamador debe tener tomado `_store_lock()`
+    y guardar el estado despues (ver `sync_all`).
+    """
+    if restatement_days is None:
+        restatement_days = settings.sync_restatement_days
+
+    watermark = state["watermarks"].get(source)
+    since = None
+    if watermark:
+        since = (date.fromisoformat(watermark) - timedelta(days=restatement_days)).isoformat()
+
+    query, params = _daily_facts_query(start_date=since, channels=[SOURCE_CHANNELS[source]])
+    fresh = execute_query(query, params, use_cache=False)
+    fresh["date"] = pd.to_datetime(fresh["date"])
+
+    stored = _load_source(source)
+    if since and not stored.empty:
+        stored = stored[stored["date"] < pd.Timestamp(since)]
+        merged = pd.concat([stored, fresh], ignore_index=True)
+    else:
+        merged = fresh
+
+    _save_source(source, merged)
+    if not merged.empty:
+        state["watermarks"][source] = merged["date"].max().date().isoformat()
+
+    logger.info(f"Sync {source}: desde {since or 'inicio'}, {len(fresh)} filas nuevas, {len(merged)} en store")
+    return {"source": source, "since": since, "fetched_rows": len(fresh), "total_rows": len(merged)}
+
+
+def sync_all(force: bool = False) -> list[dict]:
+    """
+    Sincroniza todas las fuentes. Si el ultimo sync es mas reciente que
+    SYNC_MIN_INTERVAL_SECONDS (y no se fuerza) no consulta BigQuery.
+    El intervalo se evalua dentro del lock: un proceso que espero a otro ve su
+    `synced_at` y no repite el sync.
+    """
+    with _store_lock():
+        state = load_state()
+        if not force and time.time() - state.get("synced_at", 0) < settings.sync_min_interval_seconds:
+            return []
+
+        results = [sync_source(source, state) for source in SOURCE_DATE_COLUMNS]
+        state["synced_at"] = time.time()
+        _save_state(state)
+    return results
+
+
+def load_daily_facts() -> pd.DataFrame:
+    """Snapshot diario completo desde el store local (sin consultar BigQuery)."""
+    frames = [_load_source(source) for source in SOURCE_DATE_COLUMNS]
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return empty_facts()
+    return pd.concat(frames, ignore_index=True)
+
+
+def sync_daily_facts(force: bool = False) -> pd.DataFrame:
+    """Sincroniza (si corresponde) y retorna el snapshot diario del store local."""
+    sync_all(force=force)
+    return load_daily_facts()
+
+
+if __name__ == "__main__":
+    for result in sync_all(force=True):
+        print(f"{result['source']:25} | desde: {result['since'] or 'inicio':10} | "
+              f"nuevas: {result['fetched_rows']:6} | total: {result['total_rows']}")
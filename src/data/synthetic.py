@@ -0,0 +1,257 @@
+"""
+Generador sintetico de las tablas fuente `gads_campaign` y `meta_ads_insights_daily`.
+
+Produce snapshots Parquet con el mismo esquema que `duckdb_backend.export_snapshots`,
+de modo que vistas, cubo, features, entrenamiento, prediccion y tools del
+agente corren sin BigQuery (QUERY_BACKEND=duckdb) a cualquier escala.
+
+Cada campana tiene presupuesto, CTR, CPC, tasa de conversion y ticket medio
+propios, un ciclo de vida (lanzamiento / pausa) y reparto por dispositivo. Sobre
+eso se aplican estacionalidad semanal y anual, dias sin gasto, un shock diario
+de calidad de audiencia (CTR y conversion se mueven juntos) y ruido diario.
+La salida es determinista por (seed, canal, dia): no depende del tamano de bloque.
+
+    python -m src.data.synthetic --campaigns 1000 --days 365 --out data/synthetic
+"""
+import logging
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+GADS_DEVICES = ["MOBILE", "DESKTOP", "TABLET"]
+META_DEVICES = ["mobile_app", "mobile_web", "desktop"]
+
+GADS_SCHEMA = pa.schema([
+    ("event_date", pa.date32()),
+    ("campaign_id", pa.int64()),
+    ("campaign_name", pa.string()),
+    ("campaign_status", pa.string()),
+    ("device", pa.string()),
+    ("impressions", pa.int64()),
+    ("clicks", pa.int64()),
+    ("cost_micros", pa.int64()),
+    ("conversions", pa.float64()),
+    ("conversions_value", pa.float64()),
+])
+
+PURCHASE_ROAS_TYPE = pa.list_(pa.struct([("action_type", pa.string()), ("value", pa.float64())]))
+META_SCHEMA = pa.schema([
+    ("date_start", pa.date32()),
+    ("campaign_id", pa.int64()),
+    ("campaign_name", pa.string()),
+    ("device_platform", pa.string()),
+    ("impressions", pa.int64()),
+    ("clicks", pa.int64()),
+    ("spend", pa.float64()),
+    ("purchase_roas", PURCHASE_ROAS_TYPE),
+])
+
+_PRODUCTS = ["Bolsos", "Mochilas", "Carteras", "Accesorios", "Viaje", "Outlet"]
+_OBJECTIVES = ["Search", "Shopping", "PMax", "Display", "Remarketing", "Prospecting"]
+_CHANNEL_SEEDS = {"google_ads": 1, "meta_ads": 2}
+
+# Filas por bloque escrito (row group)
+TARGET_CHUNK_ROWS = 1_000_000
+
+
+# =============================================================================
+# CAMPANAS
+# =============================================================================
+class CampaignSet:
+    """Parametros fijos por campana (uno por fila) de un canal."""
+
+    def __init__(self, channel: str, n_campaigns: int, n_days: int, seed: int):
+        rng = np.random.default_rng([seed, _CHANNEL_SEEDS[channel], 0])
+        self.channel = channel
+        self.n = n_campaigns
+        base_id = 20_000_000_000 if channel == "google_ads" else 23_850_000_000_000_000
+        self.ids = base_id + np.sort(rng.choice(10 * n_campaigns + 1000, n_campaigns, replace=False)).astype(np.int64)
+        self.names = np.array([
+            f"{_PRODUCTS[p]} | {_OBJECTIVES[o]} | {i:05d}"
+            for i, (p, o) in enumerate(zip(rng.integers(len(_PRODUCTS), size=n_campaigns),
+                                           rng.integers(len(_OBJECTIVES), size=n_campaigns)))
+        ], dtype=object)
+
+        # Ciclo de vida: ~70% ya activas al inicio, el resto se lanza durante la ventana
+        self.start_day = np.where(rng.random(n_campaigns) < 0.7, 0, rng.integers(0, max(n_days, 1), n_campaigns))
+        paused = rng.random(n_campaigns) < 0.2
+        self.end_day = np.where(paused, rng.integers(self.start_day, max(n_days, 1) + 1), n_days)
+        self.status = np.where(paused, np.where(rng.random(n_campaigns) < 0.5, "PAUSED", "REMOVED"), "ENABLED")
+
+        # Economia de la campana
+        self.budget = rng.lognormal(3.3, 1.0, n_campaigns)          # gasto diario (~27 USD mediana)
+        self.ctr = rng.beta(2.0, 60.0, n_campaigns)                 # ~3%
+        self.cpc = rng.lognormal(-0.6, 0.5, n_campaigns)            # ~0.55 USD
+        self.cvr = rng.beta(1.5, 45.0, n_campaigns)                 # ~3%
+        self.aov = rng.lognormal(4.0, 0.4, n_campaigns)             # ~55 USD
+        self.device_share = rng.dirichlet([6.0, 3.0, 1.0], n_campaigns)
+        self.trend = rng.normal(0.0, 0.3, n_campaigns) / max(n_days, 1)
+
+
+def _seasonality(day: date, channel: str) -> float:
+    """Multiplicador de gasto: semana (fin de semana distinto por canal) + ano (Q4 alto)."""
+    weekday = day.weekday()
+    weekly = (1.15 if channel == "meta_ads" else 0.85) if weekday >= 5 else 1.0
+    yearly = 1.0 + 0.15 * np.sin(2 * np.pi * (day.timetuple().tm_yday - 80) / 365.25)
+    if day.month in (11, 12):
+        yearly *= 1.3
+    return weekly * yearly
+
+
+def _day_rows(campaigns: CampaignSet, day_index: int, day: date, seed: int) -> dict:
+    """Filas (campana activa x dispositivo) de un dia."""
+    rng = np.random.default_rng([seed, _CHANNEL_SEEDS[campaigns.channel], day_index + 1])
+    active = np.flatnonzero((campaigns.start_day <= day_index) & (day_index < campaigns.end_day))
+    n_devices = campaigns.device_share.shape[1]
+    camp = np.repeat(active, n_devices)
+    device = np.tile(np.arange(n_devices), len(active))
+
+    n = len(camp)
+    season = _seasonality(day, campaigns.channel)
+    spend = (
+        campaigns.budget[camp]
+        * campaigns.device_share[camp, device]
+        * season
+        * (1 + campaigns.trend[camp] * day_index)
+        * rng.lognormal(0.0, 0.35, n)
+    )
+    spend[rng.random(n) < 0.05] = 0.0  # dias sin gasto (limite de presupuesto, pausas cortas)
+    spend = np.round(np.clip(spend, 0, None), 2)
+
+    # Calidad de audiencia del dia (por campana): sube CTR y conversion a la vez
+    quality = np.repeat(rng.lognormal(0.0, 0.4, len(active)), n_devices)
+    cpc = campaigns.cpc[camp] * rng.lognormal(0.0, 0.15, n)
+    clicks = rng.poisson(spend / cpc)
+    ctr = np.clip(campaigns.ctr[camp] * quality * rng.lognormal(0.0, 0.1, n), 1e-4, 0.5)
+    impressions = np.maximum(rng.poisson(clicks / ctr + (spend > 0) * 20), clicks)
+    cvr = np.clip(campaigns.cvr[camp] * season * quality ** 1.5, 0, 1)
+    conversions = rng.binomial(clicks, cvr).astype(np.float64)
+    revenue = np.round(conversions * campaigns.aov[camp] * rng.lognormal(0.0, 0.3, n), 2)
+
+    return {
+        "camp": camp, "device": device, "impressions": impressions.astype(np.int64),
+        "clicks": clicks.astype(np.int64), "spend": spend, "conversions": conversions, "revenue": revenue,
+    }
+
+
+def _iter_chunks(campaigns: CampaignSet, n_days: int, end_date: date, seed: int) -> Iterator[tuple[list, dict]]:
+    """Agrupa dias en bloques de ~TARGET_CHUNK_ROWS filas."""
+    days_per_chunk = max(1, TARGET_CHUNK_ROWS // max(campaigns.n * campaigns.device_share.shape[1], 1))
+    first_day = end_date - timedelta(days=n_days - 1)
+    for chunk_start in range(0, n_days, days_per_chunk):
+        dates, parts = [], []
+        for day_index in range(chunk_start, min(chunk_start + days_per_chunk, n_days)):
+            day = first_day + timedelta(days=day_index)
+            rows = _day_rows(campaigns, day_index, day, seed)
+            dates.append(np.full(len(rows["camp"]), np.datetime64(day, "D")))
+            parts.append(rows)
+        yield np.concatenate(dates), {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+# =============================================================================
+# TABLAS FUENTE
+# =============================================================================
+def iter_gads_campaign(n_campaigns: int, n_days: int, end_date: date = None, seed: int = 42) -> Iterator[pa.Table]:
+    """Bloques de `gads_campaign` (esquema de la tabla de BigQuery)."""
+    campaigns = CampaignSet("google_ads", n_campaigns, n_days, seed)
+    for dates, rows in _iter_chunks(campaigns, n_days, end_date or date.today(), seed):
+        camp = rows["camp"]
+        yield pa.Table.from_arrays([
+            pa.array(dates, pa.date32()),
+            pa.array(campaigns.ids[camp]),
+            pa.array(campaigns.names[camp], pa.string()),
+            pa.array(campaigns.status[camp], pa.string()),
+            pa.array(np.asarray(GADS_DEVICES, dtype=object)[rows["device"]], pa.string()),
+            pa.array(rows["impressions"]),
+            pa.array(rows["clicks"]),
+            pa.array(np.round(rows["spend"] * 1_000_000).astype(np.int64)),
+            pa.array(rows["conversions"]),
+            pa.array(rows["revenue"]),
+        ], schema=GADS_SCHEMA)
+
+
+def _purchase_roas(spend: np.ndarray, revenue: np.ndarray) -> pa.Array:
+    """list<struct<action_type, value>> con una accion omni_purchase; NULL sin compras."""
+    has_value = (spend > 0) & (revenue > 0)
+    values = pa.StructArray.from_arrays(
+        [pa.array(np.full(int(has_value.sum()), "omni_purchase", dtype=object), pa.string()),
+         pa.array(revenue[has_value] / spend[has_value])],
+        names=["action_type", "value"],
+    )
+    offsets = np.concatenate([[0], np.cumsum(has_value)]).astype(np.int32)
+    return pa.ListArray.from_arrays(pa.array(offsets), values, mask=pa.array(~has_value)).cast(PURCHASE_ROAS_TYPE)
+
+
+def iter_meta_ads_insights(n_campaigns: int, n_days: int, end_date: date = None, seed: int = 42) -> Iterator[pa.Table]:
+    """Bloques de `meta_ads_insights_daily` (esquema del export de Meta)."""
+    campaigns = CampaignSet("meta_ads", n_campaigns, n_days, seed)
+    for dates, rows in _iter_chunks(campaigns, n_days, end_date or date.today(), seed):
+        camp = rows["camp"]
+        yield pa.Table.from_arrays([
+            pa.array(dates, pa.date32()),
+            pa.array(campaigns.ids[camp]),
+            pa.array(campaigns.names[camp], pa.string()),
+            pa.array(np.asarray(META_DEVICES, dtype=object)[rows["device"]], pa.string()),
+            pa.array(rows["impressions"]),
+            pa.array(rows["clicks"]),
+            pa.array(rows["spend"]),
+            _purchase_roas(rows["spend"], rows["revenue"]),
+        ], schema=META_SCHEMA)
+
+
+def generate_snapshots(
+    out_dir: str,
+    campaigns: int = 100,
+    days: int = 90,
+    end_date: date = None,
+    seed: int = 42,
+    meta_share: float = 0.4
+) -> dict:
+    """
+    Escribe gads_campaign.parquet y meta_ads_insights_daily.parquet en `out_dir`
+    (un row group por bloque, sin materializar la tabla completa).
+    `campaigns` se reparte entre canales segun `meta_share`. Retorna filas por tabla.
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    n_meta = max(1, int(round(campaigns * meta_share)))
+    n_gads = max(1, campaigns - n_meta)
+
+    written = {}
+    for table, schema, chunks in [
+        ("gads_campaign", GADS_SCHEMA, iter_gads_campaign(n_gads, days, end_date, seed)),
+        ("meta_ads_insights_daily", META_SCHEMA, iter_meta_ads_insights(n_meta, days, end_date, seed)),
+    ]:
+        path = out / f"{table}.parquet"
+        rows = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            for chunk in chunks:
+                writer.write_table(chunk)
+                rows += chunk.num_rows
+        written[table] = rows
+        logger.info(f"Sintetico {table}: {rows} filas -> {path}")
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera snapshots sinteticos de las tablas fuente")
+    parser.add_argument("--campaigns", type=int, default=100)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="data/synthetic")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    for table, rows in generate_snapshots(args.out, args.campaigns, args.days, seed=args.seed).items():
+        print(f"{table:25} | {rows} filas")
+    print(f"Tiempo: {time.perf_counter() - started:.1f}s")
+    print(f"Uso: QUERY_BACKEND=duckdb DUCKDB_SNAPSHOT_DIR={args.out}")
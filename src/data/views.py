@@ -1,22 +1,59 @@
-"""Queries que simulan las vistas SQL (sin necesidad de crearlas en BigQuery)."""
-from src.data.bigquery_client import execute_query
-from src.config import settings
+"""Queries que simulan las vistas SQL (sin necesidad de crearlas en BigQuery).
+
+Todas las vistas se derivan localmente de un unico snapshot diario
+(fecha x campana x canal x dispositivo), de modo que un solo scan de
+`gads_campaign` y `meta_ads_insights_daily` sirve a todas.
+"""
+from datetime import date, timedelta
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+from src.data.bigquery_client import execute_query, execute_query_iter, run_in_query_executor
+from src.data.query_stats import tag_view
+from src.config import settings
 
 PROJECT = settings.gcp_project_id
 DATASET = settings.bq_dataset
 
+FACT_MEASURES = ["impressions", "clicks", "cost", "conversions", "revenue"]
 
-def get_campaign_performance_daily(start_date: str = None, end_date: str = None) -> pd.DataFrame:
-    """Vista unificada de rendimiento diario de campanas."""
-    
-    where_clause = ""
-    if start_date and end_date:
-        where_clause = f"WHERE date BETWEEN '{start_date}' AND '{end_date}'"
-    
-    query = f"""
-    SELECT * FROM (
-        SELECT 
+
+# Columna de fecha y canal de cada tabla fuente (usados para filtros y watermarks)
+SOURCE_DATE_COLUMNS = {
+    "gads_campaign": "event_date",
+    "meta_ads_insights_daily": "date_start",
+}
+SOURCE_CHANNELS = {
+    "gads_campaign": "google_ads",
+    "meta_ads_insights_daily": "meta_ads",
+}
+
+FACT_COLUMNS = [
+    "date", "campaign_id", "campaign_name", "channel", "campaign_status", "device",
+] + FACT_MEASURES
+
+
+def _source_select(source: str, start_date=None, end_date=None, campaign_ids=None) -> str:
+    """
+    SELECT normalizado al esquema del snapshot para una tabla fuente.
+    Los filtros van dentro de cada rama (como parametros @start_date, @end_date,
+    @campaign_ids) para que BigQuery pueda podar particiones.
+    """
+    date_column = SOURCE_DATE_COLUMNS[source]
+    conditions = [f"{date_column} IS NOT NULL"]
+    if start_date:
+        conditions.append(f"{date_column} >= @start_date")
+    if end_date:
+        conditions.append(f"{date_column} <= @end_date")
+    if campaign_ids:
+        conditions.append("CAST(campaign_id AS STRING) IN UNNEST(@campaign_ids)")
+    where_clause = "WHERE " + "\n          AND ".join(conditions)
+
+    if source == "gads_campaign":
+        return f"""
+        SELECT
             event_date as date,
             CAST(campaign_id AS STRING) as campaign_id,
             campaign_name,
@@ -27,14 +64,13 @@ def get_campaign_performance_daily(start_date: str = None, end_date: str = None)
             COALESCE(clicks, 0) as clicks,
             COALESCE(cost_micros, 0) / 1000000 as cost,
             COALESCE(conversions, 0) as conversions,
-            COALESCE(conversions_value, 0) as revenue,
-            SAFE_DIVIDE(COALESCE(conversions_value, 0), COALESCE(cost_micros, 0) / 1000000) as roas
+            COALESCE(conversions_value, 0) as revenue
         FROM `{PROJECT}.{DATASET}.gads_campaign`
-        WHERE event_date IS NOT NULL
-
-        UNION ALL
+        {where_clause}
+        """
 
-        SELECT 
+    return f"""
+        SELECT
             date_start as date,
             CAST(campaign_id AS STRING) as campaign_id,
             campaign_name,
@@ -45,170 +81,336 @@ def get_campaign_performance_daily(start_date: str = None, end_date: str = None)
             COALESCE(CAST(clicks AS INT64), 0) as clicks,
             COALESCE(spend, 0) as cost,
             0 as conversions,
-            COALESCE(spend, 0) * COALESCE(purchase_roas[SAFE_OFFSET(0)].value, 0) as revenue,
-            COALESCE(purchase_roas[SAFE_OFFSET(0)].value, 0) as roas
+            COALESCE(spend, 0) * COALESCE(purchase_roas[SAFE_OFFSET(0)].value, 0) as revenue
         FROM `{PROJECT}.{DATASET}.meta_ads_insights_daily`
-        WHERE date_start IS NOT NULL
-    )
-    {where_clause}
-    ORDER BY date DESC
+        {where_clause}
+        """
+
+
+def empty_facts() -> pd.DataFrame:
+    """Snapshot vacio con el esquema esperado por las vistas."""
+    return pd.DataFrame(columns=FACT_COLUMNS).astype({"date": "datetime64[ns]"})
+
+
+def _to_date(value) -> date:
+    return pd.Timestamp(value).date()
+
+
+def resolve_date_window(lookback_days: int, end_date=None) -> tuple[date, date]:
+    """
+    Convierte una ventana relativa ("ultimos N dias") en fechas explicitas.
+    Se resuelve en el cliente para que el SQL no use CURRENT_DATE(): BigQuery
+    no cachea queries no deterministas, y asi la misma peticion logica genera
+    siempre el mismo texto y parametros.
     """
-    return execute_query(query)
+    end = _to_date(end_date) if end_date else date.today()
+    return end - timedelta(days=lookback_days), end
 
 
-def get_campaign_performance_monthly(start_date: str = None, end_date: str = None) -> pd.DataFrame:
-    """Rendimiento mensual de campanas."""
-    
-    where_clause = "WHERE cost > 0"
-    if start_date and end_date:
-        where_clause = f"WHERE date BETWEEN '{start_date}' AND '{end_date}'"
-    
+def _daily_facts_query(
+    start_date=None,
+    end_date=None,
+    channels: list[str] = None,
+    campaign_ids: list[str] = None
+) -> tuple[str, dict]:
+    """
+    Query del snapshot diario y sus parametros. Las fuentes cuyo canal no esta
+    en `channels` se omiten del UNION ALL (no se escanean).
+    """
+    sources = [s for s, channel in SOURCE_CHANNELS.items() if not channels or channel in channels]
+    if not sources:
+        return None, {}
+
+    params = {}
+    if start_date:
+        params["start_date"] = _to_date(start_date)
+    if end_date:
+        params["end_date"] = _to_date(end_date)
+    if campaign_ids:
+        # Orden canonico: la misma seleccion produce siempre los mismos parametros
+        params["campaign_ids"] = sorted({str(c) for c in campaign_ids})
+
+    union = "\n        UNION ALL\n".join(
+        _source_select(source, start_date, end_date, campaign_ids) for source in sources
+    )
     query = f"""
     SELECT
-        FORMAT_DATE('%Y-%m', date) as month,
+        date,
         campaign_id,
         campaign_name,
         channel,
+        campaign_status,
+        device,
         SUM(impressions) as impressions,
         SUM(clicks) as clicks,
         SUM(cost) as cost,
         SUM(conversions) as conversions,
-        SUM(revenue) as revenue,
-        SAFE_DIVIDE(SUM(clicks), SUM(impressions)) as ctr,
-        SAFE_DIVIDE(SUM(cost), SUM(clicks)) as cpc,
-        SAFE_DIVIDE(SUM(revenue), SUM(cost)) as roas
-    FROM (
-        SELECT 
-            event_date as date,
-            CAST(campaign_id AS STRING) as campaign_id,
-            campaign_name,
-            'google_ads' as channel,
-            COALESCE(impressions, 0) as impressions,
-            COALESCE(clicks, 0) as clicks,
-            COALESCE(cost_micros, 0) / 1000000 as cost,
-            COALESCE(conversions, 0) as conversions,
-            COALESCE(conversions_value, 0) as revenue
-        FROM `{PROJECT}.{DATASET}.gads_campaign`
-        WHERE event_date IS NOT NULL
+        SUM(revenue) as revenue
+    FROM ({union}
+    )
+    GROUP BY date, campaign_id, campaign_name, channel, campaign_status, device
+    """
+    return query, params
 
-        UNION ALL
 
-        SELECT 
-            date_start as date,
-            CAST(campaign_id AS STRING) as campaign_id,
-            campaign_name,
-            'meta_ads' as channel,
-            COALESCE(CAST(impressions AS INT64), 0) as impressions,
-            COALESCE(CAST(clicks AS INT64), 0) as clicks,
-            COALESCE(spend, 0) as cost,
-            0 as conversions,
-            COALESCE(spend, 0) * COALESCE(purchase_roas[SAFE_OFFSET(0)].value, 0) as revenue
-        FROM `{PROJECT}.{DATASET}.meta_ads_insights_daily`
-        WHERE date_start IS NOT NULL
-    )
-    {where_clause}
-    GROUP BY month, campaign_id, campaign_name, channel
-    ORDER BY month DESC, cost DESC
+def _filter_facts(
+    df: pd.DataFrame,
+    start_date=None,
+    end_date=None,
+    channels: list[str] = None,
+    campaign_ids: list[str] = None
+) -> pd.DataFrame:
+    """Mismos filtros que _daily_facts_query, aplicados sobre un snapshot local."""
+    if df.empty:
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    if start_date:
+        mask &= (df["date"] >= pd.Timestamp(start_date)).to_numpy()
+    if end_date:
+        mask &= (df["date"] <= pd.Timestamp(end_date)).to_numpy()
+    if channels:
+        mask &= df["channel"].isin(channels).to_numpy()
+    if campaign_ids:
+        mask &= df["campaign_id"].isin([str(c) for c in campaign_ids]).to_numpy()
+    return df[mask]
+
+
+@tag_view
+def get_daily_facts(
+    start_date=None,
+    end_date=None,
+    channels: list[str] = None,
+    campaign_ids: list[str] = None
+) -> pd.DataFrame:
+    """
+    Snapshot diario unificado de Google Ads + Meta Ads.
+    Es la unica query que escanea las tablas fuente; el resto de vistas se
+    calculan en memoria a partir de este resultado (cacheado por execute_query).
+    Con DATA_SYNC_MODE=incremental se sirve desde el store local sincronizado.
+    """
+    if settings.data_sync_mode == "incremental":
+        from src.data.sync import sync_daily_facts
+        return _filter_facts(sync_daily_facts(), start_date, end_date, channels, campaign_ids)
+    
+    query, params = _daily_facts_query(start_date, end_date, channels, campaign_ids)
+    if query is None:
+        return empty_facts()
+    
+    # Unico llamador con dtypes compactos: las vistas agregan con observed=True
+    # y ensanchan las medidas antes de sumar (_widen_measures)
+    df = execute_query(query, params, compact=True)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+# =============================================================================
+# AGREGACION LOCAL
+# =============================================================================
+def _safe_divide(numerator, denominator) -> np.ndarray:
+    """Equivalente vectorizado de SAFE_DIVIDE: NaN cuando el denominador es 0."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+def _widen_measures(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Los resultados llegan con enteros reducidos (int8/int16) y quiza float32;
+    se ensanchan antes de sumar para que los totales no desborden.
+    """
+    widened = {
+        col: "int64" if pd.api.types.is_integer_dtype(df[col]) else "float64"
+        for col in FACT_MEASURES
+    }
+    return df.astype(widened)
+
+
+def _sum_measures(df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    grouped = _widen_measures(df).groupby(keys, sort=False, observed=True)
+    return grouped[FACT_MEASURES].sum().reset_index()
+
+
+@tag_view
+def get_campaign_performance_daily(
+    start_date: str = None,
+    end_date: str = None,
+    channels: list[str] = None,
+    campaign_ids: list[str] = None
+) -> pd.DataFrame:
+    """Vista unificada de rendimiento diario de campanas."""
+    df = get_daily_facts(start_date, end_date, channels, campaign_ids).copy()
+    df["roas"] = _safe_divide(df["revenue"], df["cost"])
+    return df.sort_values("date", ascending=False, kind="stable").reset_index(drop=True)
+
+
+@tag_view
+def iter_campaign_performance_daily(
+    start_date: str = None,
+    end_date: str = None,
+    channels: list[str] = None,
+    campaign_ids: list[str] = None,
+    chunk_size: int = None,
+    as_arrow: bool = False
+):
+    """
+    Igual que get_campaign_performance_daily pero en chunks de `chunk_size`
+    filas (sin orden garantizado), para agregaciones y exportes con memoria acotada.
     """
-    return execute_query(query)
+    if settings.data_sync_mode == "incremental":
+        from src.data.sync import sync_daily_facts
+        df = _filter_facts(sync_daily_facts(), start_date, end_date, channels, campaign_ids)
+        chunk_size = chunk_size or settings.query_chunk_size
+        chunks = (df.iloc[i:i + chunk_size] for i in range(0, len(df), chunk_size))
+    else:
+        query, params = _daily_facts_query(start_date, end_date, channels, campaign_ids)
+        if query is None:
+            return
+        chunks = execute_query_iter(query, params, chunk_size, as_arrow=as_arrow)
+
+    for chunk in chunks:
+        if isinstance(chunk, pa.Table):
+            revenue = chunk.column("revenue").to_numpy(zero_copy_only=False)
+            cost = chunk.column("cost").to_numpy(zero_copy_only=False)
+            yield chunk.append_column("roas", pa.array(_safe_divide(revenue, cost)))
+            continue
+        if as_arrow:
+            yield pa.Table.from_pandas(chunk.assign(roas=_safe_divide(chunk["revenue"], chunk["cost"])), preserve_index=False)
+            continue
+        chunk = chunk.copy()
+        chunk["date"] = pd.to_datetime(chunk["date"])
+        chunk["roas"] = _safe_divide(chunk["revenue"], chunk["cost"])
+        yield chunk
+
+
+@tag_view
+def get_campaign_performance_monthly(
+    start_date: str = None,
+    end_date: str = None,
+    channels: list[str] = None,
+    campaign_ids: list[str] = None
+) -> pd.DataFrame:
+    """Rendimiento mensual de campanas."""
+    df = get_daily_facts(start_date, end_date, channels, campaign_ids)
+    df = df[df["cost"] > 0]
+    df = df.assign(month=df["date"].dt.strftime("%Y-%m"))
+
+    monthly = _sum_measures(df, ["month", "campaign_id", "campaign_name", "channel"])
+    monthly["ctr"] = _safe_divide(monthly["clicks"], monthly["impressions"])
+    monthly["cpc"] = _safe_divide(monthly["cost"], monthly["clicks"])
+    monthly["roas"] = _safe_divide(monthly["revenue"], monthly["cost"])
+
+    return monthly.sort_values(["month", "cost"], ascending=[False, False]).reset_index(drop=True)
 
 
-def get_channel_summary() -> pd.DataFrame:
+@tag_view
+def get_channel_summary(
+    start_date: str = None,
+    end_date: str = None,
+    channels: list[str] = None,
+    campaign_ids: list[str] = None
+) -> pd.DataFrame:
     """Resumen por canal (Google Ads vs Meta Ads)."""
-    
-    query = f"""
-    SELECT
-        channel,
-        COUNT(DISTINCT campaign_id) as total_campaigns,
-        SUM(impressions) as total_impressions,
-        SUM(clicks) as total_clicks,
-        SUM(cost) as total_cost,
-        SUM(conversions) as total_conversions,
-        SUM(revenue) as total_revenue,
-        SAFE_DIVIDE(SUM(clicks), SUM(impressions)) as avg_ctr,
-        SAFE_DIVIDE(SUM(cost), SUM(clicks)) as avg_cpc,
-        SAFE_DIVIDE(SUM(revenue), SUM(cost)) as avg_roas
-    FROM (
-        SELECT 
-            CAST(campaign_id AS STRING) as campaign_id,
-            'google_ads' as channel,
-            COALESCE(impressions, 0) as impressions,
-            COALESCE(clicks, 0) as clicks,
-            COALESCE(cost_micros, 0) / 1000000 as cost,
-            COALESCE(conversions, 0) as conversions,
-            COALESCE(conversions_value, 0) as revenue
-        FROM `{PROJECT}.{DATASET}.gads_campaign`
+    df = get_daily_facts(start_date, end_date, channels, campaign_ids)
 
-        UNION ALL
+    grouped = _widen_measures(df).groupby("channel", sort=False, observed=True)
+    summary = grouped[FACT_MEASURES].sum()
+    summary.columns = [f"total_{col}" for col in summary.columns]
+    summary.insert(0, "total_campaigns", grouped["campaign_id"].nunique())
+    summary = summary.reset_index()
 
-        SELECT 
-            CAST(campaign_id AS STRING) as campaign_id,
-            'meta_ads' as channel,
-            COALESCE(CAST(impressions AS INT64), 0) as impressions,
-            COALESCE(CAST(clicks AS INT64), 0) as clicks,
-            COALESCE(spend, 0) as cost,
-            0 as conversions,
-            COALESCE(spend, 0) * COALESCE(purchase_roas[SAFE_OFFSET(0)].value, 0) as revenue
-        FROM `{PROJECT}.{DATASET}.meta_ads_insights_daily`
-    )
-    GROUP BY channel
+    summary["avg_ctr"] = _safe_divide(summary["total_clicks"], summary["total_impressions"])
+    summary["avg_cpc"] = _safe_divide(summary["total_cost"], summary["total_clicks"])
+    summary["avg_roas"] = _safe_divide(summary["total_revenue"], summary["total_cost"])
+    return summary
+
+
+@tag_view
+def get_roas_training_dataset(
+    lookback_days: int = 90,
+    channels: list[str] = None,
+    campaign_ids: list[str] = None,
+    start_date=None,
+    end_date=None
+) -> pd.DataFrame:
+    """
+    Dataset para entrenar modelo de prediccion de ROAS. Con start_date se usa
+    esa ventana explicita en lugar de los ultimos `lookback_days` dias.
     """
-    return execute_query(query)
+    if start_date is None:
+        start_date, end_date = resolve_date_window(lookback_days, end_date)
+    df = get_daily_facts(start_date, end_date, channels, campaign_ids)
+    df = df[df["cost"] > 0]
 
+    daily = _sum_measures(df, ["date", "campaign_id", "campaign_name", "channel"])
+    daily["ctr"] = _safe_divide(daily["clicks"], daily["impressions"])
+    daily["cpc"] = _safe_divide(daily["cost"], daily["clicks"])
+    daily["conversion_rate"] = _safe_divide(daily["conversions"], daily["clicks"])
+    daily["roas"] = _safe_divide(daily["revenue"], daily["cost"])
 
-def get_roas_training_dataset(lookback_days: int = 90) -> pd.DataFrame:
-    """Dataset para entrenar modelo de prediccion de ROAS."""
-    
-    query = f"""
-    SELECT
-        date,
-        campaign_id,
-        campaign_name,
-        channel,
-        SUM(impressions) as impressions,
-        SUM(clicks) as clicks,
-        SUM(cost) as cost,
-        SUM(conversions) as conversions,
-        SUM(revenue) as revenue,
-        SAFE_DIVIDE(SUM(clicks), SUM(impressions)) as ctr,
-        SAFE_DIVIDE(SUM(cost), SUM(clicks)) as cpc,
-        SAFE_DIVIDE(SUM(conversions), SUM(clicks)) as conversion_rate,
-        SAFE_DIVIDE(SUM(revenue), SUM(cost)) as roas,
-        EXTRACT(DAYOFWEEK FROM date) as day_of_week,
-        CASE WHEN EXTRACT(DAYOFWEEK FROM date) IN (1, 7) THEN 1 ELSE 0 END as is_weekend,
-        EXTRACT(MONTH FROM date) as month
-    FROM (
-        SELECT 
-            event_date as date,
-            CAST(campaign_id AS STRING) as campaign_id,
-            campaign_name,
-            'google_ads' as channel,
-            COALESCE(impressions, 0) as impressions,
-            COALESCE(clicks, 0) as clicks,
-            COALESCE(cost_micros, 0) / 1000000 as cost,
-            COALESCE(conversions, 0) as conversions,
-            COALESCE(conversions_value, 0) as revenue
-        FROM `{PROJECT}.{DATASET}.gads_campaign`
-        WHERE event_date IS NOT NULL
-          AND event_date >= DATE_SUB(CURRENT_DATE(), INTERVAL {lookback_days} DAY)
+    # Misma convencion que EXTRACT(DAYOFWEEK) de BigQuery: 1 = domingo, 7 = sabado
+    daily["day_of_week"] = (daily["date"].dt.dayofweek + 1) % 7 + 1
+    daily["is_weekend"] = daily["day_of_week"].isin([1, 7]).astype(int)
+    daily["month"] = daily["date"].dt.month
+    return daily
 
-        UNION ALL
 
-        SELECT 
-            date_start as date,
-            CAST(campaign_id AS STRING) as campaign_id,
-            campaign_name,
-            'meta_ads' as channel,
-            COALESCE(CAST(impressions AS INT64), 0) as impressions,
-            COALESCE(CAST(clicks AS INT64), 0) as clicks,
-            COALESCE(spend, 0) as cost,
-            0 as conversions,
-            COALESCE(spend, 0) * COALESCE(purchase_roas[SAFE_OFFSET(0)].value, 0) as revenue
-        FROM `{PROJECT}.{DATASET}.meta_ads_insights_daily`
-        WHERE date_start IS NOT NULL
-          AND date_start >= DATE_SUB(CURRENT_DATE(), INTERVAL {lookback_days} DAY)
-    )
-    WHERE cost > 0
-    GROUP BY date, campaign_id, campaign_name, channel
+@tag_view
+def get_channel_kpis_daily(days: int = 14, end_date=None, channels: list[str] = None) -> pd.DataFrame:
+    """
+    KPIs diarios por canal de los ultimos `days` dias, agregados en la query:
+    se transfieren ~dias x canales filas en lugar de la tabla diaria completa.
     """
-    return execute_query(query)
\ No newline at end of file
+    start_date, end_date = resolve_date_window(days - 1, end_date)
+
+    if settings.data_sync_mode == "incremental":
+        from src.data.sync import sync_daily_facts
+        df = _filter_facts(sync_daily_facts(), start_date, end_date, channels)
+        daily = _sum_measures(df, ["date", "channel"])
+        daily["ctr"] = _safe_divide(daily["clicks"], daily["impressions"])
+        daily["roas"] = _safe_divide(daily["revenue"], daily["cost"])
+    else:
+        facts_query, params = _daily_facts_query(start_date, end_date, channels)
+        if facts_query is None:
+            return pd.DataFrame(columns=["date", "channel", "impressions", "clicks", "cost", "revenue", "ctr", "roas"])
+        query = f"""
+        SELECT
+            date,
+            channel,
+            SUM(impressions) as impressions,
+            SUM(clicks) as clicks,
+            SUM(cost) as cost,
+            SUM(revenue) as revenue,
+            SAFE_DIVIDE(SUM(clicks), SUM(impressions)) as ctr,
+            SAFE_DIVIDE(SUM(revenue), SUM(cost)) as roas
+        FROM ({facts_query})
+        GROUP BY date, channel
+        """
+        daily = execute_query(query, params)
+        daily["date"] = pd.to_datetime(daily["date"])
+
+    return daily[["date", "channel", "impressions", "clicks", "cost", "revenue", "ctr", "roas"]] \
+        .sort_values(["date", "channel"], ascending=[False, True]).reset_index(drop=True)
+
+
+# =============================================================================
+# VARIANTES ASYNC (para FastAPI; corren en el executor acotado de BigQuery)
+# =============================================================================
+async def get_campaign_performance_daily_async(*args, **kwargs) -> pd.DataFrame:
+    return await run_in_query_executor(get_campaign_performance_daily, *args, **kwargs)
+
+
+async def get_campaign_performance_monthly_async(*args, **kwargs) -> pd.DataFrame:
+    return await run_in_query_executor(get_campaign_performance_monthly, *args, **kwargs)
+
+
+async def get_channel_summary_async(*args, **kwargs) -> pd.DataFrame:
+    return await run_in_query_executor(get_channel_summary, *args, **kwargs)
+
+
+async def get_roas_training_dataset_async(*args, **kwargs) -> pd.DataFrame:
+    return await run_in_query_executor(get_roas_training_dataset, *args, **kwargs)
+
+
+async def get_channel_kpis_daily_async(*args, **kwargs) -> pd.DataFrame:
+    return await run_in_query_executor(get_channel_kpis_daily, *args, **kwargs)
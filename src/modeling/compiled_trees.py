@@ -0,0 +1,293 @@
+"""
+Evaluador de arboles en NumPy puro para modelos XGBoost guardados en JSON.
+
+El modelo se compila a arreglos planos por nivel: cada arbol se completa hasta
+`max_depth` (una hoja poco profunda replica su valor en todas las posiciones
+que cubre) y el nivel l guarda, para los T arboles, sus 2^l nodos contiguos.
+Un lote se evalua con las filas en columnas: en cada nivel se comparan todas
+las filas contra los nodos candidatos de todos los arboles (copia de filas de
+X^T, sin gathers dispersos) y el bit de cada (arbol, fila) se toma del nodo
+alcanzado; el indice de hoja se arma bit a bit.
+
+Reproduce la regla de XGBoost: en float32 `x < umbral` va a la izquierda y los
+NaN siguen `default_left`. Soporta gbtree con objetivos de regresion con enlace
+identidad; cualquier otra cosa levanta ValueError.
+
+Artefacto binario (.forest): los mismos arreglos en un archivo plano, alineados
+a 64 bytes tras un header JSON. `CompiledForest.open` lo mapea en memoria de
+solo lectura, asi que la carga no parsea nada y todos los procesos de serving
+(workers de uvicorn, Streamlit) comparten una copia en el page cache.
+
+    forest = CompiledForest.load("models/roas_model_google_ads.json")
+    forest.predict(X)                 # == XGBRegressor.predict(X) (tolerancia float32)
+    forest.attr("feature_transformer")
+    forest.save("model.forest")
+    CompiledForest.open("model.forest")   # mmap, sin copias
+"""
+import json
+import mmap
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+# Objetivos cuya prediccion es base_score + suma de hojas
+IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:pseudohubererror", "reg:absoluteerror"}
+# Lotes chicos: los intermedios (arboles x filas) quedan en cache
+BATCH_ROWS = 128
+# El layout completo ocupa arboles x 2^profundidad
+MAX_DEPTH = 12
+
+# Formato .forest: MAGIC | largo del header (uint64 LE) | header JSON | arreglos alineados
+MAGIC = b"ROASFRST"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def _parse_float(raw: str) -> float:
+    # XGBoost >= 3 guarda base_score como vector: "[1.6195433E1]"
+    return float(str(raw).strip("[]").split(",")[0])
+
+
+class CompiledForest:
+    """Ensamble de arboles compilado a arreglos planos de NumPy, uno por nivel."""
+
+    def __init__(
+        self,
+        features: list[np.ndarray],
+        thresholds: list[np.ndarray],
+        nan_right: list[np.ndarray],
+        leaves: np.ndarray,
+        base_score: float,
+        num_feature: int,
+        attributes: Optional[dict] = None,
+    ):
+        self.features = features        # nivel l: (T * 2^l,) int32
+        self.thresholds = thresholds    # nivel l: (T * 2^l, 1) float32
+        self.nan_right = nan_right      # nivel l: (T * 2^l, 1) bool
+        self.leaves = leaves            # (T * 2^depth,) float32
+        self.base_score = base_score
+        self.num_feature = num_feature
+        self.attributes = attributes or {}
+        self.n_trees = len(leaves) >> self.depth if self.depth else len(leaves)
+        # Offset de cada arbol dentro de cada nivel
+        self._offsets = [(np.arange(self.n_trees, dtype=np.int32) << level)[:, None] for level in range(self.depth + 1)]
+
+    @property
+    def depth(self) -> int:
+        return len(self.features)
+
+    # =========================================================================
+    # COMPILACION
+    # =========================================================================
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "CompiledForest":
+        with open(path) as f:
+            return cls.from_json(json.load(f))
+
+    @classmethod
+    def from_json(cls, model: dict) -> "CompiledForest":
+        """Compila el dict de `Booster.save_model(*.json)`."""
+        learner = model["learner"]
+        objective = learner["objective"]["name"]
+        booster = learner["gradient_booster"]
+        if booster["name"] != "gbtree":
+            raise ValueError(f"Booster no soportado: {booster['name']}")
+        if objective not in IDENTITY_OBJECTIVES:
+            raise ValueError(f"Objetivo no soportado: {objective}")
+        params = learner["learner_model_param"]
+        if int(params.get("num_target", 1)) != 1 or int(params.get("num_class", 0)) > 1:
+            raise ValueError("Solo se soportan modelos de un target")
+
+        trees = booster["model"]["trees"]
+        attributes = learner.get("attributes", {})
+        # Igual que XGBRegressor.predict: con early stopping solo cuentan los arboles hasta best_iteration
+        if "best_iteration" in attributes:
+            indptr = booster["model"].get("iteration_indptr") or list(range(len(trees) + 1))
+            trees = trees[: indptr[int(attributes["best_iteration"]) + 1]]
+        if any(any(tree.get("split_type", [])) for tree in trees):
+            raise ValueError("Splits categoricos no soportados")
+
+        depth = max(_tree_depth(tree["left_children"], tree["right_children"]) for tree in trees)
+        if depth > MAX_DEPTH:
+            raise ValueError(f"Profundidad {depth} no soportada (maximo {MAX_DEPTH})")
+        n_trees = len(trees)
+        features = [np.zeros((n_trees, 1 << level), dtype=np.int32) for level in range(depth)]
+        thresholds = [np.zeros((n_trees, 1 << level), dtype=np.float32) for level in range(depth)]
+        nan_right = [np.zeros((n_trees, 1 << level), dtype=bool) for level in range(depth)]
+        leaves = np.zeros((n_trees, 1 << depth), dtype=np.float32)
+
+        for t, tree in enumerate(trees):
+            left, right = tree["left_children"], tree["right_children"]
+            conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            stack = [(0, 0, 0)]  # (nodo, nivel, posicion en el nivel)
+            while stack:
+                node, level, pos = stack.pop()
+                if left[node] == -1:
+                    span = 1 << (depth - level)
+                    leaves[t, pos * span:(pos + 1) * span] = conditions[node]
+                    continue
+                features[level][t, pos] = tree["split_indices"][node]
+                thresholds[level][t, pos] = conditions[node]
+                nan_right[level][t, pos] = not tree["default_left"][node]
+                stack.append((left[node], level + 1, 2 * pos))
+                stack.append((right[node], level + 1, 2 * pos + 1))
+
+        return cls(
+            features=[f.ravel() for f in features],
+            thresholds=[t.reshape(-1, 1) for t in thresholds],
+            nan_right=[n.reshape(-1, 1) for n in nan_right],
+            leaves=leaves.ravel(),
+            base_score=_parse_float(params["base_score"]),
+            num_feature=int(params["num_feature"]),
+            attributes=attributes,
+        )
+
+    # =========================================================================
+    # ARTEFACTO BINARIO
+    # =========================================================================
+    def _arrays(self) -> dict[str, np.ndarray]:
+        arrays = {"leaves": self.leaves}
+        for level in range(self.depth):
+            arrays[f"features_{level}"] = self.features[level]
+            arrays[f"thresholds_{level}"] = self.thresholds[level]
+            arrays[f"nan_right_{level}"] = self.nan_right[level]
+        return arrays
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Escribe el artefacto .forest (no es atomico: el registro escribe en staging)."""
+        arrays = self._arrays()
+        specs, offset = [], 0
+        for name, array in arrays.items():
+            specs.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header = json.dumps({
+            "format_version": FORMAT_VERSION,
+            "base_score": self.base_score,
+            "num_feature": self.num_feature,
+            "depth": self.depth,
+            "attributes": self.attributes,
+            "arrays": specs,
+        }).encode()
+        data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+        with open(path, "wb") as f:
+            f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+            for spec, array in zip(specs, arrays.values()):
+                f.seek(data_start + spec["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(data_start + offset)
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> "CompiledForest":
+        """Mapea un .forest en memoria (solo lectura); los arreglos son vistas del mmap."""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} no es un artefacto .forest")
+        header_len = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 8], "little")
+        header_end = len(MAGIC) + 8 + header_len
+        header = json.loads(buffer[len(MAGIC) + 8:header_end])
+        if header["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Version de formato no soportada: {header['format_version']}")
+        data_start = -(-header_end // ALIGNMENT) * ALIGNMENT
+
+        arrays = {
+            spec["name"]: np.frombuffer(
+                buffer, dtype=spec["dtype"], count=int(np.prod(spec["shape"])), offset=data_start + spec["offset"]
+            ).reshape(spec["shape"])
+            for spec in header["arrays"]
+        }
+        depth = header["depth"]
+        return cls(
+            features=[arrays[f"features_{level}"] for level in range(depth)],
+            thresholds=[arrays[f"thresholds_{level}"] for level in range(depth)],
+            nan_right=[arrays[f"nan_right_{level}"] for level in range(depth)],
+            leaves=arrays["leaves"],
+            base_score=header["base_score"],
+            num_feature=header["num_feature"],
+            attributes=header["attributes"],
+        )
+
+    # =========================================================================
+    # INFERENCIA
+    # =========================================================================
+    def attr(self, key: str) -> Optional[str]:
+        """Atributo del booster (misma interfaz que xgb.Booster.attr)."""
+        return self.attributes.get(key)
+
+    def predict(self, X, batch_rows: int = BATCH_ROWS) -> np.ndarray:
+        """Prediccion (float32) para una matriz (n_filas, num_feature); NaN = faltante."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.num_feature:
+            raise ValueError(f"Se esperaban {self.num_feature} columnas, llegaron {X.shape[1]}")
+        out = np.empty(len(X), dtype=np.float32)
+        for start in range(0, len(X), batch_rows):
+            out[start:start + batch_rows] = self._predict_batch(X[start:start + batch_rows])
+        return out
+
+    def _predict_batch(self, X: np.ndarray) -> np.ndarray:
+        xt = np.ascontiguousarray(X.T)  # (features, filas): tomar una feature es copiar una fila
+        n = xt.shape[1]
+        has_nan = bool(np.isnan(xt).any())
+        columns = np.arange(n, dtype=np.int32)
+        index = np.zeros((self.n_trees, n), dtype=np.int32)  # posicion en el nivel actual
+        for level in range(self.depth):
+            x = xt[self.features[level]]  # (T * 2^l, filas): todos los nodos del nivel
+            go_right = x >= self.thresholds[level]
+            if has_nan:
+                go_right |= np.isnan(x) & self.nan_right[level]
+            if level:
+                go_right = np.take(go_right.ravel(), (self._offsets[level] + index) * n + columns)
+            index = (index << 1) | go_right
+        return self.base_score + np.take(self.leaves, self._offsets[self.depth] + index).sum(axis=0, dtype=np.float64)
+
+
+def _tree_depth(left: list[int], right: list[int]) -> int:
+    depth = [0] * len(left)
+    # Los hijos siempre tienen id mayor que el padre en los arboles de XGBoost
+    for node, child in enumerate(left):
+        if child != -1:
+            depth[child] = depth[right[node]] = depth[node] + 1
+    return max(depth)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Compara el evaluador NumPy contra xgboost")
+    parser.add_argument("model", nargs="?", default="models/roas_model_google_ads.json")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--export", help="Escribir tambien el artefacto .forest en esta ruta")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    forest = CompiledForest.load(args.model)
+    print(f"Carga JSON:     {(time.perf_counter() - started) * 1000:8.1f} ms ({Path(args.model).stat().st_size / 1e3:.0f} KB)")
+    if args.export:
+        forest.save(args.export)
+        started = time.perf_counter()
+        forest = CompiledForest.open(args.export)
+        print(f"Carga .forest:  {(time.perf_counter() - started) * 1000:8.1f} ms ({Path(args.export).stat().st_size / 1e3:.0f} KB)")
+
+    import xgboost as xgb
+
+    reference = xgb.Booster()
+    reference.load_model(args.model)
+    rng = np.random.default_rng(0)
+    X = rng.lognormal(0, 2, (args.rows, forest.num_feature)).astype(np.float32)
+    X[rng.random(X.shape) < 0.01] = np.nan
+
+    started = time.perf_counter()
+    ours = forest.predict(X)
+    ours_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    theirs = reference.inplace_predict(X)
+    theirs_seconds = time.perf_counter() - started
+    print(f"{forest.n_trees} arboles, profundidad {forest.depth}, {args.rows} filas")
+    print(f"  numpy:   {ours_seconds * 1000:8.1f} ms")
+    print(f"  xgboost: {theirs_seconds * 1000:8.1f} ms")
+    print(f"  max |diff|: {np.abs(ours - theirs).max():.2e}")
@@ -0,0 +1,381 @@
+"""
+Feature store versionado en disco para los datasets de entrenamiento.
+
+Guarda el resultado de `build_features_dataframe` para no volver a consultar
+BigQuery ni repetir la limpieza en cada entrenamiento, backtest o barrido de
+hiperparametros. Para historiales que no caben en memoria,
+`build_features_chunked` escribe la misma entrada ventana a ventana.
+Cada entrada se identifica por:
+
+- lookback: ventana en dias del dataset
+- watermark: ultima fecha de datos (watermarks del sync incremental, o el dia
+  actual en modo full, donde la ventana se resuelve contra la fecha de hoy)
+- version de features: hash del codigo de `features.py` y `rolling.py`
+
+Layout de una entrada:
+    {FEATURE_STORE_DIR}/lookback=90/wm=2024-03-31/fv=1a2b3c4d5e6f/
+        keys.parquet   columnas no numericas (date, campaign_id, channel, ...)
+        numeric.npy    columnas numericas como matriz float64 (mmap, zero-copy)
+        meta.json      columnas, filas y claves de la entrada
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.config import settings
+from src.modeling import features as features_module, rolling as rolling_module
+from src.modeling.features import (
+    INPUT_COLUMNS,
+    MIN_CAMPAIGN_ROWS,
+    TARGET_MAX,
+    TARGET_WINSORIZE_QUANTILE,
+    build_features_dataframe,
+    get_target_column,
+    iter_feature_windows,
+)
+
+logger = logging.getLogger(__name__)
+
+KEYS_FILE = "keys.parquet"
+NUMERIC_FILE = "numeric.npy"
+META_FILE = "meta.json"
+
+# Volcado intermedio de build_features_chunked (dentro del directorio temporal)
+SPOOL_NUMERIC_FILE = "spool.f8"
+SPOOL_KEYS_FILE = "spool.parquet"
+
+
+@lru_cache()
+def feature_version() -> str:
+    """Hash del codigo de features: cambia cuando cambia la limpieza o las features."""
+    digest = hashlib.sha256()
+    for module in (features_module, rolling_module):
+        digest.update(Path(module.__file__).read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def current_watermark() -> str:
+    """Ultima fecha de datos disponible, sin consultar BigQuery."""
+    if settings.data_sync_mode == "incremental":
+        from src.data.sync import load_state
+        watermarks = load_state()["watermarks"]
+        if watermarks:
+            return max(watermarks.values())
+    return date.today().isoformat()
+
+
+def _entry_dir(lookback_days: int, watermark: str, version: str) -> Path:
+    return Path(settings.feature_store_dir) / f"lookback={lookback_days}" / f"wm={watermark}" / f"fv={version}"
+
+
+def save_features(df: pd.DataFrame, lookback_days: int, watermark: Optional[str] = None) -> Path:
+    """
+    Guarda un dataset de features. La entrada se escribe en un directorio
+    temporal y se renombra, de modo que un lector nunca ve una entrada a medias.
+    """
+    watermark = watermark or current_watermark()
+    path = _entry_dir(lookback_days, watermark, feature_version())
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    numeric_columns = _numeric_columns(df)
+    key_columns = [col for col in df.columns if col not in numeric_columns]
+
+    tmp_dir = Path(tempfile.mkdtemp(dir=path.parent, prefix=".tmp-"))
+    try:
+        df[key_columns].to_parquet(tmp_dir / KEYS_FILE, index=False)
+        matrix = np.ascontiguousarray(df[numeric_columns].to_numpy(dtype=np.float64))
+        np.save(tmp_dir / NUMERIC_FILE, matrix)
+        _publish(tmp_dir, path, _entry_meta(lookback_days, watermark, len(df), list(df.columns), key_columns, numeric_columns))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Feature store: {len(df)} filas -> {path}")
+    return path
+
+
+def _numeric_columns(df: pd.DataFrame) -> list[str]:
+    return [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+
+
+def _entry_meta(lookback_days: int, watermark: str, rows: int, columns: list[str], key_columns: list[str], numeric_columns: list[str]) -> dict:
+    return {
+        "lookback_days": lookback_days,
+        "watermark": watermark,
+        "feature_version": feature_version(),
+        "rows": rows,
+        "columns": columns,
+        "key_columns": key_columns,
+        "numeric_columns": numeric_columns,
+        "created_at": time.time(),
+    }
+
+
+def _publish(tmp_dir: Path, path: Path, meta: dict) -> None:
+    """Escribe meta.json y renombra el directorio temporal a la entrada final."""
+    with open(tmp_dir / META_FILE, "w") as f:
+        json.dump(meta, f, indent=2)
+    try:
+        os.rename(tmp_dir, path)
+    except OSError:
+        # Otro proceso escribio la misma entrada primero
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# =============================================================================
+# CONSTRUCCION POR VENTANAS (MEMORIA ACOTADA)
+# =============================================================================
+def _spool_windows(windows, tmp_dir: Path) -> Optional[dict]:
+    """
+    Vuelca cada ventana a disco: columnas numericas como filas float64 y
+    claves como un row group de Parquet. Cuenta los registros por campana.
+    """
+    spool, keys_writer = None, None
+    try:
+        with open(tmp_dir / SPOOL_NUMERIC_FILE, "wb") as numeric_file:
+            for df in windows:
+                if spool is None:
+                    numeric_columns = _numeric_columns(df)
+                    key_columns = [col for col in df.columns if col not in numeric_columns]
+                    spool = {
+                        "columns": list(df.columns),
+                        "key_columns": key_columns,
+                        "numeric_columns": numeric_columns,
+                        "group_rows": [],
+                        "campaign_rows": pd.Series(dtype=np.float64),
+                    }
+                    # Esquema fijo: las ventanas no comparten categorias ni tipos inferidos
+                    keys_writer = pq.ParquetWriter(tmp_dir / SPOOL_KEYS_FILE, pa.schema([
+                        (col, pa.timestamp("ns") if pd.api.types.is_datetime64_any_dtype(df[col]) else pa.string())
+                        for col in key_columns
+                    ]))
+                keys = df[spool["key_columns"]].astype({col: object for col in spool["key_columns"] if col != "date"})
+                keys_writer.write_table(pa.Table.from_pandas(keys, schema=keys_writer.schema, preserve_index=False))
+                np.ascontiguousarray(df[spool["numeric_columns"]].to_numpy(dtype=np.float64)).tofile(numeric_file)
+                spool["group_rows"].append(len(df))
+                counts = df["campaign_id"].astype(object).value_counts()
+                spool["campaign_rows"] = spool["campaign_rows"].add(counts, fill_value=0)
+    finally:
+        if keys_writer is not None:
+            keys_writer.close()
+    return spool
+
+
+def _spooled_groups(tmp_dir: Path, spool: dict, columns: list[str] = None):
+    """Recorre el volcado por ventana: (claves, bloque numerico) sin mapear todo el archivo."""
+    keys_file = pq.ParquetFile(tmp_dir / SPOOL_KEYS_FILE)
+    n_cols = len(spool["numeric_columns"])
+    with open(tmp_dir / SPOOL_NUMERIC_FILE, "rb") as numeric_file:
+        for group, rows in enumerate(spool["group_rows"]):
+            # Lectura secuencial: cada bloque continua donde termino el anterior
+            block = np.fromfile(numeric_file, dtype=np.float64, count=rows * n_cols).reshape(rows, n_cols)
+            yield keys_file.read_row_group(group, columns=columns), block
+
+
+def build_features_chunked(lookback_days: int, watermark: Optional[str] = None, window_days: int = None) -> Optional[Path]:
+    """
+    Construye y guarda una entrada sin materializar el dataset completo, con
+    las mismas filas y valores que build_features_dataframe:
+
+    1. Las ventanas de iter_feature_windows (FEATURE_BUILD_WINDOW_DAYS dias,
+       leidas del sync local o de BigQuery) se vuelcan a disco contando los
+       registros por campana.
+    2. Una pasada por el volcado calcula el percentil del ROAS por canal sobre
+       las campanas validas y cuenta las filas finales.
+    3. Otra pasada aplica los filtros y el clip y escribe numeric.npy (como
+       memmap) y keys.parquet de la entrada.
+
+    La memoria queda acotada por la ventana mas grande mas una columna de
+    ROAS por canal. Retorna la ruta de la entrada o None si no hay datos.
+    """
+    watermark = watermark or current_watermark()
+    window_days = window_days or settings.feature_build_window_days
+    path = _entry_dir(lookback_days, watermark, feature_version())
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_dir = Path(tempfile.mkdtemp(dir=path.parent, prefix=".tmp-"))
+    try:
+        spool = _spool_windows(iter_feature_windows(lookback_days, window_days), tmp_dir)
+        if spool is None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return None
+
+        numeric_columns = spool["numeric_columns"]
+        target_index = numeric_columns.index(get_target_column())
+        required_index = [numeric_columns.index(col) for col in INPUT_COLUMNS + [get_target_column()]]
+        campaign_rows = spool["campaign_rows"]
+        valid_campaigns = set(campaign_rows.index[campaign_rows >= MIN_CAMPAIGN_ROWS])
+
+        def row_masks(keys: pa.Table, block: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+            """(campana valida, fila final) de un bloque del volcado."""
+            valid = keys.column("campaign_id").to_pandas().isin(valid_campaigns).to_numpy()
+            keep = valid & ~np.isnan(block[:, required_index]).any(axis=1)
+            return valid, keep
+
+        # Pasada 2: percentil del ROAS por canal (campanas validas) y filas finales
+        roas_by_channel: dict[str, list[np.ndarray]] = {}
+        rows = 0
+        for keys, block in _spooled_groups(tmp_dir, spool, columns=["campaign_id", "channel"]):
+            valid, keep = row_masks(keys, block)
+            channels = keys.column("channel").to_numpy(zero_copy_only=False)
+            for channel in pd.unique(channels[valid]):
+                roas_by_channel.setdefault(channel, []).append(block[valid & (channels == channel), target_index])
+            rows += int(keep.sum())
+        roas_upper = {
+            channel: float(np.nanquantile(np.concatenate(parts), TARGET_WINSORIZE_QUANTILE))
+            for channel, parts in roas_by_channel.items()
+        }
+        del roas_by_channel
+        if rows == 0:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return None
+
+        # Pasada 3: filas finales con el ROAS acotado
+        matrix = np.lib.format.open_memmap(tmp_dir / NUMERIC_FILE, mode="w+", dtype=np.float64, shape=(rows, len(numeric_columns)))
+        start = 0
+        with pq.ParquetWriter(tmp_dir / KEYS_FILE, pq.ParquetFile(tmp_dir / SPOOL_KEYS_FILE).schema_arrow) as keys_writer:
+            for keys, block in _spooled_groups(tmp_dir, spool):
+                _, keep = row_masks(keys, block)
+                block = block[keep]
+                channels = keys.column("channel").to_numpy(zero_copy_only=False)[keep]
+                upper = np.array([roas_upper[channel] for channel in channels], dtype=np.float64)
+                block[:, target_index] = np.minimum(np.minimum(block[:, target_index], upper), TARGET_MAX)
+                matrix[start:start + len(block)] = block
+                start += len(block)
+                keys_writer.write_table(keys.filter(pa.array(keep)))
+        matrix.flush()
+        del matrix
+
+        (tmp_dir / SPOOL_NUMERIC_FILE).unlink()
+        (tmp_dir / SPOOL_KEYS_FILE).unlink()
+        _publish(tmp_dir, path, _entry_meta(lookback_days, watermark, rows, spool["columns"], spool["key_columns"], numeric_columns))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Feature store (por ventanas de {window_days} dias): {rows} filas -> {path}")
+    return path
+
+
+def _load_meta(path: Path) -> Optional[dict]:
+    try:
+        with open(path / META_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_feature_matrix(
+    lookback_days: int,
+    columns: list[str] = None,
+    watermark: Optional[str] = None
+) -> Optional[tuple[np.ndarray, list[str]]]:
+    """
+    Matriz numerica de una entrada como np.memmap de solo lectura (sin copiar).
+    Con `columns` retorna solo esas columnas (esto si copia). None si no existe.
+    """
+    path = _entry_dir(lookback_days, watermark or current_watermark(), feature_version())
+    meta = _load_meta(path)
+    if meta is None:
+        return None
+
+    matrix = np.load(path / NUMERIC_FILE, mmap_mode="r")
+    numeric_columns = meta["numeric_columns"]
+    if columns is None:
+        return matrix, numeric_columns
+    index = [numeric_columns.index(col) for col in columns]
+    return np.asarray(matrix[:, index]), list(columns)
+
+
+def load_feature_keys(
+    lookback_days: int,
+    columns: list[str] = None,
+    watermark: Optional[str] = None,
+    categorical: list[str] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Columnas no numericas de una entrada (solo las pedidas). Las columnas en
+    `categorical` se leen como diccionario (pd.Categorical, sin un str por fila).
+    None si no existe.
+    """
+    path = _entry_dir(lookback_days, watermark or current_watermark(), feature_version())
+    if _load_meta(path) is None:
+        return None
+    table = pq.read_table(path / KEYS_FILE, columns=columns, read_dictionary=categorical)
+    return table.to_pandas()
+
+
+def load_features(lookback_days: int, watermark: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """
+    Dataset guardado o None si no existe para (lookback, watermark, version).
+    Las columnas numericas son vistas de solo lectura sobre el .npy mapeado en memoria.
+    """
+    path = _entry_dir(lookback_days, watermark or current_watermark(), feature_version())
+    meta = _load_meta(path)
+    if meta is None:
+        return None
+
+    matrix = np.load(path / NUMERIC_FILE, mmap_mode="r")
+    df = pd.DataFrame(matrix, columns=meta["numeric_columns"], copy=False)
+    keys = pd.read_parquet(path / KEYS_FILE)
+    for col in meta["key_columns"]:
+        df[col] = keys[col].to_numpy()
+    return df[meta["columns"]]
+
+
+def get_features(lookback_days: int = 90, refresh: bool = False) -> pd.DataFrame:
+    """
+    Dataset de entrenamiento desde el feature store; si no existe (o refresh=True)
+    se construye con build_features_dataframe y se guarda.
+    """
+    watermark = current_watermark()
+    if settings.feature_store_enabled and not refresh:
+        df = load_features(lookback_days, watermark)
+        if df is not None:
+            logger.info(f"Feature store hit: lookback={lookback_days} wm={watermark} fv={feature_version()}")
+            return df
+
+    df = build_features_dataframe(lookback_days)
+    if settings.feature_store_enabled and not df.empty:
+        save_features(df, lookback_days, watermark)
+    return df
+
+
+def prune_feature_store(keep_watermarks: int = 3) -> int:
+    """
+    Elimina entradas de versiones de features antiguas y conserva solo los
+    ultimos `keep_watermarks` watermarks por lookback. Retorna las eliminadas.
+    """
+    root = Path(settings.feature_store_dir)
+    removed = 0
+    for lookback_dir in root.glob("lookback=*"):
+        watermark_dirs = sorted(lookback_dir.glob("wm=*"), reverse=True)
+        for i, watermark_dir in enumerate(watermark_dirs):
+            for version_dir in watermark_dir.glob("fv=*"):
+                if i >= keep_watermarks or version_dir.name != f"fv={feature_version()}":
+                    shutil.rmtree(version_dir, ignore_errors=True)
+                    removed += 1
+            if not any(watermark_dir.iterdir()):
+                watermark_dir.rmdir()
+    return removed
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    df = get_features(90)
+    print(f"Features: {len(df)} filas, version {feature_version()}, watermark {current_watermark()}")
+    print(f"Tiempo: {(time.perf_counter() - started) * 1000:.0f} ms")
+    print(f"Entradas eliminadas: {prune_feature_store()}")
@@ -1,7 +1,24 @@
 ﻿"""Construccion de features para el modelo de prediccion de ROAS."""
+import json
+from datetime import timedelta
 import pandas as pd
 import numpy as np
-from src.data.views import get_roas_training_dataset
+from src.data.views import get_roas_training_dataset, resolve_date_window
+from src.modeling.rolling import MAX_WINDOW, ROLLING_FEATURES, RollingState, add_rolling_features, update_rolling_features
+
+
+# Columnas de entrada del FeatureTransformer (en este orden si se pasa un ndarray,
+# seguidas de las features de historial que use el modelo)
+INPUT_COLUMNS = ["impressions", "clicks", "cost", "day_of_week", "month"]
+
+# Features winsorizadas: limite superior = percentil aprendido en fit()
+WINSORIZED_FEATURES = ["impressions", "clicks", "cost", "ctr", "cpc"]
+WINSORIZE_QUANTILE = 0.99
+
+# Limpieza del dataset: registros minimos por campana y limites del target
+MIN_CAMPAIGN_ROWS = 10
+TARGET_WINSORIZE_QUANTILE = 0.95
+TARGET_MAX = 100
 
 
 def build_features_dataframe(lookback_days: int = 90) -> pd.DataFrame:
@@ -9,7 +26,9 @@ def build_features_dataframe(lookback_days: int = 90) -> pd.DataFrame:
     Construye el dataframe de features para entrenar el modelo.
     Incluye limpieza de datos, tratamiento de outliers y normalizacion.
     """
-    df = get_roas_training_dataset(lookback_days)
+    # MAX_WINDOW dias extra: historial para las features moviles del inicio de la ventana
+    start_date, _ = resolve_date_window(lookback_days)
+    df = get_roas_training_dataset(lookback_days + MAX_WINDOW)
     
     if df.empty:
         return df
@@ -17,6 +36,11 @@ def build_features_dataframe(lookback_days: int = 90) -> pd.DataFrame:
     # Asegurar que date es datetime
     df["date"] = pd.to_datetime(df["date"])
     
+    # Features de historial por campana (estado incremental persistido)
+    history = update_rolling_features(df)
+    df = df[df["date"] >= pd.Timestamp(start_date)]
+    df = add_rolling_features(df, history)
+    
     # =========================================================================
     # LIMPIEZA DE DATOS
     # =========================================================================
@@ -25,8 +49,8 @@ def build_features_dataframe(lookback_days: int = 90) -> pd.DataFrame:
     df = df[df["cost"] > 0].copy()
     
     # 2. Filtrar campañas con muy pocos registros (min 10 por campaña)
-    campaign_counts = df.groupby("campaign_id").size()
-    valid_campaigns = campaign_counts[campaign_counts >= 10].index
+    campaign_counts = df.groupby("campaign_id", observed=True).size()
+    valid_campaigns = campaign_counts[campaign_counts >= MIN_CAMPAIGN_ROWS].index
     df = df[df["campaign_id"].isin(valid_campaigns)].copy()
     
     # =========================================================================
@@ -36,25 +60,14 @@ def build_features_dataframe(lookback_days: int = 90) -> pd.DataFrame:
     # 3. Winsorización: limitar ROAS al percentil 95 por canal
     for channel in df["channel"].unique():
         mask = df["channel"] == channel
-        p95 = df.loc[mask, "roas"].quantile(0.95)
+        p95 = df.loc[mask, "roas"].quantile(TARGET_WINSORIZE_QUANTILE)
         df.loc[mask, "roas"] = df.loc[mask, "roas"].clip(upper=p95)
     
     # 4. Clip final de seguridad (max 100)
-    df["roas"] = df["roas"].clip(upper=100)
+    df["roas"] = df["roas"].clip(upper=TARGET_MAX)
     
-    # 5. Winsorización de features numéricas extremas
-    numeric_cols = ["impressions", "clicks", "cost", "ctr", "cpc"]
-    for col in numeric_cols:
-        if col in df.columns:
-            # Convertir a float para evitar problemas de tipo
-            df[col] = df[col].astype(float)
-            p99 = df[col].quantile(0.99)
-            df[col] = df[col].clip(upper=p99)
-    
-    # =========================================================================
-    # FEATURE ENGINEERING
-    # =========================================================================
-    df = add_derived_features(df)
+    # La winsorizacion de features (p99) y las features derivadas las aplica
+    # FeatureTransformer, ajustado solo con el split de entrenamiento.
     
     # =========================================================================
     # LIMPIEZA FINAL
@@ -62,40 +75,39 @@ def build_features_dataframe(lookback_days: int = 90) -> pd.DataFrame:
     
     # Limpiar valores nulos e infinitos
     df = df.replace([np.inf, -np.inf], np.nan)
-    df = df.dropna(subset=get_feature_columns() + [get_target_column()])
+    df = df.dropna(subset=INPUT_COLUMNS + [get_target_column()])
     
     return df
 
 
-def add_derived_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Agrega features derivadas al dataframe."""
-    df = df.copy()
-    
-    # Log de cost para normalizar (reduce efecto de outliers)
-    if "cost" in df.columns:
-        df["log_cost"] = np.log1p(df["cost"])
-    
-    # Log de impressions
-    if "impressions" in df.columns:
-        df["log_impressions"] = np.log1p(df["impressions"])
-    
-    # Ratio clicks/impressions adicional
-    if "clicks" in df.columns and "impressions" in df.columns:
-        df["click_impression_ratio"] = df["clicks"] / (df["impressions"] + 1)
-    
-    # Feature de canal como variable numérica
-    if "channel" in df.columns:
-        df["is_google_ads"] = (df["channel"] == "google_ads").astype(int)
-    
-    # Feature de eficiencia de costo
-    if "cost" in df.columns and "clicks" in df.columns:
-        df["cost_per_click_ratio"] = df["cost"] / (df["clicks"] + 1)
-    
-    # Feature de engagement
-    if "clicks" in df.columns and "impressions" in df.columns:
-        df["engagement_score"] = (df["clicks"] * 100) / (df["impressions"] + 1)
-    
-    return df
+def iter_feature_windows(lookback_days: int = 90, window_days: int = 30):
+    """
+    Filas de build_features_dataframe por ventanas de `window_days` dias, en
+    orden de fecha, antes de los pasos que necesitan el dataset completo
+    (minimo de registros por campana, winsorizacion y clip del ROAS y dropna;
+    ver feature_store.build_features_chunked).
+
+    Las features de historial las calcula un RollingState en memoria que
+    avanza dia a dia: mismos valores que el calculo completo, sin persistir
+    el estado incremental.
+    """
+    start_date, end_date = resolve_date_window(lookback_days)
+    state = RollingState()
+    window_start = start_date - timedelta(days=MAX_WINDOW)
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=window_days - 1), end_date)
+        df = get_roas_training_dataset(start_date=window_start, end_date=window_end)
+        window_start = window_end + timedelta(days=1)
+        if df.empty:
+            continue
+        
+        df["date"] = pd.to_datetime(df["date"])
+        history = state.step_days(df)
+        df = df[(df["date"] >= pd.Timestamp(start_date)) & (df["cost"] > 0)]
+        if df.empty:
+            continue
+        df = add_rolling_features(df, history)
+        yield df.replace([np.inf, -np.inf], np.nan)
 
 
 def get_feature_columns() -> list[str]:
@@ -113,7 +125,7 @@ def get_feature_columns() -> list[str]:
         "log_impressions",
         "click_impression_ratio",
         "is_google_ads"
-    ]
+    ] + ROLLING_FEATURES
 
 
 def get_target_column() -> str:
@@ -121,6 +133,92 @@ def get_target_column() -> str:
     return "roas"
 
 
+# =============================================================================
+# TRANSFORMER COMPARTIDO ENTRENAMIENTO / INFERENCIA
+# =============================================================================
+class FeatureTransformer:
+    """
+    Convierte un lote (DataFrame o ndarray) en la matriz de features del modelo.
+    
+    Se ajusta con el split de entrenamiento (limites de winsorizacion) y se
+    guarda junto al modelo, de modo que entrenamiento e inferencia producen
+    exactamente la misma matriz.
+    """
+
+    def __init__(self, features: list[str] = None, clip_upper: dict[str, float] = None):
+        self.features = list(features or get_feature_columns())
+        self.clip_upper = dict(clip_upper or {})
+
+    @property
+    def input_columns(self) -> list[str]:
+        """Columnas de entrada esperadas: INPUT_COLUMNS + features de historial usadas."""
+        return INPUT_COLUMNS + [f for f in self.features if f in ROLLING_FEATURES]
+
+    def _base_columns(self, data) -> dict[str, np.ndarray]:
+        """Columnas de entrada como float64 + ctr y cpc (0 si el denominador es 0)."""
+        if isinstance(data, pd.DataFrame):
+            missing = [col for col in self.input_columns if col not in data.columns]
+            if missing:
+                raise ValueError(f"Faltan columnas de entrada: {missing}")
+            cols = {col: data[col].to_numpy(dtype=np.float64) for col in self.input_columns}
+            if "is_google_ads" in self.features:
+                cols["is_google_ads"] = (data["channel"].astype(object) == "google_ads").to_numpy(dtype=np.float64)
+        else:
+            values = np.asarray(data, dtype=np.float64)
+            if values.ndim == 1:
+                values = values[np.newaxis, :]
+            if values.shape[1] != len(self.input_columns):
+                raise ValueError(f"Se esperaban {len(self.input_columns)} columnas ({self.input_columns}), hay {values.shape[1]}")
+            if "is_google_ads" in self.features:
+                raise ValueError("is_google_ads requiere un DataFrame con la columna channel")
+            cols = dict(zip(self.input_columns, values.T))
+        
+        impressions, clicks, cost = cols["impressions"], cols["clicks"], cols["cost"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cols["ctr"] = np.where(impressions > 0, clicks / impressions, 0.0)
+            cols["cpc"] = np.where(clicks > 0, cost / clicks, 0.0)
+        return cols
+
+    def fit(self, data) -> "FeatureTransformer":
+        """Aprende los limites de winsorizacion (percentil 99) de cada feature."""
+        cols = self._base_columns(data)
+        self.clip_upper = {
+            col: float(np.nanquantile(cols[col], WINSORIZE_QUANTILE))
+            for col in WINSORIZED_FEATURES
+        }
+        return self
+
+    def transform(self, data) -> np.ndarray:
+        """Matriz (n_filas x n_features) en el orden de self.features."""
+        cols = self._base_columns(data)
+        for col, upper in self.clip_upper.items():
+            cols[col] = np.minimum(cols[col], upper)
+        
+        cols["is_weekend"] = np.isin(cols["day_of_week"], [1, 7]).astype(np.float64)
+        cols["log_cost"] = np.log1p(cols["cost"])
+        cols["log_impressions"] = np.log1p(cols["impressions"])
+        cols["click_impression_ratio"] = cols["clicks"] / (cols["impressions"] + 1)
+        
+        return np.column_stack([cols[feature] for feature in self.features])
+
+    def fit_transform(self, data) -> np.ndarray:
+        return self.fit(data).transform(data)
+
+    def to_dict(self) -> dict:
+        return {"features": self.features, "clip_upper": self.clip_upper}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FeatureTransformer":
+        return cls(features=data["features"], clip_upper=data.get("clip_upper"))
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, raw: str) -> "FeatureTransformer":
+        return cls.from_dict(json.loads(raw))
+
+
 def temporal_train_valid_test_split(
     df: pd.DataFrame,
     train_ratio: float = 0.70,
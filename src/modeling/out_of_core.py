@@ -0,0 +1,370 @@
+"""
+Entrenamiento out-of-core para historiales largos (anos de filas campana x dispositivo).
+
+El dataset nunca se materializa completo: si la entrada del feature store no
+existe se construye por ventanas de fechas (feature_store.build_features_chunked),
+la matriz numerica se lee como np.memmap y un `xgb.DataIter` la recorre en
+bloques de OOC_CHUNK_ROWS filas, aplicando el FeatureTransformer bloque a bloque.
+
+- QuantileDMatrix (por defecto): XGBoost guarda solo los indices de bins
+  cuantizados (1 byte por valor) en lugar de la matriz float64.
+- ExtMemQuantileDMatrix (OOC_EXTERNAL_MEMORY=true): las paginas cuantizadas
+  se guardan en disco (OOC_CACHE_DIR) y se leen durante el entrenamiento.
+
+El transformer se ajusta con una muestra del split de train y la evaluacion
+en test tambien se hace por bloques (inplace_predict). Las paginas del memmap
+ya leidas se liberan del RSS (madvise) y se reporta el pico de RSS del proceso
+tras cada etapa.
+
+    python -m src.modeling.out_of_core --lookback 1095
+"""
+import json
+import logging
+import mmap
+import resource
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import xgboost as xgb
+
+from src.config import settings
+from src.modeling.feature_store import build_features_chunked, load_feature_keys, load_feature_matrix
+from src.modeling.features import FeatureTransformer, get_feature_columns, get_target_column
+from src.modeling import registry
+from src.modeling.train import HYPERPARAMS_XGBOOST, MODEL_DIR, _booster_train_params
+
+logger = logging.getLogger(__name__)
+
+TRAIN, VALID, TEST = 0, 1, 2
+TRANSFORMER_SAMPLE_ROWS = 1_000_000
+
+
+def peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso (MB)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def release_pages(matrix: np.ndarray, start_row: int, end_row: int) -> None:
+    """
+    Saca del RSS las paginas del memmap de las filas [start_row, end_row) ya
+    procesadas. Siguen en el page cache del sistema (compartido), solo dejan de
+    contar para este proceso. No hace nada si la matriz no es un np.memmap.
+    """
+    buffer = getattr(matrix, "_mmap", None)
+    if buffer is None or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    row_bytes = matrix.strides[0]
+    base = matrix.offset % mmap.ALLOCATIONGRANULARITY
+    first = (base + start_row * row_bytes) // mmap.PAGESIZE * mmap.PAGESIZE
+    last = min(base + end_row * row_bytes, len(buffer))
+    if last > first:
+        buffer.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+
+# =============================================================================
+# SPLIT TEMPORAL SIN MATERIALIZAR
+# =============================================================================
+def temporal_split_codes(
+    dates: np.ndarray,
+    channel_mask: np.ndarray,
+    train_ratio: float = 0.70,
+    valid_ratio: float = 0.15
+) -> np.ndarray:
+    """
+    Codigo de split por fila (TRAIN/VALID/TEST, -1 fuera del canal) con los
+    mismos cortes que temporal_train_valid_test_split. Un byte por fila.
+    """
+    unique_dates = np.unique(dates[channel_mask])
+    n = len(unique_dates)
+    if n < 3:
+        raise ValueError(f"Se necesitan al menos 3 fechas distintas, hay solo {n}.")
+    train_end = unique_dates[int(n * train_ratio)]
+    valid_end = unique_dates[int(n * (train_ratio + valid_ratio))]
+
+    codes = np.full(len(dates), -1, dtype=np.int8)
+    codes[channel_mask & (dates <= train_end)] = TRAIN
+    codes[channel_mask & (dates > train_end) & (dates <= valid_end)] = VALID
+    codes[channel_mask & (dates > valid_end)] = TEST
+    return codes
+
+
+# =============================================================================
+# ITERADOR POR BLOQUES
+# =============================================================================
+class FeatureChunks:
+    """Bloques (X, y) de un split, leidos del memmap y transformados al vuelo."""
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        split_codes: np.ndarray,
+        split: int,
+        input_index: list[int],
+        target_index: int,
+        transformer: Optional[FeatureTransformer],
+        chunk_rows: int
+    ):
+        self.matrix = matrix
+        self.split_codes = split_codes
+        self.split = split
+        self.input_index = input_index
+        self.target_index = target_index
+        self.transformer = transformer
+        self.chunk_rows = chunk_rows
+
+    @property
+    def n_chunks(self) -> int:
+        """Bloques con filas del split (los que recorre una pasada)."""
+        starts = range(0, len(self.matrix), self.chunk_rows)
+        return sum(bool((self.split_codes[start:start + self.chunk_rows] == self.split).any()) for start in starts)
+
+    def raw(self):
+        """Bloques (columnas de entrada sin transformar, target)."""
+        for start in range(0, len(self.matrix), self.chunk_rows):
+            mask = self.split_codes[start:start + self.chunk_rows] == self.split
+            if not mask.any():
+                continue
+            block = self.matrix[start:start + self.chunk_rows][mask]
+            release_pages(self.matrix, start, start + self.chunk_rows)
+            yield block[:, self.input_index], block[:, self.target_index]
+
+    def __iter__(self):
+        for inputs, y in self.raw():
+            yield self.transformer.transform(inputs), y
+
+
+class ChunkIter(xgb.DataIter):
+    """DataIter de XGBoost sobre FeatureChunks (se recorre una vez por pasada)."""
+
+    def __init__(self, chunks: FeatureChunks, cache_prefix: Optional[str] = None):
+        self.chunks = chunks
+        self._it = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._it is None:
+            self._it = iter(self.chunks)
+        try:
+            X, y = next(self._it)
+        except StopIteration:
+            return False
+        input_data(data=X, label=y)
+        return True
+
+    def reset(self) -> None:
+        self._it = None
+
+
+def fit_transformer_sampled(chunks: FeatureChunks, features: list[str], sample_rows: int, seed: int = 42) -> FeatureTransformer:
+    """Ajusta el transformer con una muestra uniforme (por bloques) del split de train."""
+    total = int((chunks.split_codes == chunks.split).sum())
+    fraction = min(1.0, sample_rows / max(total, 1))
+    rng = np.random.default_rng(seed)
+    sample = [inputs[rng.random(len(inputs)) < fraction] for inputs, _ in chunks.raw()]
+    return FeatureTransformer(features).fit(np.concatenate(sample))
+
+
+def stream_metrics(booster: xgb.Booster, chunks: FeatureChunks, constant: Optional[float] = None) -> dict:
+    """RMSE, MAE y R² acumulados bloque a bloque (constant = baseline de media)."""
+    n, sse, sae, sum_y, sum_y2 = 0, 0.0, 0.0, 0.0, 0.0
+    for X, y in chunks:
+        y_pred = np.full(len(y), constant) if constant is not None else booster.inplace_predict(X)
+        error = np.clip(y_pred, 0, None) - y
+        n += len(y)
+        sse += float(error @ error)
+        sae += float(np.abs(error).sum())
+        sum_y += float(y.sum())
+        sum_y2 += float(y @ y)
+    sst = sum_y2 - sum_y * sum_y / n
+    return {
+        "rmse": float(np.sqrt(sse / n)),
+        "mae": sae / n,
+        "r2": float(1 - sse / sst) if sst > 0 else 0.0,
+    }
+
+
+# =============================================================================
+# ENTRENAMIENTO
+# =============================================================================
+def train_channel_out_of_core(
+    matrix: np.ndarray,
+    numeric_columns: list[str],
+    dates: np.ndarray,
+    channel_mask: np.ndarray,
+    channel: str,
+    hyperparams: dict = None,
+    external_memory: bool = None,
+    chunk_rows: int = None,
+    n_threads: int = -1
+) -> dict:
+    """
+    Entrena XGBoost (hist) de un canal recorriendo el memmap por bloques.
+    `dates` (datetime64[D]) y `channel_mask` (bool) tienen una entrada por fila de `matrix`.
+    """
+    hyperparams = hyperparams or HYPERPARAMS_XGBOOST
+    external_memory = settings.ooc_external_memory if external_memory is None else external_memory
+    chunk_rows = chunk_rows or settings.ooc_chunk_rows
+    target = get_target_column()
+    stages = {}
+    started = time.perf_counter()
+
+    print(f"\n{'='*60}")
+    print(f"ENTRENAMIENTO OUT-OF-CORE: {channel.upper()}")
+    print(f"{'='*60}")
+
+    if channel_mask.sum() < 30:
+        print(f"  ⚠️  Datos insuficientes: {int(channel_mask.sum())} registros")
+        return {"status": "skipped", "reason": "insufficient_data"}
+    codes = temporal_split_codes(dates, channel_mask)
+    splits = {name: int((codes == code).sum()) for name, code in [("train", TRAIN), ("valid", VALID), ("test", TEST)]}
+    print(f"  Train: {splits['train']} | Valid: {splits['valid']} | Test: {splits['test']}")
+
+    features = [f for f in get_feature_columns() if f != "is_google_ads"]
+    transformer = FeatureTransformer(features)
+    input_index = [numeric_columns.index(col) for col in transformer.input_columns]
+    target_index = numeric_columns.index(target)
+
+    def chunks(split: int) -> FeatureChunks:
+        return FeatureChunks(matrix, codes, split, input_index, target_index, transformer, chunk_rows)
+
+    transformer.clip_upper = fit_transformer_sampled(chunks(TRAIN), features, TRANSFORMER_SAMPLE_ROWS).clip_upper
+    stages["transformer"] = peak_rss_mb()
+
+    # DMatrix cuantizados construidos desde el iterador
+    cache_dir = Path(settings.ooc_cache_dir) / channel
+    if external_memory:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        train_iter = ChunkIter(chunks(TRAIN), cache_prefix=str(cache_dir / "train"))
+        valid_iter = ChunkIter(chunks(VALID), cache_prefix=str(cache_dir / "valid"))
+        dtrain = xgb.ExtMemQuantileDMatrix(train_iter, max_bin=settings.ooc_max_bin, nthread=n_threads)
+        dvalid = xgb.ExtMemQuantileDMatrix(valid_iter, ref=dtrain, nthread=n_threads)
+    else:
+        train_iter = ChunkIter(chunks(TRAIN))
+        valid_iter = ChunkIter(chunks(VALID))
+        dtrain = xgb.QuantileDMatrix(train_iter, max_bin=settings.ooc_max_bin, nthread=n_threads)
+        dvalid = xgb.QuantileDMatrix(valid_iter, ref=dtrain, nthread=n_threads)
+    stages["dmatrix"] = peak_rss_mb()
+    n_chunks = train_iter.chunks.n_chunks
+    print(f"  DMatrix {'externa' if external_memory else 'cuantizada'}: {n_chunks} bloques de {chunk_rows} filas")
+
+    params = {**_booster_train_params(hyperparams), "max_bin": settings.ooc_max_bin, "nthread": n_threads}
+    booster = xgb.train(
+        params, dtrain,
+        num_boost_round=hyperparams["n_estimators"],
+        evals=[(dvalid, "valid")],
+        verbose_eval=False,
+    )
+    stages["train"] = peak_rss_mb()
+
+    # Evaluacion por bloques contra el baseline de media global de train
+    train_mean = float(sum(y.sum() for _, y in chunks(TRAIN).raw()) / splits["train"])
+    baseline_test = stream_metrics(booster, chunks(TEST), constant=train_mean)
+    xgb_test = stream_metrics(booster, chunks(TEST))
+    improvement = (baseline_test["rmse"] - xgb_test["rmse"]) / baseline_test["rmse"] * 100
+    stages["evaluate"] = peak_rss_mb()
+    print(f"  BASELINE-TEST   -> RMSE: {baseline_test['rmse']:8.2f} | MAE: {baseline_test['mae']:8.2f} | R²: {baseline_test['r2']:6.3f}")
+    print(f"  XGBOOST-TEST    -> RMSE: {xgb_test['rmse']:8.2f} | MAE: {xgb_test['mae']:8.2f} | R²: {xgb_test['r2']:6.3f}")
+
+    trained_until = str(np.datetime64(dates[codes == TRAIN].max(), "D"))
+    booster.set_attr(
+        feature_transformer=transformer.to_json(),
+        hyperparams=json.dumps(hyperparams),
+        trained_until=trained_until,
+        incremental_updates="0",
+    )
+    version = registry.register_model(channel, "xgboost", lambda path: booster.save_model(str(path)), {
+        "features": features,
+        "feature_transformer": transformer.to_dict(),
+        "hyperparams": hyperparams,
+        "trained_until": trained_until,
+        "data_splits": splits,
+        "metrics": {"test": xgb_test, "baseline_test": baseline_test, "improvement_vs_baseline": float(improvement)},
+    })
+    model_path = registry.artifact_path(channel, version)
+    stages["save"] = peak_rss_mb()
+    print(f"  Version registrada: {channel}/{version} ({model_path})")
+    print(f"  Pico RSS: {max(stages.values()):.0f} MB ({(time.perf_counter() - started):.1f}s)")
+
+    return {
+        "status": "trained",
+        "channel": channel,
+        "model_type": "xgboost",
+        "model_path": str(model_path),
+        "model_version": version,
+        "features": features,
+        "feature_transformer": transformer.to_dict(),
+        "data_splits": splits,
+        "baseline_metrics": {"test": baseline_test},
+        "xgboost_metrics": {"test": xgb_test, "improvement": float(improvement), "hyperparams": hyperparams},
+        "best_model": {
+            "name": "xgboost",
+            "metrics": xgb_test,
+            "improvement_vs_baseline": float(improvement),
+        },
+        "out_of_core": {
+            "external_memory": external_memory,
+            "chunk_rows": chunk_rows,
+            "chunks": n_chunks,
+            "peak_rss_mb": {stage: round(value, 1) for stage, value in stages.items()},
+            "elapsed_seconds": round(time.perf_counter() - started, 2),
+        },
+    }
+
+
+def train_all_models_out_of_core(lookback_days: int = 1095, external_memory: bool = None) -> dict:
+    """
+    Entrena los modelos de ambos canales sobre una entrada del feature store
+    (se construye por ventanas si no existe) y guarda training_metrics.json.
+    """
+    print("=" * 60)
+    print("ENTRENAMIENTO OUT-OF-CORE MODELOS ROAS")
+    print("=" * 60)
+    print(f"Lookback: {lookback_days} dias")
+
+    if not settings.feature_store_enabled:
+        raise ValueError("El entrenamiento out-of-core lee del feature store (FEATURE_STORE_ENABLED=false)")
+    loaded = load_feature_matrix(lookback_days)
+    if loaded is None:
+        if build_features_chunked(lookback_days) is None:
+            raise ValueError("No hay datos disponibles para la ventana pedida")
+        loaded = load_feature_matrix(lookback_days)
+    matrix, numeric_columns = loaded
+    keys = load_feature_keys(lookback_days, columns=["date", "channel"], categorical=["channel"])
+    dates = keys["date"].to_numpy(dtype="datetime64[D]")
+    print(f"Total registros: {len(matrix)} ({matrix.nbytes / 1e6:.0f} MB en disco, memory-mapped)")
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "lookback_days": lookback_days,
+        "mode": "out_of_core",
+        "models": {},
+    }
+    for channel in ["google_ads", "meta_ads"]:
+        channel_mask = (keys["channel"] == channel).to_numpy()
+        results["models"][channel] = train_channel_out_of_core(
+            matrix, numeric_columns, dates, channel_mask, channel, external_memory=external_memory
+        )
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    metrics_path = MODEL_DIR / "training_metrics.json"
+    with open(metrics_path, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\nMetricas guardadas: {metrics_path}")
+    print(f"Pico RSS del proceso: {results['peak_rss_mb']:.0f} MB")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Entrenamiento out-of-core sobre el feature store")
+    parser.add_argument("--lookback", type=int, default=1095)
+    parser.add_argument("--external-memory", action="store_true")
+    args = parser.parse_args()
+    train_all_models_out_of_core(args.lookback, external_memory=args.external_memory or None)
@@ -4,38 +4,183 @@ Sistema de prediccion de ROAS - Bubbabags MVP
 Estrategia por canal:
 - Google Ads: XGBoost (supera baseline +24.1%)
 - Meta Ads: Baseline (media historica por campana)
+
+Los modelos se leen de la version activa del registro (src/modeling/registry.py)
+y se recargan en caliente: cada MODEL_RELOAD_INTERVAL segundos se consulta el
+puntero CURRENT y, si cambio, la version nueva se carga completa antes de
+reemplazar la referencia en MODELS_CACHE. Una peticion toma el modelo una sola
+vez y lo usa de punta a punta, asi que nunca mezcla dos versiones.
+
+Con MODEL_ENGINE=numpy (por defecto) los modelos XGBoost se evaluan con
+CompiledForest (src/modeling/compiled_trees.py) y el serving no importa xgboost.
+Si la version trae el artefacto binario .forest se mapea en memoria: carga sin
+parseo y una sola copia en el page cache para todos los procesos.
 """
 import json
+import logging
+import threading
+import time
 import numpy as np
 import pandas as pd
-import xgboost as xgb
 from pathlib import Path
 from typing import Optional
 
+from src.config import settings
+from src.data.query_stats import tag_view
 from src.data.views import get_roas_training_dataset
-from src.modeling.features import get_feature_columns
+from src.modeling import registry
+from src.modeling.compiled_trees import CompiledForest
+from src.modeling.features import FeatureTransformer
+from src.modeling.rolling import ROLLING_FEATURES, RollingState, rolling_state_path
 
+logger = logging.getLogger(__name__)
 
 MODEL_DIR = Path("models")
+
+# Features de los modelos entrenados antes de guardar el FeatureTransformer
+LEGACY_FEATURES = [
+    "impressions", "clicks", "cost", "ctr", "cpc",
+    "day_of_week", "is_weekend", "month",
+    "log_cost", "log_impressions", "click_impression_ratio",
+]
 BASELINE_CACHE: dict = {}
 MODELS_CACHE: dict = {}
+LOADED_VERSIONS: dict = {}
+_LAST_CHECK: dict = {}
+_RELOAD_LOCKS: dict = {}
+# Estado de rolling features para inferencia: {"state", "mtime", "checked"}
+ROLLING_STATE_CACHE: dict = {}
+_ROLLING_STATE_LOCK = threading.Lock()
+
+
+def _load_version(channel: str, version: Optional[str]):
+    """
+    Modelo XGBoost de una version del registro. Sin registro se usa el archivo
+    legacy models/roas_model_<channel>.json (o su .forest); si la version
+    activa no es XGBoost (ridge o baseline) el canal se sirve con el baseline.
+    """
+    if version is None:
+        model_path = MODEL_DIR / f"roas_model_{channel}.json"
+        forest_path = model_path.with_suffix(".forest")
+    elif registry.load_manifest(channel, version)["model_type"] == "xgboost":
+        model_path = registry.artifact_path(channel, version)
+        forest_path = registry.serving_artifact_path(channel, version)
+    else:
+        return None
+    
+    if settings.model_engine == "xgboost":
+        if not model_path.exists():
+            return None
+        import xgboost as xgb
+        model = xgb.XGBRegressor()
+        model.load_model(str(model_path))
+    elif forest_path is not None and forest_path.exists():
+        model = CompiledForest.open(forest_path)
+    elif model_path.exists():
+        model = CompiledForest.load(model_path)
+    else:
+        return None
+    model.feature_transformer = load_feature_transformer(model)
+    model.model_version = version or "legacy"
+    return model
 
 
 def load_channel_model(channel: str):
-    """Carga el modelo XGBoost para un canal."""
-    if channel in MODELS_CACHE:
+    """
+    Modelo XGBoost activo de un canal (None si no hay). Como mucho cada
+    MODEL_RELOAD_INTERVAL segundos se revisa la version activa; mientras un
+    hilo carga la nueva, el resto sigue sirviendo la anterior.
+    """
+    now = time.monotonic()
+    loaded = channel in MODELS_CACHE
+    if loaded and now - _LAST_CHECK.get(channel, 0) < settings.model_reload_interval:
         return MODELS_CACHE[channel]
     
-    model_path = MODEL_DIR / f"roas_model_{channel}.json"
+    lock = _RELOAD_LOCKS.setdefault(channel, threading.Lock())
+    # La primera carga espera; una recarga la hace un solo hilo
+    if not lock.acquire(blocking=not loaded):
+        return MODELS_CACHE[channel]
+    try:
+        if channel in MODELS_CACHE and now < _LAST_CHECK.get(channel, 0):
+            return MODELS_CACHE[channel]  # otro hilo ya reviso mientras se esperaba el lock
+        version = registry.current_version(channel)
+        if channel not in MODELS_CACHE or version != LOADED_VERSIONS.get(channel):
+            try:
+                model = _load_version(channel, version)
+            except Exception as e:
+                if channel not in MODELS_CACHE:
+                    raise
+                logger.warning(f"No se pudo cargar {channel}/{version}, se mantiene la version anterior: {e}")
+            else:
+                MODELS_CACHE[channel] = model
+                LOADED_VERSIONS[channel] = version
+                if loaded:
+                    logger.info(f"Modelo {channel} recargado: version {version}")
+        _LAST_CHECK[channel] = time.monotonic()
+        return MODELS_CACHE[channel]
+    finally:
+        lock.release()
+
+
+def load_rolling_state_cached() -> RollingState:
+    """
+    Estado de rolling features para inferencia (vacio si no hay). Como mucho
+    cada MODEL_RELOAD_INTERVAL segundos se revisa el mtime del archivo y solo
+    se relee cuando cambio; un update_rolling_features lo reemplaza de forma
+    atomica, asi que nunca se lee a medias.
+    """
+    now = time.monotonic()
+    cached = ROLLING_STATE_CACHE.get("state")
+    if cached is not None and now - ROLLING_STATE_CACHE.get("checked", 0) < settings.model_reload_interval:
+        return cached
     
-    if not model_path.exists():
+    with _ROLLING_STATE_LOCK:
+        path = rolling_state_path()
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if ROLLING_STATE_CACHE.get("state") is None or mtime != ROLLING_STATE_CACHE.get("mtime"):
+            ROLLING_STATE_CACHE["state"] = (RollingState.load(path) if mtime is not None else None) or RollingState()
+            ROLLING_STATE_CACHE["mtime"] = mtime
+        ROLLING_STATE_CACHE["checked"] = time.monotonic()
+        return ROLLING_STATE_CACHE["state"]
+
+
+def reset_model_cache() -> None:
+    """Olvida los modelos y el estado cargados (la proxima prediccion lee el disco)."""
+    MODELS_CACHE.clear()
+    LOADED_VERSIONS.clear()
+    _LAST_CHECK.clear()
+    ROLLING_STATE_CACHE.clear()
+
+
+def load_feature_transformer(model) -> FeatureTransformer:
+    """
+    Transformer guardado en los atributos del modelo (CompiledForest o
+    XGBRegressor). Los modelos entrenados antes de existir no lo traen: se
+    usan las mismas features sin winsorizar.
+    """
+    booster = model if isinstance(model, CompiledForest) else model.get_booster()
+    raw = booster.attr("feature_transformer")
+    if raw:
+        return FeatureTransformer.from_json(raw)
+    return FeatureTransformer(LEGACY_FEATURES)
+
+
+def predict_roas_batch(df: pd.DataFrame, channel: str, model=None) -> Optional[np.ndarray]:
+    """
+    Predice ROAS para un lote de filas (columnas de INPUT_COLUMNS) con el
+    modelo del canal (o con `model`, ya tomado por la peticion). Retorna None
+    si el canal no tiene modelo.
+    """
+    if model is None:
+        model = load_channel_model(channel)
+    if model is None:
         return None
     
-    model = xgb.XGBRegressor()
-    model.load_model(str(model_path))
-    MODELS_CACHE[channel] = model
-    
-    return model
+    X = model.feature_transformer.transform(df)
+    return np.clip(model.predict(X), 0, 100)
 
 
 def build_baseline_predictor(lookback_days: int = 90) -> dict:
@@ -50,7 +195,7 @@ def build_baseline_predictor(lookback_days: int = 90) -> dict:
     if df.empty:
         return {}
     
-    baseline = df.groupby("campaign_id")["roas"].mean().to_dict()
+    baseline = df.groupby("campaign_id", observed=True)["roas"].mean().to_dict()
     baseline["__google_ads_mean__"] = df[df["channel"] == "google_ads"]["roas"].mean()
     baseline["__meta_ads_mean__"] = df[df["channel"] == "meta_ads"]["roas"].mean()
     baseline["__global_mean__"] = df["roas"].mean()
@@ -89,28 +234,25 @@ def predict_roas(
                 "confidence": "medium"
             }
         
-        # Calcular features
-        ctr = clicks / impressions if impressions > 0 else 0
-        cpc = cost / clicks if clicks > 0 else 0
-        is_weekend = 1 if day_of_week in [1, 7] else 0
-        log_cost = np.log1p(cost)
-        log_impressions = np.log1p(impressions)
-        click_impression_ratio = clicks / (impressions + 1)
-        
-        features = np.array([[
-            impressions, clicks, cost, ctr, cpc,
-            day_of_week, is_weekend, month,
-            log_cost, log_impressions, click_impression_ratio
-        ]])
-        
-        roas_pred = model.predict(features)[0]
-        roas_pred = max(0, min(roas_pred, 100))
+        features = pd.DataFrame({
+            "impressions": [impressions],
+            "clicks": [clicks],
+            "cost": [cost],
+            "day_of_week": [day_of_week],
+            "month": [month],
+        })
+        # Historial de la campana desde el estado incremental de rolling features
+        if any(f in ROLLING_FEATURES for f in model.feature_transformer.features):
+            history = load_rolling_state_cached().features_for([campaign_id])
+            features[ROLLING_FEATURES] = history[ROLLING_FEATURES].to_numpy()
+        roas_pred = float(predict_roas_batch(features, "google_ads", model=model)[0])
         
         return {
             "campaign_id": campaign_id,
             "channel": "google_ads",
             "predicted_roas": round(roas_pred, 2),
             "method": "xgboost",
+            "model_version": model.model_version,
             "confidence": "high",
             "model_performance": "R² 0.684, +24.1% vs baseline"
         }
@@ -139,17 +281,18 @@ def predict_roas(
         return {"error": f"Canal no reconocido: {channel}"}
 
 
+@tag_view
 def get_top_campaigns_by_predicted_roas(
     channel: Optional[str] = None,
     top_n: int = 10
 ) -> pd.DataFrame:
     """Retorna las campanas con mejor ROAS predicho."""
-    df = get_roas_training_dataset(90)
+    df = get_roas_training_dataset(90, channels=[channel] if channel else None)
     
     if df.empty:
         return pd.DataFrame()
     
-    summary = df.groupby(["campaign_id", "campaign_name", "channel"]).agg({
+    summary = df.groupby(["campaign_id", "campaign_name", "channel"], observed=True).agg({
         "roas": "mean",
         "cost": "sum",
         "revenue": "sum"
@@ -158,9 +301,6 @@ def get_top_campaigns_by_predicted_roas(
     summary = summary.rename(columns={"roas": "predicted_roas"})
     summary["predicted_roas"] = summary["predicted_roas"].round(2)
     
-    if channel:
-        summary = summary[summary["channel"] == channel]
-    
     return summary.sort_values("predicted_roas", ascending=False).head(top_n)
 
 
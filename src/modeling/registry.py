@@ -0,0 +1,303 @@
+"""
+Registro versionado de modelos por canal.
+
+    models/registry/<channel>/
+        <version>/             # inmutable: artefacto + manifest.json
+        CURRENT                # version activa (se reemplaza con os.replace)
+        promotions.jsonl       # historial de promociones y rollbacks
+
+- Cada entrenamiento o actualizacion crea una version nueva: se escribe en un
+  directorio temporal y se renombra completo, de modo que una version visible
+  siempre esta completa. Los archivos quedan en solo lectura.
+- El manifest guarda tipo de modelo, sha256 del artefacto, features,
+  FeatureTransformer, hiperparametros, metricas y la version padre.
+- Las versiones XGBoost llevan ademas `model.forest`, el artefacto binario
+  que el serving mapea en memoria (ver compiled_trees.CompiledForest.open).
+- Promover es reescribir CURRENT de forma atomica; los procesos de serving lo
+  consultan por polling (ver predict.load_channel_model).
+- `rollback` recorre el historial de promociones hacia atras y salta las
+  versiones ya retiradas por otro rollback o borradas por la poda.
+
+    version = register_model("google_ads", "xgboost", booster.save_model, manifest)
+    current_version("google_ads")   # -> "20250101T120000-3f2a9c1e"
+    rollback("google_ads")
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from src.config import settings
+from src.modeling.compiled_trees import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_NAMES = {
+    "xgboost": "model.json",
+    "ridge": "model.joblib",
+    "baseline": None,  # sin artefacto: el serving usa la media historica
+}
+SERVING_ARTIFACT_NAME = "model.forest"
+MANIFEST_NAME = "manifest.json"
+POINTER_NAME = "CURRENT"
+PROMOTIONS_LOG = "promotions.jsonl"
+
+
+def registry_dir() -> Path:
+    return Path(settings.model_registry_dir)
+
+
+def channel_dir(channel: str) -> Path:
+    return registry_dir() / channel
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    tmp_path = path.with_name(f".tmp-{uuid.uuid4().hex}-{path.name}")
+    with open(tmp_path, "w") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _make_read_only(directory: Path) -> None:
+    for path in directory.iterdir():
+        path.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+
+# =============================================================================
+# VERSIONES
+# =============================================================================
+def register_model(
+    channel: str,
+    model_type: str,
+    write_artifact: Optional[Callable[[Path], None]],
+    manifest: dict,
+    promote: bool = True,
+    parent_version: Optional[str] = None
+) -> str:
+    """
+    Crea una version inmutable del modelo del canal. `write_artifact(path)`
+    escribe el artefacto (None para baseline). Con promote=True la version
+    pasa a ser la activa. Retorna el id de la version.
+    """
+    if model_type not in ARTIFACT_NAMES:
+        raise ValueError(f"Tipo de modelo desconocido: {model_type}")
+    root = channel_dir(channel)
+    root.mkdir(parents=True, exist_ok=True)
+
+    staging = root / f".tmp-{uuid.uuid4().hex}"
+    staging.mkdir()
+    try:
+        artifact_name = ARTIFACT_NAMES[model_type]
+        sha256 = None
+        if artifact_name:
+            write_artifact(staging / artifact_name)
+            sha256 = _sha256(staging / artifact_name)
+        serving_artifact = None
+        if model_type == "xgboost":
+            try:
+                CompiledForest.load(staging / artifact_name).save(staging / SERVING_ARTIFACT_NAME)
+                serving_artifact = SERVING_ARTIFACT_NAME
+            except ValueError as e:
+                # El serving compila el JSON o usa MODEL_ENGINE=xgboost
+                logger.warning(f"Sin artefacto binario para {channel}: {e}")
+
+        created_at = datetime.now()
+        version = f"{created_at:%Y%m%dT%H%M%S}-{(sha256 or uuid.uuid4().hex)[:8]}"
+        if (root / version).exists():
+            version = f"{version}-{uuid.uuid4().hex[:4]}"
+
+        manifest = {
+            **manifest,
+            "version": version,
+            "channel": channel,
+            "model_type": model_type,
+            "artifact": artifact_name,
+            "sha256": sha256,
+            "serving_artifact": serving_artifact,
+            "parent_version": parent_version,
+            "created_at": created_at.isoformat(),
+        }
+        with open(staging / MANIFEST_NAME, "w") as f:
+            json.dump(manifest, f, indent=2, default=str)
+        _make_read_only(staging)
+        os.replace(staging, root / version)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    logger.info(f"Modelo registrado: {channel}/{version} ({model_type})")
+    if promote:
+        promote_version(channel, version)
+    return version
+
+
+def list_versions(channel: str) -> list[str]:
+    """Versiones del canal, de la mas antigua a la mas reciente."""
+    root = channel_dir(channel)
+    if not root.exists():
+        return []
+    versions = [
+        p.name for p in root.iterdir()
+        if p.is_dir() and not p.name.startswith(".") and (p / MANIFEST_NAME).exists()
+    ]
+    return sorted(versions, key=lambda version: load_manifest(channel, version)["created_at"])
+
+
+def load_manifest(channel: str, version: str) -> dict:
+    with open(channel_dir(channel) / version / MANIFEST_NAME) as f:
+        return json.load(f)
+
+
+def artifact_path(channel: str, version: str) -> Optional[Path]:
+    """Ruta del artefacto de una version (None si es baseline)."""
+    manifest = load_manifest(channel, version)
+    if not manifest["artifact"]:
+        return None
+    return channel_dir(channel) / version / manifest["artifact"]
+
+
+def serving_artifact_path(channel: str, version: str) -> Optional[Path]:
+    """Ruta del artefacto binario .forest (None si la version no lo tiene)."""
+    manifest = load_manifest(channel, version)
+    if not manifest.get("serving_artifact"):
+        return None
+    return channel_dir(channel) / version / manifest["serving_artifact"]
+
+
+# =============================================================================
+# PROMOCION
+# =============================================================================
+def current_version(channel: str) -> Optional[str]:
+    """Version activa del canal (None si el canal no tiene registro)."""
+    try:
+        return (channel_dir(channel) / POINTER_NAME).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def promote_version(channel: str, version: str, rollback: bool = False) -> None:
+    """Activa una version existente reescribiendo CURRENT de forma atomica."""
+    root = channel_dir(channel)
+    if not (root / version / MANIFEST_NAME).exists():
+        raise ValueError(f"Version inexistente: {channel}/{version}")
+    previous = current_version(channel)
+    _write_atomic(root / POINTER_NAME, version + "\n")
+    with open(root / PROMOTIONS_LOG, "a") as f:
+        f.write(json.dumps({
+            "version": version,
+            "previous": previous,
+            "promoted_at": datetime.now().isoformat(),
+            "rollback": rollback,
+        }) + "\n")
+    logger.info(f"Version activa {channel}: {previous} -> {version}" + (" (rollback)" if rollback else ""))
+    prune_versions(channel)
+
+
+def promotion_history(channel: str) -> tuple[list[str], set[str]]:
+    """
+    Reproduce promotions.jsonl. Retorna (pila de versiones promovidas, la
+    ultima es la activa; versiones retiradas por rollback y no re-promovidas).
+    """
+    stack, rolled_back = [], set()
+    log_path = channel_dir(channel) / PROMOTIONS_LOG
+    if not log_path.exists():
+        return stack, rolled_back
+    with open(log_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("rollback"):
+                # Se desapilan la version retirada y las que el rollback salto
+                rolled_back.add(entry["previous"])
+                while stack and stack[-1] != entry["version"]:
+                    stack.pop()
+                if not stack:
+                    stack.append(entry["version"])
+            else:
+                rolled_back.discard(entry["version"])
+                stack.append(entry["version"])
+    return stack, rolled_back
+
+
+def rollback(channel: str) -> str:
+    """
+    Vuelve a la version promovida antes de la activa. Rollbacks sucesivos
+    siguen retrocediendo en el historial: se saltan las versiones ya
+    retiradas por un rollback y las que ya no existen.
+    """
+    stack, rolled_back = promotion_history(channel)
+    if not stack:
+        raise ValueError(f"Sin historial de promociones para {channel}")
+    active = current_version(channel)
+    existing = set(list_versions(channel))
+    for version in reversed(stack):
+        if version != active and version not in rolled_back and version in existing:
+            promote_version(channel, version, rollback=True)
+            return version
+    raise ValueError(f"No hay version anterior para {channel}")
+
+
+def prune_versions(channel: str, keep: int = None) -> list[str]:
+    """
+    Borra las versiones mas antiguas dejando `keep` (MODEL_REGISTRY_KEEP).
+    La version activa y su padre nunca se borran.
+    """
+    keep = keep or settings.model_registry_keep
+    versions = list_versions(channel)
+    active = current_version(channel)
+    protected = {active}
+    if active:
+        protected.add(load_manifest(channel, active).get("parent_version"))
+
+    removed = []
+    for version in versions[:-keep] if len(versions) > keep else []:
+        if version in protected:
+            continue
+        path = channel_dir(channel) / version
+        for child in path.iterdir():
+            child.chmod(stat.S_IRUSR | stat.S_IWUSR)
+        shutil.rmtree(path)
+        removed.append(version)
+    return removed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Registro versionado de modelos")
+    parser.add_argument("command", choices=["list", "promote", "rollback"])
+    parser.add_argument("channel", choices=["google_ads", "meta_ads"])
+    parser.add_argument("version", nargs="?")
+    args = parser.parse_args()
+
+    if args.command == "promote":
+        if not args.version:
+            parser.error("promote requiere una version")
+        promote_version(args.channel, args.version)
+    elif args.command == "rollback":
+        print(f"Version activa: {rollback(args.channel)}")
+
+    active = current_version(args.channel)
+    for version in list_versions(args.channel):
+        manifest = load_manifest(args.channel, version)
+        rmse = manifest.get("metrics", {}).get("test", {}).get("rmse")
+        rmse_text = f"RMSE {rmse:.4f}" if rmse is not None else ""
+        marker = "*" if version == active else " "
+        print(f"{marker} {version}  {manifest['model_type']:8} {rmse_text}")
@@ -0,0 +1,348 @@
+"""
+Features de historial por campana: lags y ventanas moviles de 7/14/28 dias.
+
+Todas las features de un dia `d` usan solo los dias anteriores ([d-N, d-1]),
+de modo que no filtran el target (ROAS del mismo dia).
+
+Dos caminos producen exactamente los mismos valores:
+- `compute_rolling_features`: calculo completo vectorizado (matriz densa
+  campana x dia + sumas acumuladas), para inicializar o reconstruir.
+- `RollingState`: estado persistido con los ultimos 28 dias por campana
+  (buffer circular). Cada dia nuevo se calcula en O(campanas) y se suma al
+  estado, sin recalcular la ventana completa.
+"""
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+ROLLING_WINDOWS = [7, 14, 28]
+MAX_WINDOW = max(ROLLING_WINDOWS)
+
+# Medidas diarias acumuladas en el estado ("active" = dia con costo > 0)
+STATE_MEASURES = ["impressions", "clicks", "cost", "revenue", "active"]
+_IMPRESSIONS, _CLICKS, _COST, _REVENUE, _ACTIVE = range(len(STATE_MEASURES))
+
+ROLLING_FEATURES = [
+    "roas_lag_1",
+    "cost_lag_1",
+    "roas_7d",
+    "roas_14d",
+    "roas_28d",
+    "cost_momentum",
+    "ctr_trend",
+    "active_days_28d",
+]
+
+STATE_FILE = "rolling_state.npz"
+HISTORY_FILE = "rolling_features.parquet"
+
+
+def _rolling_dir() -> Path:
+    path = Path(settings.feature_store_dir) / "rolling"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _day_numbers(dates) -> np.ndarray:
+    """Fechas -> numero de dia (dias desde 1970-01-01)."""
+    return pd.to_datetime(dates).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+def _measure_matrix(daily: pd.DataFrame) -> np.ndarray:
+    values = np.column_stack([
+        daily[col].to_numpy(dtype=np.float64) for col in STATE_MEASURES[:_ACTIVE]
+    ])
+    active = (values[:, _COST] > 0).astype(np.float64)
+    return np.column_stack([values, active])
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator, 0.0)
+
+
+def _features_from_sums(lag_1: np.ndarray, sums: dict[int, np.ndarray]) -> dict[str, np.ndarray]:
+    """Features a partir del dia anterior y las sumas de cada ventana (filas x medidas)."""
+    ctr_7d = _ratio(sums[7][:, _CLICKS], sums[7][:, _IMPRESSIONS])
+    ctr_28d = _ratio(sums[28][:, _CLICKS], sums[28][:, _IMPRESSIONS])
+    return {
+        "roas_lag_1": _ratio(lag_1[:, _REVENUE], lag_1[:, _COST]),
+        "cost_lag_1": lag_1[:, _COST],
+        "roas_7d": _ratio(sums[7][:, _REVENUE], sums[7][:, _COST]),
+        "roas_14d": _ratio(sums[14][:, _REVENUE], sums[14][:, _COST]),
+        "roas_28d": _ratio(sums[28][:, _REVENUE], sums[28][:, _COST]),
+        # Gasto diario medio de la ultima semana vs el del ultimo mes
+        "cost_momentum": _ratio(sums[7][:, _COST] / 7, sums[28][:, _COST] / 28),
+        "ctr_trend": ctr_7d - ctr_28d,
+        "active_days_28d": sums[28][:, _ACTIVE],
+    }
+
+
+def _daily_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Totales por (date, campaign_id); acepta datasets con varias filas por dia."""
+    totals = df.astype({"campaign_id": object}).groupby(["date", "campaign_id"], sort=True)[STATE_MEASURES[:_ACTIVE]].sum()
+    return totals.reset_index()
+
+
+def _empty_features() -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": pd.Series(dtype="datetime64[ns]"),
+        "campaign_id": pd.Series(dtype=object),
+        **{name: pd.Series(dtype=np.float64) for name in ROLLING_FEATURES},
+    })
+
+
+# =============================================================================
+# CALCULO COMPLETO (VECTORIZADO)
+# =============================================================================
+def compute_rolling_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Features de historial para cada (date, campaign_id) de `df`, calculadas
+    sobre todo el historial recibido con sumas acumuladas por campana.
+    """
+    daily = _daily_totals(df)
+    if daily.empty:
+        return _empty_features()
+
+    campaign_codes, _ = pd.factorize(daily["campaign_id"])
+    days = _day_numbers(daily["date"])
+    offsets = days - days.min()
+
+    # dense[c, t + 1] = medidas del dia t; prefix[c, t] = suma de los dias < t
+    dense = np.zeros((campaign_codes.max() + 1, offsets.max() + 2, len(STATE_MEASURES)))
+    dense[campaign_codes, offsets + 1] = _measure_matrix(daily)
+    prefix = np.cumsum(dense, axis=1)
+
+    sums = {
+        window: prefix[campaign_codes, offsets] - prefix[campaign_codes, np.maximum(offsets - window, 0)]
+        for window in ROLLING_WINDOWS
+    }
+    features = _features_from_sums(dense[campaign_codes, offsets], sums)
+    return pd.DataFrame({"date": daily["date"], "campaign_id": daily["campaign_id"], **features})
+
+
+# =============================================================================
+# ESTADO INCREMENTAL
+# =============================================================================
+class RollingState:
+    """Ultimos MAX_WINDOW dias de medidas por campana en un buffer circular."""
+
+    def __init__(self, campaign_ids: list[str] = None, buffer: np.ndarray = None, last_day: Optional[int] = None):
+        self.campaign_ids = list(campaign_ids or [])
+        self._index = {campaign_id: i for i, campaign_id in enumerate(self.campaign_ids)}
+        self.buffer = buffer if buffer is not None else np.zeros((0, MAX_WINDOW, len(STATE_MEASURES)))
+        self.last_day = last_day
+
+    @property
+    def last_date(self) -> Optional[pd.Timestamp]:
+        if self.last_day is None:
+            return None
+        return pd.Timestamp(np.datetime64(int(self.last_day), "D"))
+
+    def _codes(self, campaign_ids) -> np.ndarray:
+        """Indices en el buffer; agrega filas vacias para campanas nuevas."""
+        new = [c for c in dict.fromkeys(campaign_ids) if c not in self._index]
+        if new:
+            for campaign_id in new:
+                self._index[campaign_id] = len(self.campaign_ids)
+                self.campaign_ids.append(campaign_id)
+            padding = np.zeros((len(new), MAX_WINDOW, len(STATE_MEASURES)))
+            self.buffer = np.concatenate([self.buffer, padding])
+        return np.fromiter((self._index[c] for c in campaign_ids), dtype=np.int64, count=len(campaign_ids))
+
+    def _clear_until(self, day: int) -> None:
+        """Vacia los slots de los dias sin datos entre last_day y `day` (exclusivo)."""
+        if self.last_day is None:
+            return
+        gap = np.arange(self.last_day + 1, min(day, self.last_day + 1 + MAX_WINDOW))
+        self.buffer[:, gap % MAX_WINDOW] = 0.0
+
+    def _features_at(self, codes: np.ndarray, day: int) -> dict[str, np.ndarray]:
+        """Features del dia `day` (> last_day) a partir del estado, sin modificarlo."""
+        buffer = self.buffer[codes]  # indexado avanzado: copia
+        if self.last_day is not None and day - self.last_day > 1:
+            # Dias sin datos: slots que el estado todavia no vacio
+            gap = np.arange(self.last_day + 1, min(day, self.last_day + 1 + MAX_WINDOW))
+            buffer[:, gap % MAX_WINDOW] = 0.0
+        sums = {
+            window: buffer[:, (day - np.arange(1, window + 1)) % MAX_WINDOW].sum(axis=1)
+            for window in ROLLING_WINDOWS
+        }
+        return _features_from_sums(buffer[:, (day - 1) % MAX_WINDOW], sums)
+
+    def features_for(self, campaign_ids: list[str], as_of=None) -> pd.DataFrame:
+        """
+        Features para `campaign_ids` en la fecha `as_of` (por defecto el dia
+        siguiente al ultimo dato). Campanas sin historial quedan en 0.
+        """
+        campaign_ids = [str(c) for c in campaign_ids]
+        day = _day_numbers([as_of])[0] if as_of is not None else (self.last_day or 0) + 1
+        if self.last_day is not None and day <= self.last_day:
+            raise ValueError(f"El estado ya incluye {self.last_date.date()}; as_of debe ser posterior")
+        known = np.array([c in self._index for c in campaign_ids], dtype=bool)
+        codes = np.array([self._index.get(c, 0) for c in campaign_ids], dtype=np.int64)
+        if not len(self.campaign_ids):
+            features = {name: np.zeros(len(campaign_ids)) for name in ROLLING_FEATURES}
+        else:
+            features = {name: np.where(known, values, 0.0) for name, values in self._features_at(codes, day).items()}
+        return pd.DataFrame({"campaign_id": campaign_ids, **features})
+
+    def step(self, day_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Procesa un dia nuevo (totales por campana de una misma fecha): calcula
+        sus features con el estado previo y luego suma el dia al estado.
+        """
+        date = day_df["date"].iloc[0]
+        day = _day_numbers([date])[0]
+        if self.last_day is not None and day <= self.last_day:
+            raise ValueError(f"Dia {pd.Timestamp(date).date()} ya incluido en el estado")
+
+        campaign_ids = day_df["campaign_id"].astype(str).tolist()
+        codes = self._codes(campaign_ids)
+        features = self._features_at(codes, day)
+
+        self._clear_until(day)
+        slot = day % MAX_WINDOW
+        self.buffer[:, slot] = 0.0
+        self.buffer[codes, slot] = _measure_matrix(day_df)
+        self.last_day = int(day)
+        return pd.DataFrame({"date": day_df["date"].to_numpy(), "campaign_id": campaign_ids, **features})
+
+    def step_days(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Procesa en orden los dias de `df` (posteriores al estado) y retorna sus features."""
+        parts = [self.step(day_df) for _, day_df in _daily_totals(df).groupby("date", sort=True)]
+        return pd.concat(parts, ignore_index=True) if parts else _empty_features()
+
+    @classmethod
+    def from_daily(cls, df: pd.DataFrame) -> "RollingState":
+        """Estado al final del historial `df` (solo se usan sus ultimos MAX_WINDOW dias)."""
+        daily = _daily_totals(df)
+        state = cls()
+        if daily.empty:
+            return state
+        days = _day_numbers(daily["date"])
+        last_day = int(days.max())
+        recent = days > last_day - MAX_WINDOW
+        codes = state._codes(daily["campaign_id"].astype(str).tolist())
+        state.buffer[codes[recent], days[recent] % MAX_WINDOW] = _measure_matrix(daily)[recent]
+        state.last_day = last_day
+        return state
+
+    def save(self, path: Path) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".npz")
+        os.close(fd)
+        try:
+            np.savez(
+                tmp_path,
+                campaign_ids=np.array(self.campaign_ids, dtype=str),
+                buffer=self.buffer,
+                last_day=np.array(-1 if self.last_day is None else self.last_day),
+            )
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["RollingState"]:
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            last_day = int(data["last_day"])
+            return cls(
+                campaign_ids=data["campaign_ids"].tolist(),
+                buffer=data["buffer"],
+                last_day=None if last_day < 0 else last_day,
+            )
+
+
+# =============================================================================
+# PIPELINE INCREMENTAL PERSISTIDO
+# =============================================================================
+def rolling_state_path() -> Path:
+    return _rolling_dir() / STATE_FILE
+
+
+def load_rolling_state() -> Optional[RollingState]:
+    return RollingState.load(rolling_state_path())
+
+
+def _save_history(history: pd.DataFrame, path: Path) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".parquet")
+    os.close(fd)
+    try:
+        history.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def update_rolling_features(df: pd.DataFrame, rebuild: bool = False) -> pd.DataFrame:
+    """
+    Actualiza y retorna el historial persistido de features por (date, campaign_id).
+
+    Sin estado (o con rebuild=True) se calcula todo `df` de forma vectorizada.
+    Con estado solo se procesan los dias posteriores al ultimo incluido; los
+    dias ya procesados no se recalculan (las re-estimaciones de dias pasados
+    requieren rebuild=True).
+
+    El historial se recorta a las fechas de `df` (la ventana que lee el
+    entrenamiento) y se escribe antes que el estado, ambos de forma atomica:
+    si el proceso muere entre las dos escrituras, las filas posteriores al
+    estado se descartan y se recalculan en la siguiente llamada.
+    """
+    path = _rolling_dir()
+    state = None if rebuild else load_rolling_state()
+    history_path = path / HISTORY_FILE
+    daily = _daily_totals(df)
+
+    history = None
+    if state is not None and history_path.exists():
+        history = pd.read_parquet(history_path)
+        if state.last_date is not None:
+            # Filas de un update cuyo estado no llego a guardarse
+            history = history[history["date"] <= state.last_date]
+        # Historial inconsistente con el estado o que no cubre el inicio de `df`
+        behind = state.last_date is not None and (history.empty or history["date"].max() < state.last_date)
+        uncovered = not daily.empty and not history.empty and history["date"].min() > daily["date"].min()
+        if behind or uncovered:
+            history = None
+
+    if history is None:
+        history = compute_rolling_features(df)
+        state = RollingState.from_daily(df)
+        logger.info(f"Rolling features reconstruidas: {len(history)} filas")
+    else:
+        # Estado vacio (p. ej. guardado con un historial sin filas): todo es nuevo
+        new_days = daily if state.last_date is None else daily[daily["date"] > state.last_date]
+        parts = [state.step(day_df) for _, day_df in new_days.groupby("date", sort=True)]
+        if not daily.empty:
+            history = history[history["date"] >= daily["date"].min()]
+        if parts:
+            history = pd.concat([history] + parts, ignore_index=True)
+        logger.info(f"Rolling features: {len(parts)} dias nuevos, estado hasta {state.last_date.date() if state.last_date is not None else '-'}")
+
+    _save_history(history, history_path)
+    state.save(rolling_state_path())
+    return history
+
+
+def add_rolling_features(df: pd.DataFrame, history: pd.DataFrame) -> pd.DataFrame:
+    """Une las features de historial al dataset por (date, campaign_id)."""
+    keys = df.astype({"campaign_id": object})
+    merged = keys.merge(history.astype({"campaign_id": object}), on=["date", "campaign_id"], how="left")
+    merged[ROLLING_FEATURES] = merged[ROLLING_FEATURES].fillna(0.0)
+    merged.index = df.index
+    return merged
@@ -5,22 +5,30 @@ Entrena un modelo separado para Google Ads y otro para Meta Ads.
 Incluye fallback a modelo simple (Ridge) si XGBoost no funciona.
 """
 import json
+import multiprocessing
+import os
 import numpy as np
 import pandas as pd
 import xgboost as xgb
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 from sklearn.linear_model import Ridge
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 from joblib import dump
 
+from src.config import settings
+from src.modeling.feature_store import get_features
 from src.modeling.features import (
-    build_features_dataframe,
+    FeatureTransformer,
     get_feature_columns,
     get_target_column,
     temporal_train_valid_test_split
 )
+from src.modeling import registry
+from src.modeling.tuning import search_hyperparameters
 
 
 # =============================================================================
@@ -67,18 +75,18 @@ def evaluate_predictions(y_true: np.ndarray, y_pred: np.ndarray, name: str) -> d
 def calculate_baseline_predictions(train_df: pd.DataFrame, eval_df: pd.DataFrame) -> np.ndarray:
     """Baseline: ROAS promedio por campaña."""
     target = get_target_column()
-    baseline_by_campaign = train_df.groupby("campaign_id")[target].mean()
+    baseline_by_campaign = train_df.groupby("campaign_id", observed=True)[target].mean()
     global_mean = train_df[target].mean()
     
-    baseline_pred = eval_df["campaign_id"].map(baseline_by_campaign).fillna(global_mean)
+    baseline_pred = eval_df["campaign_id"].astype(object).map(baseline_by_campaign).fillna(global_mean)
     return baseline_pred.values
 
 
 # =============================================================================
 # ENTRENAMIENTO XGBOOST
 # =============================================================================
-def train_xgboost(X_train, y_train, X_valid, y_valid, hyperparams):
-    """Entrena modelo XGBoost."""
+def train_xgboost(X_train, y_train, X_valid, y_valid, hyperparams, n_jobs: int = -1):
+    """Entrena modelo XGBoost (n_jobs = hilos; -1 usa todos los nucleos)."""
     model = xgb.XGBRegressor(
         max_depth=hyperparams["max_depth"],
         learning_rate=hyperparams["learning_rate"],
@@ -90,7 +98,7 @@ def train_xgboost(X_train, y_train, X_valid, y_valid, hyperparams):
         min_child_weight=hyperparams["min_child_weight"],
         gamma=hyperparams["gamma"],
         random_state=hyperparams["random_state"],
-        n_jobs=-1
+        n_jobs=n_jobs
     )
     
     model.fit(X_train, y_train, eval_set=[(X_valid, y_valid)], verbose=False)
@@ -118,10 +126,15 @@ def train_ridge(X_train, y_train, hyperparams):
 # =============================================================================
 # ENTRENAMIENTO POR CANAL
 # =============================================================================
-def train_channel_model(df: pd.DataFrame, channel: str) -> dict:
+CANDIDATE_MODELS = ["xgboost", "ridge"]
+
+
+def prepare_channel_data(df: pd.DataFrame, channel: str, tune: bool = False) -> Optional[dict]:
     """
-    Entrena un modelo para un canal especifico.
-    Usa XGBoost primero, si no supera baseline usa Ridge.
+    Split temporal y matrices de features de un canal (None si no hay datos
+    suficientes). El transformer se ajusta solo con train y se guarda con el modelo.
+    Con tune=True los hiperparametros de XGBoost salen de una busqueda con CV
+    temporal sobre train + valid (el test queda fuera).
     """
     print(f"\n{'='*60}")
     print(f"ENTRENANDO MODELO: {channel.upper()}")
@@ -132,7 +145,7 @@ def train_channel_model(df: pd.DataFrame, channel: str) -> dict:
     
     if len(df_channel) < 30:
         print(f"  ⚠️  Datos insuficientes: {len(df_channel)} registros")
-        return {"status": "skipped", "reason": "insufficient_data"}
+        return None
     
     print(f"  Total registros: {len(df_channel)}")
     
@@ -143,34 +156,77 @@ def train_channel_model(df: pd.DataFrame, channel: str) -> dict:
     print(f"  Valid: {len(valid_df)} ({valid_df['date'].min().date()} - {valid_df['date'].max().date()})")
     print(f"  Test:  {len(test_df)} ({test_df['date'].min().date()} - {test_df['date'].max().date()})")
     
-    # Features
     features = [f for f in get_feature_columns() if f != "is_google_ads"]
     target = get_target_column()
+    transformer = FeatureTransformer(features).fit(train_df)
     
-    X_train = train_df[features].values
-    y_train = train_df[target].values
-    X_valid = valid_df[features].values
-    y_valid = valid_df[target].values
-    X_test = test_df[features].values
-    y_test = test_df[target].values
+    hyperparams, search = HYPERPARAMS_XGBOOST, None
+    if tune:
+        print(f"\n  >>> Busqueda de hiperparametros (CV temporal)...")
+        search = search_hyperparameters(pd.concat([train_df, valid_df]), features, HYPERPARAMS_XGBOOST)
+        hyperparams = search["best_params"]
+        print(f"  {search['trials']} trials ({search['pruned']} podados) en {search['folds']} folds, {search['elapsed_seconds']:.1f}s")
+        print(f"  RMSE CV: {search['best_cv_rmse']:.4f} (configuracion base: {search['base_cv_rmse']:.4f})")
     
-    # Transformacion log del target para estabilizar
-    y_train_log = np.log1p(y_train)
-    y_valid_log = np.log1p(y_valid)
-    y_test_log = np.log1p(y_test)
+    return {
+        "channel": channel,
+        "features": features,
+        "transformer": transformer,
+        "train_df": train_df,
+        "valid_df": valid_df,
+        "test_df": test_df,
+        "X_train": transformer.transform(train_df),
+        "y_train": train_df[target].values,
+        "X_valid": transformer.transform(valid_df),
+        "y_valid": valid_df[target].values,
+        "X_test": transformer.transform(test_df),
+        "y_test": test_df[target].values,
+        "hyperparams": hyperparams,
+        "hyperparameter_search": search,
+    }
+
+
+def fit_candidate(name: str, X_train, y_train, X_valid, y_valid, X_test, n_threads: int = -1, hyperparams: dict = None):
+    """
+    Entrena un modelo candidato y retorna (nombre, modelo, prediccion en test).
+    Funcion de modulo (picklable) para poder ejecutarse en un proceso del pool.
+    """
+    if name == "xgboost":
+        model, _ = train_xgboost(X_train, y_train, X_valid, y_valid, hyperparams or HYPERPARAMS_XGBOOST, n_jobs=n_threads)
+        return name, model, model.predict(X_test)
+    
+    if name == "ridge":
+        # Transformacion log del target para estabilizar
+        from threadpoolctl import threadpool_limits
+        with threadpool_limits(limits=None if n_threads < 1 else n_threads):
+            model, _ = train_ridge(X_train, np.log1p(y_train), HYPERPARAMS_RIDGE)
+            y_pred_log = model.predict(model.scaler.transform(X_test))
+        y_pred = np.clip(np.expm1(y_pred_log), 0, 200)  # Revertir log y clip extremos
+        return name, model, y_pred
+    
+    raise ValueError(f"Modelo candidato desconocido: {name}")
+
+
+def finalize_channel_model(data: dict, fitted: dict) -> dict:
+    """
+    Evalua los candidatos entrenados contra el baseline, guarda el mejor y
+    retorna el resultado del canal (estructura de training_metrics.json).
+    """
+    channel = data["channel"]
+    features = data["features"]
+    transformer = data["transformer"]
+    y_test = data["y_test"]
     
     # Baseline
     print(f"\n  >>> Baseline (media por campaña):")
-    y_test_baseline = calculate_baseline_predictions(train_df, test_df)
+    y_test_baseline = calculate_baseline_predictions(data["train_df"], data["test_df"])
     baseline_test = evaluate_predictions(y_test, y_test_baseline, "BASELINE-TEST")
     
     # =========================================================================
     # INTENTO 1: XGBoost
     # =========================================================================
-    print(f"\n  >>> Entrenando XGBoost...")
-    xgb_model, _ = train_xgboost(X_train, y_train, X_valid, y_valid, HYPERPARAMS_XGBOOST)
-    
-    y_test_pred_xgb = xgb_model.predict(X_test)
+    print(f"\n  >>> XGBoost:")
+    xgb_model, y_test_pred_xgb = fitted["xgboost"]
     xgb_test = evaluate_predictions(y_test, y_test_pred_xgb, "XGBOOST-TEST")
     
     xgb_improvement = ((baseline_test["rmse"] - xgb_test["rmse"]) / baseline_test["rmse"]) * 100
@@ -179,14 +235,8 @@ def train_channel_model(df: pd.DataFrame, channel: str) -> dict:
     # =========================================================================
     # INTENTO 2: Ridge con log-transform (si XGBoost falla)
     # =========================================================================
-    print(f"\n  >>> Entrenando Ridge (log-transform)...")
-    ridge_model, _ = train_ridge(X_train, y_train_log, HYPERPARAMS_RIDGE)
-    
-    X_test_scaled = ridge_model.scaler.transform(X_test)
-    y_test_pred_ridge_log = ridge_model.predict(X_test_scaled)
-    y_test_pred_ridge = np.expm1(y_test_pred_ridge_log)  # Revertir log
-    y_test_pred_ridge = np.clip(y_test_pred_ridge, 0, 200)  # Clip extremos
-    
+    print(f"\n  >>> Ridge (log-transform):")
+    ridge_model, y_test_pred_ridge = fitted["ridge"]
     ridge_test = evaluate_predictions(y_test, y_test_pred_ridge, "RIDGE-TEST")
     
     ridge_improvement = ((baseline_test["rmse"] - ridge_test["rmse"]) / baseline_test["rmse"]) * 100
@@ -212,21 +262,36 @@ def train_channel_model(df: pd.DataFrame, channel: str) -> dict:
     print(f"     RMSE: {best_metrics['rmse']:.2f}")
     print(f"     R²: {best_metrics['r2']:.3f}")
     
-    # Guardar el mejor modelo
+    # Registrar el mejor modelo como version nueva y promoverlo
+    trained_until = str(data["train_df"]["date"].max().date())
     if best_name == "xgboost":
-        model_path = MODEL_DIR / f"roas_model_{channel}.json"
-        best_model.save_model(str(model_path))
-        model_type = "xgboost"
+        # Metadatos para la actualizacion incremental (update_channel_model)
+        best_model.get_booster().set_attr(
+            feature_transformer=transformer.to_json(),
+            hyperparams=json.dumps(data["hyperparams"]),
+            trained_until=trained_until,
+            incremental_updates="0",
+        )
     elif best_name == "ridge":
-        model_path = MODEL_DIR / f"roas_model_{channel}.joblib"
-        dump(best_model, model_path)
-        model_type = "ridge"
-    else:
-        model_path = None
-        model_type = "baseline"
+        best_model.feature_transformer = transformer
+    model_type = best_name
+    
+    def write_artifact(path):
+        if best_name == "xgboost":
+            best_model.save_model(str(path))
+        else:
+            dump(best_model, path)
     
-    if model_path:
-        print(f"  Modelo guardado: {model_path}")
+    version = registry.register_model(channel, model_type, write_artifact, {
+        "features": features,
+        "feature_transformer": transformer.to_dict(),
+        "hyperparams": data["hyperparams"] if best_name == "xgboost" else None,
+        "trained_until": trained_until,
+        "data_splits": {"train": len(data["train_df"]), "valid": len(data["valid_df"]), "test": len(data["test_df"])},
+        "metrics": {"test": best_metrics, "baseline_test": baseline_test, "improvement_vs_baseline": float(best_improvement)},
+    })
+    model_path = registry.artifact_path(channel, version)
+    print(f"  Version registrada: {channel}/{version}" + (f" ({model_path})" if model_path else ""))
     
     # Feature importance (solo para XGBoost)
     feature_importance = []
@@ -246,14 +311,17 @@ def train_channel_model(df: pd.DataFrame, channel: str) -> dict:
         "channel": channel,
         "model_type": model_type,
         "model_path": str(model_path) if model_path else None,
+        "model_version": version,
         "features": features,
+        "feature_transformer": transformer.to_dict(),
         "data_splits": {
-            "train": len(train_df),
-            "valid": len(valid_df),
-            "test": len(test_df)
+            "train": len(data["train_df"]),
+            "valid": len(data["valid_df"]),
+            "test": len(data["test_df"])
         },
         "baseline_metrics": {"test": baseline_test},
-        "xgboost_metrics": {"test": xgb_test, "improvement": float(xgb_improvement)},
+        "xgboost_metrics": {"test": xgb_test, "improvement": float(xgb_improvement), "hyperparams": data["hyperparams"]},
+        "hyperparameter_search": data["hyperparameter_search"],
         "ridge_metrics": {"test": ridge_test, "improvement": float(ridge_improvement)},
         "best_model": {
             "name": best_name,
@@ -264,11 +332,315 @@ def train_channel_model(df: pd.DataFrame, channel: str) -> dict:
     }
 
 
+def train_channel_model(df: pd.DataFrame, channel: str, tune: bool = False) -> dict:
+    """
+    Entrena un modelo para un canal especifico (secuencial).
+    Usa XGBoost primero, si no supera baseline usa Ridge.
+    """
+    data = prepare_channel_data(df, channel, tune=tune)
+    if data is None:
+        return {"status": "skipped", "reason": "insufficient_data"}
+    
+    fitted = {}
+    for name in CANDIDATE_MODELS:
+        print(f"\n  >>> Entrenando {name}...")
+        _, model, y_pred = fit_candidate(
+            name, data["X_train"], data["y_train"], data["X_valid"], data["y_valid"], data["X_test"],
+            hyperparams=data["hyperparams"]
+        )
+        fitted[name] = (model, y_pred)
+    return finalize_channel_model(data, fitted)
+
+
+def train_channels_parallel(df: pd.DataFrame, channels: list[str], max_workers: int = None, tune: bool = False) -> dict:
+    """
+    Entrena canal x modelo candidato en un pool de procesos. Cada proceso
+    recibe cpu_count // workers hilos (XGBoost n_jobs, BLAS de Ridge) para no
+    sobre-suscribir la CPU. Los resultados tienen la misma estructura que
+    train_channel_model.
+    """
+    prepared = {channel: prepare_channel_data(df, channel, tune=tune) for channel in channels}
+    tasks = [
+        (channel, name)
+        for channel, data in prepared.items() if data is not None
+        for name in CANDIDATE_MODELS
+    ]
+    
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(len(tasks), max_workers or cpu_count))
+    threads_per_job = max(1, cpu_count // workers)
+    print(f"\n>>> Entrenamiento paralelo: {len(tasks)} modelos, {workers} procesos x {threads_per_job} hilos")
+    
+    fitted: dict[str, dict] = {channel: {} for channel in channels}
+    # spawn: OpenMP (XGBoost) no es seguro tras fork
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            pool.submit(
+                fit_candidate, name,
+                prepared[channel]["X_train"], prepared[channel]["y_train"],
+                prepared[channel]["X_valid"], prepared[channel]["y_valid"],
+                prepared[channel]["X_test"], threads_per_job, prepared[channel]["hyperparams"],
+            ): channel
+            for channel, name in tasks
+        }
+        for future in as_completed(futures):
+            name, model, y_pred = future.result()
+            fitted[futures[future]][name] = (model, y_pred)
+    
+    results = {}
+    for channel in channels:
+        data = prepared[channel]
+        if data is None:
+            results[channel] = {"status": "skipped", "reason": "insufficient_data"}
+            continue
+        print(f"\n{'='*60}")
+        print(f"RESULTADOS: {channel.upper()}")
+        print(f"{'='*60}")
+        results[channel] = finalize_channel_model(data, fitted[channel])
+    return results
+
+
+# =============================================================================
+# ACTUALIZACION INCREMENTAL (WARM START)
+# =============================================================================
+INCREMENTAL_TREE_PARAMS = [
+    "max_depth", "learning_rate", "subsample", "colsample_bytree",
+    "reg_lambda", "reg_alpha", "min_child_weight", "gamma",
+]
+
+
+def _booster_train_params(hyperparams: dict) -> dict:
+    return {
+        "objective": "reg:squarederror",
+        "eval_metric": "rmse",
+        "tree_method": "hist",
+        "seed": hyperparams.get("random_state", 42),
+        **{name: hyperparams[name] for name in INCREMENTAL_TREE_PARAMS},
+    }
+
+
+def _rmse(booster: xgb.Booster, dmatrix: xgb.DMatrix) -> float:
+    y_pred = np.clip(booster.predict(dmatrix), 0, None)
+    return float(np.sqrt(mean_squared_error(dmatrix.get_label(), y_pred)))
+
+
+def update_channel_model(
+    df: pd.DataFrame,
+    channel: str,
+    mode: str = None,
+    recent_days: int = None,
+    extra_rounds: int = None,
+    holdout_days: int = None
+) -> dict:
+    """
+    Actualiza el modelo XGBoost guardado de un canal sin re-entrenar desde cero.
+
+    Los ultimos `holdout_days` dias quedan fuera como holdout. Modos:
+    - "continue": agrega `extra_rounds` arboles entrenados con los ultimos
+      `recent_days` dias (antes del holdout), partiendo del modelo actual.
+    - "refresh": mantiene la estructura de los arboles y recalcula los valores
+      de las hojas con toda la ventana (updater=refresh).
+
+    Guard: si el modelo actualizado es peor en el holdout que un
+    re-entrenamiento completo (INCREMENTAL_GUARD=full, por defecto; con
+    INCREMENTAL_GUARD=current, que el modelo actual) por mas de
+    INCREMENTAL_MAX_DEGRADATION se descarta la actualizacion: con el guard
+    full se registra el modelo re-entrenado del guard y con current se
+    re-entrena con train_channel_model. Si el modelo ya supera
+    INCREMENTAL_MAX_TREES se re-entrena con train_channel_model.
+    """
+    mode = mode or settings.incremental_mode
+    recent_days = recent_days or settings.incremental_recent_days
+    extra_rounds = extra_rounds or settings.incremental_extra_rounds
+    holdout_days = holdout_days or settings.incremental_holdout_days
+    if mode not in ("continue", "refresh"):
+        raise ValueError(f"Modo incremental desconocido: {mode}")
+    
+    print(f"\n{'='*60}")
+    print(f"ACTUALIZACION INCREMENTAL: {channel.upper()} ({mode})")
+    print(f"{'='*60}")
+    
+    def full_retrain(reason: str) -> dict:
+        print(f"  ↻ Re-entrenamiento completo: {reason}")
+        result = train_channel_model(df, channel)
+        result["update"] = {"mode": "full_retrain", "reason": reason}
+        return result
+    
+    current_version = registry.current_version(channel)
+    if current_version is None or registry.load_manifest(channel, current_version)["model_type"] != "xgboost":
+        return full_retrain("no_xgboost_model")
+    
+    parent_manifest = registry.load_manifest(channel, current_version)
+    current = xgb.Booster()
+    current.load_model(str(registry.artifact_path(channel, current_version)))
+    raw_transformer = current.attr("feature_transformer")
+    trained_until = current.attr("trained_until")
+    if raw_transformer is None or trained_until is None:
+        return full_retrain("legacy_model")
+    
+    transformer = FeatureTransformer.from_json(raw_transformer)
+    if transformer.features != [f for f in get_feature_columns() if f != "is_google_ads"]:
+        return full_retrain("feature_spec_changed")
+    
+    hyperparams = json.loads(current.attr("hyperparams") or json.dumps(HYPERPARAMS_XGBOOST))
+    n_updates = int(current.attr("incremental_updates") or 0)
+    n_trees = current.num_boosted_rounds()
+    if mode == "continue" and n_trees + extra_rounds > settings.incremental_max_trees:
+        return full_retrain(f"max_trees ({n_trees} arboles)")
+    
+    # Holdout: ultimos dias; datos de actualizacion: lo anterior
+    df_channel = df[df["channel"] == channel]
+    dates = np.sort(df_channel["date"].unique())
+    if len(dates) <= holdout_days:
+        return {"status": "skipped", "reason": "insufficient_data"}
+    holdout_start = dates[-holdout_days]
+    fit_df = df_channel[df_channel["date"] < holdout_start]
+    holdout_df = df_channel[df_channel["date"] >= holdout_start]
+    
+    last_fit_date = pd.Timestamp(fit_df["date"].max())
+    if last_fit_date <= pd.Timestamp(trained_until):
+        print(f"  Sin datos nuevos (modelo entrenado hasta {trained_until})")
+        return {"status": "up_to_date", "trained_until": trained_until}
+    
+    if mode == "continue":
+        fit_df = fit_df[fit_df["date"] > last_fit_date - pd.Timedelta(days=recent_days)]
+    
+    target = get_target_column()
+    X_holdout, y_holdout = transformer.transform(holdout_df), holdout_df[target].values
+    dfit = xgb.DMatrix(transformer.transform(fit_df), label=fit_df[target].values)
+    dholdout = xgb.DMatrix(X_holdout, label=y_holdout)
+    
+    params = _booster_train_params(hyperparams)
+    if mode == "continue":
+        updated = xgb.train(params, dfit, num_boost_round=extra_rounds, xgb_model=current)
+    else:
+        params.pop("tree_method")
+        params.update({"process_type": "update", "updater": "refresh", "refresh_leaf": True})
+        updated = xgb.train(params, dfit, num_boost_round=n_trees, xgb_model=current)
+    
+    current_rmse = _rmse(current, dholdout)
+    updated_rmse = _rmse(updated, dholdout)
+    reference_rmse = current_rmse
+    full_model = None
+    if settings.incremental_guard == "full":
+        X_fit = transformer.transform(df_channel[df_channel["date"] < holdout_start])
+        y_fit = df_channel.loc[df_channel["date"] < holdout_start, target].values
+        full_model, _ = train_xgboost(X_fit, y_fit, X_holdout, y_holdout, hyperparams)
+        reference_rmse = _rmse(full_model.get_booster(), dholdout)
+    
+    print(f"  Holdout ({len(holdout_df)} filas desde {pd.Timestamp(holdout_start).date()}):")
+    print(f"    Modelo actual:      RMSE {current_rmse:.4f}")
+    if full_model is not None:
+        print(f"    Re-entrenamiento:   RMSE {reference_rmse:.4f}")
+    print(f"    Modelo actualizado: RMSE {updated_rmse:.4f} ({len(fit_df)} filas, {updated.num_boosted_rounds()} arboles)")
+    
+    holdout = {
+        "rows": len(holdout_df),
+        "current_rmse": current_rmse,
+        "reference_rmse": reference_rmse,
+        "updated_rmse": updated_rmse,
+    }
+    max_rmse = reference_rmse * (1 + settings.incremental_max_degradation)
+    if updated_rmse > max_rmse:
+        reason = f"degradacion en holdout ({updated_rmse:.4f} > {max_rmse:.4f})"
+        if full_model is None:
+            return full_retrain(reason)
+        # El guard ya entreno el modelo completo con los mismos datos: se registra ese
+        print(f"  ↻ Re-entrenamiento completo: {reason}")
+        booster, parent_version, n_updates = full_model.get_booster(), None, 0
+        update = {"mode": "full_retrain", "reason": reason, "rows": len(y_fit)}
+    else:
+        booster, parent_version, n_updates = updated, current_version, n_updates + 1
+        update = {"mode": mode, "rows": len(fit_df)}
+    
+    booster.set_attr(
+        feature_transformer=transformer.to_json(),
+        hyperparams=json.dumps(hyperparams),
+        trained_until=str(last_fit_date.date()),
+        incremental_updates=str(n_updates),
+    )
+    update.update({
+        "trees": booster.num_boosted_rounds(),
+        "incremental_updates": n_updates,
+        "trained_until": str(last_fit_date.date()),
+        "holdout": holdout,
+    })
+    version = registry.register_model(
+        channel, "xgboost", lambda path: booster.save_model(str(path)),
+        {**parent_manifest, "trained_until": str(last_fit_date.date()), "update": update},
+        parent_version=parent_version,
+    )
+    model_path = registry.artifact_path(channel, version)
+    print(f"  ✓ Modelo actualizado: {channel}/{version}" + (f" (padre {parent_version})" if parent_version else ""))
+    
+    return {
+        "status": "updated",
+        "channel": channel,
+        "model_type": "xgboost",
+        "model_path": str(model_path),
+        "model_version": version,
+        "update": update,
+    }
+
+
+def update_all_models(lookback_days: int = 90, mode: str = None) -> dict:
+    """
+    Actualizacion incremental diaria de los modelos de ambos canales. Los
+    canales que no pasan el guard se re-entrenan completos. El resultado se
+    agrega a training_metrics.json (el de un re-entrenamiento reemplaza al del canal).
+    """
+    print("=" * 60)
+    print("ACTUALIZACION INCREMENTAL MODELOS ROAS")
+    print("=" * 60)
+    
+    df = get_features(lookback_days)
+    if df.empty:
+        raise ValueError("No hay datos disponibles")
+    
+    metrics_path = MODEL_DIR / "training_metrics.json"
+    metrics = {"models": {}}
+    if metrics_path.exists():
+        with open(metrics_path) as f:
+            metrics = json.load(f)
+    
+    updates = {}
+    for channel in ["google_ads", "meta_ads"]:
+        result = update_channel_model(df, channel, mode=mode)
+        updates[channel] = result
+        if result["status"] == "trained":
+            metrics["models"][channel] = result
+        elif result["status"] == "updated":
+            channel_metrics = metrics["models"].setdefault(channel, {})
+            channel_metrics.update(model_path=result["model_path"], model_version=result["model_version"])
+            channel_metrics["last_update"] = {"timestamp": datetime.now().isoformat(), **result["update"]}
+    
+    with open(metrics_path, "w") as f:
+        json.dump(metrics, f, indent=2, default=str)
+    print(f"\nMetricas guardadas: {metrics_path}")
+    return updates
+
+
 # =============================================================================
 # FUNCION PRINCIPAL
 # =============================================================================
-def train_all_models(lookback_days: int = 90) -> dict:
-    """Entrena modelos separados para cada canal."""
+def train_all_models(
+    lookback_days: int = 90,
+    refresh_features: bool = False,
+    parallel: bool = None,
+    tune: bool = None
+) -> dict:
+    """
+    Entrena modelos separados para cada canal. El dataset se lee del feature
+    store (refresh_features=True lo reconstruye desde BigQuery). Con parallel
+    (por defecto TRAIN_PARALLEL) los modelos se entrenan en un pool de procesos;
+    con tune (por defecto TRAIN_TUNING) XGBoost usa la mejor configuracion de
+    la busqueda con CV temporal.
+    """
+    if parallel is None:
+        parallel = settings.train_parallel
+    if tune is None:
+        tune = settings.train_tuning
+    
     print("=" * 60)
     print("ENTRENAMIENTO MODELOS ROAS - POR CANAL")
     print("=" * 60)
@@ -277,7 +649,7 @@ def train_all_models(lookback_days: int = 90) -> dict:
     
     # Cargar datos
     print("\n>>> Cargando datos...")
-    df = build_features_dataframe(lookback_days)
+    df = get_features(lookback_days, refresh=refresh_features)
     
     if df.empty:
         raise ValueError("No hay datos disponibles")
@@ -293,9 +665,13 @@ def train_all_models(lookback_days: int = 90) -> dict:
         "models": {}
     }
     
-    for channel in ["google_ads", "meta_ads"]:
-        result = train_channel_model(df, channel)
-        results["models"][channel] = result
+    channels = ["google_ads", "meta_ads"]
+    if parallel:
+        results["models"] = train_channels_parallel(df, channels, max_workers=settings.train_workers or None, tune=tune)
+    else:
+        for channel in channels:
+            result = train_channel_model(df, channel, tune=tune)
+            results["models"][channel] = result
     
     # Resumen final
     print("\n" + "=" * 60)
@@ -323,4 +699,8 @@ def train_all_models(lookback_days: int = 90) -> dict:
 
 
 if __name__ == "__main__":
-    train_all_models(lookback_days=90)
\ No newline at end of file
+    import sys
+    if "--incremental" in sys.argv:
+        update_all_models(lookback_days=90)
+    else:
+        train_all_models(lookback_days=90)
\ No newline at end of file
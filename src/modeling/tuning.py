@@ -0,0 +1,250 @@
+"""
+Busqueda de hiperparametros de XGBoost con validacion cruzada temporal.
+
+- Rolling-origin: cada fold entrena con todos los dias anteriores a un corte y
+  valida con los `horizon` dias siguientes; los cortes avanzan hacia el
+  presente, nunca se valida con el pasado.
+- Los DMatrix de cada fold (QuantileDMatrix de train + valid con la misma
+  cuantizacion) se construyen una sola vez y se comparten entre trials.
+- Los trials corren en paralelo en un pool de hilos (xgb.train libera el GIL)
+  con `cpu_count // workers` hilos de XGBoost cada uno.
+- Early stopping por fold y poda por mediana: un trial se abandona si tras un
+  fold su RMSE medio es peor que la mediana de los trials que ya pasaron por
+  ese fold.
+
+    search = search_hyperparameters(df, features, HYPERPARAMS_XGBOOST)
+    search["best_params"]  # -> dict listo para train_xgboost
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from src.config import settings
+from src.modeling.features import FeatureTransformer, get_target_column
+
+logger = logging.getLogger(__name__)
+
+PARAM_SPACE = {
+    "max_depth": [2, 3, 4, 5, 6],
+    "learning_rate": [0.01, 0.03, 0.05, 0.1],
+    "subsample": [0.6, 0.7, 0.8, 1.0],
+    "colsample_bytree": [0.6, 0.7, 0.8, 1.0],
+    "reg_lambda": [0.5, 1.0, 2.0, 5.0, 10.0],
+    "reg_alpha": [0.0, 0.5, 1.0, 2.0],
+    "min_child_weight": [1, 3, 5, 10],
+    "gamma": [0.0, 0.5, 1.0],
+}
+
+MAX_BOOST_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 50
+MAX_BIN = 256
+MIN_TRAIN_DAYS = 14
+
+
+# =============================================================================
+# FOLDS TEMPORALES
+# =============================================================================
+def rolling_origin_folds(dates: pd.Series, n_folds: int, horizon: Optional[int] = None) -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    Mascaras (train, valid) de cada fold. Con horizon=None los dias disponibles
+    se reparten entre MIN_TRAIN_DAYS de train inicial y n_folds ventanas de validacion.
+    """
+    dates = pd.to_datetime(dates).to_numpy()
+    unique_dates = np.unique(dates)
+    n_days = len(unique_dates)
+    if horizon is None:
+        horizon = max(1, (n_days - MIN_TRAIN_DAYS) // n_folds)
+    if n_days < MIN_TRAIN_DAYS + horizon:
+        raise ValueError(f"Se necesitan al menos {MIN_TRAIN_DAYS + horizon} fechas distintas, hay {n_days}.")
+
+    folds = []
+    for k in range(n_folds, 0, -1):
+        cutoff = n_days - k * horizon
+        if cutoff < MIN_TRAIN_DAYS:
+            continue
+        valid_end = unique_dates[min(cutoff + horizon, n_days) - 1]
+        train_mask = dates < unique_dates[cutoff]
+        valid_mask = (dates >= unique_dates[cutoff]) & (dates <= valid_end)
+        folds.append((train_mask, valid_mask))
+    return folds
+
+
+class FoldCache:
+    """DMatrix de cada fold, construidos una vez y reutilizados por todos los trials."""
+
+    def __init__(self, df: pd.DataFrame, features: list[str], n_folds: int):
+        target = get_target_column()
+        self.folds: list[tuple[xgb.DMatrix, xgb.DMatrix]] = []
+        for train_mask, valid_mask in rolling_origin_folds(df["date"], n_folds):
+            train_df, valid_df = df[train_mask], df[valid_mask]
+            # Transformer por fold: el winsorizado solo ve el train del fold
+            transformer = FeatureTransformer(features).fit(train_df)
+            dtrain = xgb.QuantileDMatrix(
+                transformer.transform(train_df), train_df[target].to_numpy(), max_bin=MAX_BIN
+            )
+            dvalid = xgb.QuantileDMatrix(
+                transformer.transform(valid_df), valid_df[target].to_numpy(), ref=dtrain
+            )
+            self.folds.append((dtrain, dvalid))
+
+    def __len__(self) -> int:
+        return len(self.folds)
+
+
+# =============================================================================
+# PODA
+# =============================================================================
+class MedianPruner:
+    """Poda un trial si su RMSE medio tras un fold supera la mediana de ese fold."""
+
+    def __init__(self, n_startup_trials: int = 4):
+        self.n_startup_trials = n_startup_trials
+        self._lock = threading.Lock()
+        self._history: dict[int, list[float]] = {}
+
+    def should_prune(self, step: int, value: float) -> bool:
+        with self._lock:
+            seen = self._history.setdefault(step, [])
+            prune = len(seen) >= self.n_startup_trials and value > float(np.median(seen))
+            seen.append(value)
+            return prune
+
+
+# =============================================================================
+# TRIALS
+# =============================================================================
+def sample_params(rng: np.random.Generator, space: dict = None) -> dict:
+    space = space or PARAM_SPACE
+    return {name: values[rng.integers(len(values))] for name, values in space.items()}
+
+
+def _booster_params(params: dict, n_threads: int) -> dict:
+    return {
+        "objective": "reg:squarederror",
+        "eval_metric": "rmse",
+        "tree_method": "hist",
+        "max_bin": MAX_BIN,
+        "nthread": n_threads,
+        "seed": params.get("random_state", 42),
+        **{name: params[name] for name in PARAM_SPACE},
+    }
+
+
+def run_trial(trial_id: int, params: dict, cache: FoldCache, pruner: MedianPruner, n_threads: int) -> dict:
+    """Evalua un set de hiperparametros fold a fold (early stopping + poda)."""
+    booster_params = _booster_params(params, n_threads)
+    scores, rounds = [], []
+    for step, (dtrain, dvalid) in enumerate(cache.folds):
+        booster = xgb.train(
+            booster_params,
+            dtrain,
+            num_boost_round=MAX_BOOST_ROUNDS,
+            evals=[(dvalid, "valid")],
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+            verbose_eval=False,
+        )
+        scores.append(float(booster.best_score))
+        rounds.append(int(booster.best_iteration) + 1)
+        # El trial 0 (configuracion base) nunca se poda
+        if trial_id and step < len(cache) - 1 and pruner.should_prune(step, float(np.mean(scores))):
+            return {"trial": trial_id, "params": params, "status": "pruned", "folds_evaluated": step + 1,
+                    "cv_rmse": float(np.mean(scores))}
+
+    return {
+        "trial": trial_id,
+        "params": params,
+        "status": "completed",
+        "folds_evaluated": len(scores),
+        "cv_rmse": float(np.mean(scores)),
+        "cv_rmse_std": float(np.std(scores)),
+        "n_estimators": int(np.mean(rounds)),
+    }
+
+
+# =============================================================================
+# BUSQUEDA
+# =============================================================================
+def search_hyperparameters(
+    df: pd.DataFrame,
+    features: list[str],
+    base_params: dict,
+    n_trials: int = None,
+    n_folds: int = None,
+    max_workers: int = None,
+    seed: int = 42
+) -> dict:
+    """
+    Busqueda aleatoria sobre PARAM_SPACE con CV temporal. El primer trial es
+    `base_params`, de modo que el resultado nunca es peor (en CV) que la
+    configuracion fija. Retorna el resumen para training_metrics.json con
+    `best_params` (incluye n_estimators por early stopping).
+    """
+    n_trials = n_trials or settings.tuning_trials
+    n_folds = n_folds or settings.tuning_folds
+    started = time.perf_counter()
+
+    cache = FoldCache(df, features, n_folds)
+    if not len(cache):
+        raise ValueError("No hay suficientes fechas para la validacion cruzada temporal")
+
+    rng = np.random.default_rng(seed)
+    candidates = [{name: base_params[name] for name in PARAM_SPACE}]
+    candidates += [sample_params(rng) for _ in range(n_trials - 1)]
+
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(len(candidates), max_workers or settings.tuning_workers or cpu_count))
+    n_threads = max(1, cpu_count // workers)
+    pruner = MedianPruner()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tuning") as pool:
+        trials = list(pool.map(
+            lambda item: run_trial(item[0], {**base_params, **item[1]}, cache, pruner, n_threads),
+            enumerate(candidates),
+        ))
+
+    completed = sorted((t for t in trials if t["status"] == "completed"), key=lambda t: t["cv_rmse"])
+    best = completed[0]
+    best_params = {**best["params"], "n_estimators": best["n_estimators"]}
+    elapsed = time.perf_counter() - started
+
+    logger.info(
+        f"Busqueda: {len(trials)} trials ({len(trials) - len(completed)} podados), {len(cache)} folds, "
+        f"{workers} hilos x {n_threads}, mejor RMSE CV {best['cv_rmse']:.4f} en {elapsed:.1f}s"
+    )
+    return {
+        "folds": len(cache),
+        "trials": len(trials),
+        "completed": len(completed),
+        "pruned": len(trials) - len(completed),
+        "best_trial": best["trial"],
+        "best_params": best_params,
+        "best_cv_rmse": best["cv_rmse"],
+        "best_cv_rmse_std": best["cv_rmse_std"],
+        "base_cv_rmse": trials[0]["cv_rmse"],
+        "top_trials": [
+            {"trial": t["trial"], "cv_rmse": t["cv_rmse"], "n_estimators": t["n_estimators"]}
+            for t in completed[:5]
+        ],
+        "elapsed_seconds": round(elapsed, 2),
+    }
+
+
+if __name__ == "__main__":
+    from src.modeling.feature_store import get_features
+    from src.modeling.features import get_feature_columns
+    from src.modeling.train import HYPERPARAMS_XGBOOST
+
+    logging.basicConfig(level=logging.INFO)
+    df = get_features(90)
+    features = [f for f in get_feature_columns() if f != "is_google_ads"]
+    for channel in ["google_ads", "meta_ads"]:
+        result = search_hyperparameters(df[df["channel"] == channel], features, HYPERPARAMS_XGBOOST)
+        print(f"{channel}: RMSE CV {result['best_cv_rmse']:.4f} (base {result['base_cv_rmse']})")
+        print(f"  {result['best_params']}")
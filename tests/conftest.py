@@ -0,0 +1,38 @@
+"""Fixtures compartidas: backend DuckDB sobre snapshots sinteticos."""
+from datetime import date, timedelta
+
+import pytest
+
+from src.config import settings
+
+# Las vistas con lookback resuelven la ventana contra date.today()
+END_DATE = date.today() - timedelta(days=1)
+
+
+@pytest.fixture(scope="session")
+def snapshot_dir(tmp_path_factory):
+    from src.data.synthetic import generate_snapshots
+
+    out_dir = tmp_path_factory.mktemp("snapshots")
+    generate_snapshots(str(out_dir), campaigns=8, days=60, end_date=END_DATE, seed=7)
+    return out_dir
+
+
+@pytest.fixture
+def duckdb_backend(snapshot_dir, tmp_path, monkeypatch):
+    """Vistas sobre DuckDB con los snapshots sinteticos, sin cache ni sync."""
+    from src.data.duckdb_backend import reload_snapshots
+
+    overrides = {
+        "query_backend": "duckdb",
+        "duckdb_snapshot_dir": str(snapshot_dir),
+        "duckdb_path": ":memory:",
+        "query_cache_enabled": False,
+        "data_sync_mode": "full",
+        "feature_store_dir": str(tmp_path / "features"),
+    }
+    for key, value in overrides.items():
+        monkeypatch.setattr(settings, key, value)
+    reload_snapshots()
+    yield
+    reload_snapshots()
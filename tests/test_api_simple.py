@@ -0,0 +1,71 @@
+"""Tests de serializacion de la API simple."""
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from src import api_simple
+
+
+def test_dashboard_serializes_nan_as_null(monkeypatch):
+    channels = pd.DataFrame({"channel": ["google_ads", "meta_ads"], "roas": [2.5, np.nan]})
+    monthly = pd.DataFrame({"month": ["2024-01"], "ctr": [np.nan]})
+    top = pd.DataFrame({"campaign_id": ["c1"], "predicted_roas": [np.nan]})
+
+    async def channel_summary():
+        return channels
+
+    async def monthly_performance():
+        return monthly
+
+    monkeypatch.setattr(api_simple, "get_channel_summary_async", channel_summary)
+    monkeypatch.setattr(api_simple, "get_campaign_performance_monthly_async", monthly_performance)
+    monkeypatch.setattr(api_simple, "get_top_campaigns_by_predicted_roas", lambda top_n: top)
+
+    body = TestClient(api_simple.app).get("/api/dashboard").json()
+
+    assert body["status"] == "success"
+    assert body["data"]["channel_summary"] == [
+        {"channel": "google_ads", "roas": 2.5},
+        {"channel": "meta_ads", "roas": None},
+    ]
+    assert body["data"]["monthly_performance"] == [{"month": "2024-01", "ctr": None}]
+    assert body["data"]["top_campaigns"] == [{"campaign_id": "c1", "predicted_roas": None}]
+
+
+def test_channel_summary_serializes_nan_as_null(monkeypatch):
+    channels = pd.DataFrame({"channel": ["google_ads", "meta_ads"], "cpc": [np.nan, 0.4], "roas": [2.5, np.nan]})
+
+    async def channel_summary():
+        return channels
+
+    monkeypatch.setattr(api_simple, "get_channel_summary_async", channel_summary)
+
+    response = TestClient(api_simple.app).get("/api/channel-summary")
+
+    assert response.status_code == 200
+    assert response.json()["data"] == [
+        {"channel": "google_ads", "cpc": None, "roas": 2.5},
+        {"channel": "meta_ads", "cpc": 0.4, "roas": None},
+    ]
+
+
+def test_top_campaigns_serializes_nan_as_null(monkeypatch):
+    top = pd.DataFrame({
+        "campaign_id": ["c1", "c2"],
+        "predicted_roas": [3.1, np.nan],
+        "last_date": [pd.Timestamp("2024-01-31"), pd.NaT],
+    })
+    requested = []
+
+    def top_campaigns(top_n):
+        requested.append(top_n)
+        return top
+
+    monkeypatch.setattr(api_simple, "get_top_campaigns_by_predicted_roas", top_campaigns)
+
+    body = TestClient(api_simple.app).get("/api/top-campaigns", params={"limit": 2}).json()
+
+    assert body["status"] == "success"
+    assert requested == [2]
+    assert [row["predicted_roas"] for row in body["data"]] == [3.1, None]
+    assert body["data"][1]["last_date"] is None
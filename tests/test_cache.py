@@ -0,0 +1,72 @@
+"""Tests del cache Parquet de resultados (src/data/cache.py)."""
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from src.data.cache import QueryResultCache, make_cache_key
+
+QUERY = "SELECT * FROM t WHERE x = 1"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return QueryResultCache(tmp_path, ttl_seconds=60)
+
+
+def test_roundtrip(cache):
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+    cache.set(QUERY, df)
+    pd.testing.assert_frame_equal(cache.get(QUERY), df)
+
+
+def test_key_ignores_whitespace_and_uses_params():
+    assert make_cache_key("SELECT  1\n;") == make_cache_key("SELECT 1")
+    assert make_cache_key("SELECT 1", {"d": 1}) != make_cache_key("SELECT 1", {"d": 2})
+    assert make_cache_key("SELECT 1", namespace="duckdb") != make_cache_key("SELECT 1")
+
+
+def test_ttl_expiry_keeps_stale_entry(cache, monkeypatch):
+    cache.set(QUERY, pd.DataFrame({"a": [1]}))
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert cache.get(QUERY) is None
+    stale = cache.get_entry(QUERY)
+    assert stale is not None and stale[1] > 60
+    assert cache.get_entry(QUERY, max_age=30) is None
+
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    df = pd.DataFrame({"a": range(1000)})
+    cache = QueryResultCache(tmp_path, max_bytes=10**9)
+    queries = [f"SELECT {i}" for i in range(3)]
+    for q in queries:
+        cache.set(q, df)
+    entry_size = cache.size_bytes() // 3
+
+    # Antiguedad explicita: q0 la mas vieja; leer q0 la vuelve la mas reciente
+    for age, q in zip((300, 200, 100), queries):
+        path = cache._path(make_cache_key(q))
+        os.utime(path, (time.time() - age, time.time() - age))
+    assert cache.get(queries[0]) is not None
+
+    cache.max_bytes = entry_size * 3
+    cache.set("SELECT 3", df)
+    assert cache.get(queries[1]) is None
+    assert cache.get(queries[0]) is not None
+    assert cache.get("SELECT 3") is not None
+
+
+def test_invalidate_one_and_all(cache):
+    df = pd.DataFrame({"a": [1]})
+    cache.set(QUERY, df)
+    cache.set(QUERY, df, params={"d": 1})
+    cache.set("SELECT 2", df)
+
+    assert cache.invalidate(QUERY) == 1
+    assert cache.get(QUERY) is None
+    assert cache.get(QUERY, params={"d": 1}) is not None
+    assert cache.invalidate() == 2
+    assert cache.size_bytes() == 0
@@ -0,0 +1,53 @@
+"""Tests de los dtypes compactos opt-in (execute_query(compact=True))."""
+import pandas as pd
+
+from src.data import views
+from src.data.bigquery_client import compact_dtypes, execute_query
+from tests.conftest import END_DATE
+
+QUERY = "SELECT campaign_name, device, impressions FROM gads_campaign"
+
+
+def test_compact_dtypes_categories_and_downcast():
+    df = pd.DataFrame({"name": ["a", "b"] * 50, "clicks": range(100), "cost": [1.5] * 100})
+    out = compact_dtypes(df.copy(), float32=True)
+    assert out["name"].dtype == "category"
+    assert out["clicks"].dtype == "int8"
+    assert out["cost"].dtype == "float32"
+
+
+def test_execute_query_plain_by_default(duckdb_backend):
+    df = execute_query(QUERY)
+    assert pd.api.types.is_string_dtype(df["device"])
+    assert not isinstance(df["device"].dtype, pd.CategoricalDtype)
+    assert df["impressions"].dtype == "int64"
+
+    compact = execute_query(QUERY, compact=True)
+    assert compact["device"].dtype == "category"
+    assert compact["impressions"].dtype != "int64"
+
+
+def test_views_match_plain_facts(duckdb_backend, monkeypatch):
+    start = (END_DATE - pd.Timedelta(days=40)).isoformat()
+    compact = {
+        "monthly": views.get_campaign_performance_monthly(start),
+        "summary": views.get_channel_summary(start),
+        "training": views.get_roas_training_dataset(30),
+    }
+
+    plain_query = views.execute_query
+    monkeypatch.setattr(views, "execute_query", lambda query, params=None, **kw: plain_query(query, params))
+    plain = {
+        "monthly": views.get_campaign_performance_monthly(start),
+        "summary": views.get_channel_summary(start),
+        "training": views.get_roas_training_dataset(30),
+    }
+
+    for name, df in compact.items():
+        assert not df.empty, name
+        pd.testing.assert_frame_equal(
+            df.astype(object).reset_index(drop=True),
+            plain[name].astype(object).reset_index(drop=True),
+            check_dtype=False,
+            obj=name,
+        )
@@ -0,0 +1,160 @@
+"""Tests del evaluador NumPy de arboles contra xgboost.Booster.predict."""
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from src.config import settings
+from src.modeling import predict, registry
+from src.modeling.compiled_trees import ALIGNMENT, BATCH_ROWS, CompiledForest
+
+N_FEATURES = 6
+
+
+def _data(n: int, seed: int = 0, nan_fraction: float = 0.1) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, N_FEATURES)).astype(np.float32)
+    y = 2 * X[:, 0] - X[:, 1] ** 2 + np.where(X[:, 2] > 0, 3.0, -1.0) + rng.normal(scale=0.1, size=n)
+    X[rng.random(X.shape) < nan_fraction] = np.nan
+    return X, y
+
+
+def _train(tmp_path, params: dict = None, rounds: int = 30, early_stopping: bool = False):
+    X, y = _data(2000)
+    dtrain = xgb.DMatrix(X[:1500], label=y[:1500])
+    dvalid = xgb.DMatrix(X[1500:], label=y[1500:])
+    booster = xgb.train(
+        {"objective": "reg:squarederror", "tree_method": "hist", "max_depth": 4, "eta": 0.3, "seed": 0, **(params or {})},
+        dtrain,
+        num_boost_round=rounds,
+        evals=[(dvalid, "valid")] if early_stopping else [],
+        early_stopping_rounds=3 if early_stopping else None,
+        verbose_eval=False,
+    )
+    path = tmp_path / "model.json"
+    booster.save_model(str(path))
+    return booster, path
+
+
+def _assert_same_predictions(booster: xgb.Booster, forest: CompiledForest, X: np.ndarray) -> None:
+    # Como XGBRegressor.predict: con early stopping solo hasta best_iteration
+    best_iteration = booster.attr("best_iteration")
+    rounds = int(best_iteration) + 1 if best_iteration is not None else 0
+    expected = booster.predict(xgb.DMatrix(X), iteration_range=(0, rounds))
+    np.testing.assert_allclose(forest.predict(X), expected, rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"max_depth": 1},
+    {"max_depth": 8, "min_child_weight": 0},
+    {"objective": "reg:pseudohubererror", "base_score": 1.5},
+    {"objective": "reg:absoluteerror"},
+])
+def test_matches_booster_predict(tmp_path, params):
+    booster, path = _train(tmp_path, params)
+    X, _ = _data(1000, seed=1)
+    _assert_same_predictions(booster, CompiledForest.load(path), X)
+
+
+def test_missing_values_follow_default_direction(tmp_path):
+    booster, path = _train(tmp_path)
+    X, _ = _data(500, seed=2, nan_fraction=0.6)
+    X[:10] = np.nan
+    _assert_same_predictions(booster, CompiledForest.load(path), X)
+
+
+def test_best_iteration_limits_trees(tmp_path):
+    booster, path = _train(tmp_path, rounds=200, early_stopping=True)
+    assert booster.best_iteration + 1 < booster.num_boosted_rounds()
+    X, _ = _data(300, seed=3)
+    _assert_same_predictions(booster, CompiledForest.load(path), X)
+
+
+@pytest.mark.parametrize("n_rows", [1, BATCH_ROWS - 1, BATCH_ROWS, BATCH_ROWS * 3 + 7])
+def test_batch_boundaries(tmp_path, n_rows):
+    booster, path = _train(tmp_path)
+    X, _ = _data(n_rows, seed=4)
+    _assert_same_predictions(booster, CompiledForest.load(path), X)
+
+
+def test_single_row_vector_and_attributes(tmp_path):
+    booster, path = _train(tmp_path)
+    booster.set_attr(feature_transformer='{"features": []}')
+    booster.save_model(str(path))
+    forest = CompiledForest.load(path)
+
+    X, _ = _data(1, seed=5)
+    np.testing.assert_allclose(forest.predict(X[0]), booster.predict(xgb.DMatrix(X)), rtol=1e-5, atol=1e-5)
+    assert forest.attr("feature_transformer") == '{"features": []}'
+    assert forest.attr("missing") is None
+    with pytest.raises(ValueError):
+        forest.predict(np.zeros((2, N_FEATURES + 1)))
+
+
+@pytest.mark.parametrize("params", [
+    {"objective": "reg:logistic"},
+    {"objective": "count:poisson"},
+    {"booster": "gblinear"},
+])
+def test_unsupported_models_raise(tmp_path, params):
+    X, y = _data(200)
+    booster = xgb.train({"objective": "reg:squarederror", **params}, xgb.DMatrix(X, label=np.clip(y, 0, 1)), num_boost_round=3)
+    path = tmp_path / "model.json"
+    booster.save_model(str(path))
+    with pytest.raises(ValueError):
+        CompiledForest.load(path)
+
+
+# =============================================================================
+# ARTEFACTO .forest (MEMORY-MAPPED)
+# =============================================================================
+@pytest.mark.parametrize("params", [{}, {"max_depth": 1}, {"max_depth": 8, "min_child_weight": 0}])
+def test_forest_artifact_matches_booster(tmp_path, params):
+    booster, path = _train(tmp_path, params)
+    booster.set_attr(trained_until="2024-03-31")
+    booster.save_model(str(path))
+    CompiledForest.load(path).save(tmp_path / "model.forest")
+    forest = CompiledForest.open(tmp_path / "model.forest")
+
+    X, _ = _data(700, seed=6)
+    _assert_same_predictions(booster, forest, X)
+    assert forest.attr("trained_until") == "2024-03-31"
+
+
+def test_forest_arrays_are_aligned_read_only_views(tmp_path):
+    _, path = _train(tmp_path)
+    compiled = CompiledForest.load(path)
+    compiled.save(tmp_path / "model.forest")
+    forest = CompiledForest.open(tmp_path / "model.forest")
+
+    assert forest.depth == compiled.depth and forest.n_trees == compiled.n_trees
+    for name, array in forest._arrays().items():
+        np.testing.assert_array_equal(array, compiled._arrays()[name])
+        assert not array.flags.writeable
+        assert not array.flags.owndata
+        assert array.ctypes.data % ALIGNMENT == 0, name
+
+
+def test_forest_rejects_other_files(tmp_path):
+    _, path = _train(tmp_path)
+    with pytest.raises(ValueError):
+        CompiledForest.open(path)
+
+
+def test_registry_serves_memory_mapped_forest(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "model_registry_dir", str(tmp_path / "registry"))
+    monkeypatch.setattr(settings, "model_engine", "numpy")
+    booster, path = _train(tmp_path)
+    version = registry.register_model("google_ads", "xgboost", lambda out: booster.save_model(str(out)), {})
+    assert registry.serving_artifact_path("google_ads", version).exists()
+
+    predict.reset_model_cache()
+    try:
+        model = predict.load_channel_model("google_ads")
+        assert isinstance(model, CompiledForest)
+        assert model.model_version == version
+        assert not model.leaves.flags.owndata  # vista del mmap, no una copia
+        X, _ = _data(200, seed=7)
+        _assert_same_predictions(booster, model, X)
+    finally:
+        predict.reset_model_cache()
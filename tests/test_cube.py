@@ -0,0 +1,70 @@
+"""Tests del cubo de rollup local contra pandas groupby."""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.cube import RollupCube
+from src.data.views import FACT_MEASURES, get_daily_facts
+
+from tests.conftest import END_DATE
+
+
+@pytest.fixture
+def facts(duckdb_backend):
+    return get_daily_facts()
+
+
+def _expected(df: pd.DataFrame, group_by: list[str]) -> pd.DataFrame:
+    """Referencia: sumas por grupo y ratios derivados de las sumas."""
+    df = df.assign(
+        date=pd.to_datetime(df["date"]).dt.normalize(),
+        **{col: df[col].astype(float) for col in FACT_MEASURES},
+    )
+    df["month"] = df["date"].dt.strftime("%Y-%m")
+    for col in ["channel", "campaign_id", "device", "campaign_status"]:
+        df[col] = df[col].astype(object).fillna("")
+    grouped = df.groupby(group_by, observed=True).agg(
+        **{col: (col, "sum") for col in FACT_MEASURES},
+        campaigns=("campaign_id", "nunique"),
+    ).reset_index()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grouped["ctr"] = (grouped["clicks"] / grouped["impressions"]).where(grouped["impressions"] != 0)
+        grouped["cpc"] = (grouped["cost"] / grouped["clicks"]).where(grouped["clicks"] != 0)
+        grouped["conversion_rate"] = (grouped["conversions"] / grouped["clicks"]).where(grouped["clicks"] != 0)
+        grouped["roas"] = (grouped["revenue"] / grouped["cost"]).where(grouped["cost"] != 0)
+    return grouped.sort_values(group_by).reset_index(drop=True)
+
+
+def _compare(result: pd.DataFrame, expected: pd.DataFrame, group_by: list[str]) -> None:
+    result = result.sort_values(group_by).reset_index(drop=True)
+    assert len(result) == len(expected)
+    for key in group_by:
+        assert list(result[key].astype(str)) == list(expected[key].astype(str))
+    for col in FACT_MEASURES + ["campaigns", "ctr", "cpc", "conversion_rate", "roas"]:
+        np.testing.assert_allclose(result[col].astype(float), expected[col].astype(float), rtol=1e-9, err_msg=col)
+
+
+@pytest.mark.parametrize("group_by", [["channel"], ["month", "channel"], ["campaign_id", "device"]])
+def test_slice_matches_groupby(facts, group_by):
+    cube = RollupCube.from_facts(facts)
+    _compare(cube.slice(group_by=group_by), _expected(facts, group_by), group_by)
+
+
+def test_slice_filters_and_date_range(facts):
+    start = END_DATE - timedelta(days=13)
+    cube = RollupCube.from_facts(facts)
+    result = cube.slice(channel="google_ads", date_range=(str(start), str(END_DATE)), group_by=["device"])
+
+    dates = pd.to_datetime(facts["date"]).dt.date
+    subset = facts[(facts["channel"] == "google_ads") & (dates >= start) & (dates <= END_DATE)]
+    assert len(subset) > 0
+    _compare(result, _expected(subset, ["device"]), ["device"])
+
+
+def test_total_without_group_by(facts):
+    total = RollupCube.from_facts(facts).slice()
+    assert len(total) == 1
+    np.testing.assert_allclose(total["roas"], facts["revenue"].sum() / facts["cost"].sum())
+    assert total["campaigns"].iloc[0] == facts["campaign_id"].nunique()
@@ -0,0 +1,58 @@
+"""Tests del feature store: construccion por ventanas vs en memoria."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config import settings
+from src.modeling import feature_store
+from src.modeling.feature_store import build_features_chunked, load_feature_keys, load_feature_matrix, load_features
+from src.modeling.features import build_features_dataframe
+from src.modeling.out_of_core import train_channel_out_of_core
+from src.modeling.train import HYPERPARAMS_XGBOOST
+
+LOOKBACK = 45
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.astype({col: str for col in ["campaign_id", "campaign_name", "channel"]})
+    df["date"] = pd.to_datetime(df["date"]).astype("datetime64[ns]")
+    return df.sort_values(["date", "campaign_id"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("window_days", [7, 30, 365])
+def test_chunked_build_matches_in_memory(duckdb_backend, window_days):
+    expected = build_features_dataframe(LOOKBACK)
+    assert build_features_chunked(LOOKBACK, window_days=window_days) is not None
+    stored = load_features(LOOKBACK)
+
+    assert list(stored.columns) == list(expected.columns)
+    expected, stored = _sorted(expected), _sorted(stored)
+    for col in expected.columns:
+        if pd.api.types.is_numeric_dtype(expected[col]):
+            np.testing.assert_allclose(stored[col].to_numpy(dtype=float), expected[col].to_numpy(dtype=float), rtol=1e-12, err_msg=col)
+        else:
+            assert stored[col].tolist() == expected[col].tolist(), col
+
+
+def test_chunked_build_without_data(duckdb_backend, monkeypatch):
+    monkeypatch.setattr(feature_store, "iter_feature_windows", lambda *args: iter(()))
+    assert build_features_chunked(LOOKBACK) is None
+    assert load_feature_matrix(LOOKBACK) is None
+
+
+@pytest.mark.parametrize("external_memory", [False, True])
+def test_out_of_core_training_on_chunked_store(duckdb_backend, tmp_path, monkeypatch, external_memory):
+    monkeypatch.setattr(settings, "model_registry_dir", str(tmp_path / "registry"))
+    monkeypatch.setattr(settings, "ooc_cache_dir", str(tmp_path / "xgb_cache"))
+    build_features_chunked(LOOKBACK, window_days=10)
+    matrix, numeric_columns = load_feature_matrix(LOOKBACK)
+    keys = load_feature_keys(LOOKBACK, columns=["date", "channel"])
+    dates = keys["date"].to_numpy(dtype="datetime64[D]")
+
+    result = train_channel_out_of_core(
+        matrix, numeric_columns, dates, (keys["channel"] == "google_ads").to_numpy(), "google_ads",
+        hyperparams={**HYPERPARAMS_XGBOOST, "n_estimators": 10},
+        external_memory=external_memory, chunk_rows=50,
+    )
+    assert result["status"] == "trained"
+    assert result["out_of_core"]["chunks"] > 1
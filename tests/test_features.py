@@ -0,0 +1,68 @@
+"""Tests de paridad entrenamiento / inferencia del FeatureTransformer."""
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from src.modeling.compiled_trees import CompiledForest
+from src.modeling.features import (
+    FeatureTransformer,
+    build_features_dataframe,
+    get_target_column,
+    temporal_train_valid_test_split,
+)
+from src.modeling.predict import load_feature_transformer
+
+
+@pytest.fixture
+def splits(duckdb_backend):
+    df = build_features_dataframe(lookback_days=90)
+    assert not df.empty
+    return temporal_train_valid_test_split(df)
+
+
+def test_json_roundtrip_preserves_transform(splits):
+    train_df, _, test_df = splits
+    transformer = FeatureTransformer().fit(train_df)
+    restored = FeatureTransformer.from_json(transformer.to_json())
+
+    assert restored.features == transformer.features
+    assert restored.clip_upper == transformer.clip_upper
+    np.testing.assert_array_equal(restored.transform(test_df), transformer.transform(test_df))
+
+
+def test_model_attribute_roundtrip_parity(splits, tmp_path):
+    """El transformer guardado con el modelo reproduce la matriz del entrenamiento."""
+    train_df, _, test_df = splits
+    transformer = FeatureTransformer().fit(train_df)
+    X_train = transformer.transform(train_df)
+    X_test = transformer.transform(test_df)
+
+    model = xgb.XGBRegressor(n_estimators=20, max_depth=3, random_state=0)
+    model.fit(X_train, train_df[get_target_column()])
+    model.get_booster().set_attr(feature_transformer=transformer.to_json())
+    model_path = tmp_path / "model.json"
+    model.save_model(str(model_path))
+    forest_path = tmp_path / "model.forest"
+    CompiledForest.load(model_path).save(forest_path)
+
+    for loaded in [CompiledForest.load(model_path), CompiledForest.open(forest_path)]:
+        served = load_feature_transformer(loaded)
+        assert served.clip_upper == transformer.clip_upper
+        np.testing.assert_array_equal(served.transform(test_df), X_test)
+        np.testing.assert_allclose(loaded.predict(served.transform(test_df)), model.predict(X_test), rtol=1e-5, atol=1e-5)
+
+
+def test_clip_limits_learned_from_train_only(splits):
+    train_df, _, test_df = splits
+    transformer = FeatureTransformer().fit(train_df)
+    X_test = transformer.transform(test_df)
+    for col, upper in transformer.clip_upper.items():
+        assert X_test[:, transformer.features.index(col)].max() <= upper
+
+
+def test_ndarray_input_matches_dataframe(splits):
+    train_df, _, _ = splits
+    features = [f for f in FeatureTransformer().features if f != "is_google_ads"]
+    transformer = FeatureTransformer(features).fit(train_df)
+    values = train_df[transformer.input_columns].to_numpy(dtype=np.float64)
+    np.testing.assert_array_equal(transformer.transform(values), transformer.transform(train_df))
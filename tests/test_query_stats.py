@@ -0,0 +1,148 @@
+"""Tests de la etiqueta de vista de las queries (tag_view) y de su registro."""
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pytest
+
+from src.config import settings
+from src.data import bigquery_client
+from src.data.query_stats import QueryStatsRegistry, current_view, tag_view
+from src.data.resilience import CircuitBreaker
+
+
+@tag_view
+def outer_view():
+    return current_view(), inner_view()
+
+
+@tag_view
+def inner_view():
+    return current_view()
+
+
+@tag_view
+def streaming_view(n):
+    for i in range(n):
+        yield i, current_view()
+
+
+def test_outermost_view_wins():
+    assert outer_view() == ("outer_view", "outer_view")
+    assert current_view() == "unknown"
+
+
+def test_generator_tags_each_step():
+    assert list(streaming_view(3)) == [(i, "streaming_view") for i in range(3)]
+    assert current_view() == "unknown"
+
+
+def test_suspended_generator_does_not_leak_tag():
+    gen = streaming_view(3)
+    assert next(gen) == (0, "streaming_view")
+    # Suspendido entre pasos: el llamador ya no esta etiquetado
+    assert current_view() == "unknown"
+    assert inner_view() == "inner_view"
+    del gen
+    assert current_view() == "unknown"
+
+
+def test_generator_inside_outer_view_keeps_outer_tag():
+    @tag_view
+    def consumer():
+        gen = streaming_view(2)
+        first = next(gen)
+        return first, current_view()
+
+    assert consumer() == ((0, "consumer"), "consumer")
+    assert current_view() == "unknown"
+
+
+def test_generator_close_and_throw_reach_inner_generator():
+    closed = []
+
+    @tag_view
+    def guarded():
+        try:
+            while True:
+                try:
+                    yield current_view()
+                except ValueError:
+                    yield "handled"
+        finally:
+            closed.append(current_view())
+
+    gen = guarded()
+    assert next(gen) == "guarded"
+    assert gen.throw(ValueError()) == "handled"
+    gen.close()
+    assert closed == ["guarded"]
+    assert current_view() == "unknown"
+
+    gen = guarded()
+    next(gen)
+    with pytest.raises(KeyError):
+        gen.throw(KeyError("x"))
+
+
+# =============================================================================
+# REGISTRO DE QUERIES POR PARTES
+# =============================================================================
+class FakeRows:
+    def __init__(self, batches):
+        self.batches = batches
+        self.bqstorage_client = "sin llamar"
+
+    def to_arrow_iterable(self, bqstorage_client=None):
+        self.bqstorage_client = bqstorage_client
+        yield from self.batches
+
+
+class FakeJob(SimpleNamespace):
+    def result(self, page_size=None):
+        return self.rows
+
+
+@pytest.fixture
+def streaming_bigquery(monkeypatch):
+    batches = [pa.record_batch({"campaign_id": [f"c{i}"] * 10}) for i in range(5)]
+    job = FakeJob(
+        rows=FakeRows(batches), job_id="job-1", created=None, started=None, ended=None,
+        total_bytes_processed=100, total_bytes_billed=100, slot_millis=5, cache_hit=False,
+    )
+    stats = QueryStatsRegistry()
+    monkeypatch.setattr(settings, "query_backend", "bigquery")
+    monkeypatch.setattr(bigquery_client, "registry", stats)
+    monkeypatch.setattr(bigquery_client, "bq_breaker", CircuitBreaker("bigquery"))
+    monkeypatch.setattr(bigquery_client, "get_bqstorage_client", lambda: None)
+    monkeypatch.setattr(bigquery_client, "get_bigquery_client",
+                        lambda: SimpleNamespace(query=lambda *args, **kwargs: job))
+    return job, stats
+
+
+@tag_view
+def streamed_campaigns(n_chunks: int):
+    chunks = bigquery_client.execute_query_iter("SELECT campaign_id FROM t", chunk_size=10, as_arrow=True)
+    for i, chunk in enumerate(chunks):
+        if i == n_chunks:
+            break
+        yield chunk
+
+
+def test_iter_records_stats_when_consumed(streaming_bigquery):
+    job, stats = streaming_bigquery
+    assert sum(chunk.num_rows for chunk in streamed_campaigns(99)) == 50
+
+    [record] = stats.recent()
+    assert record["source"] == "bigquery" and record["rows"] == 50
+    assert record["view"] == "streamed_campaigns"
+    assert job.rows.bqstorage_client is None
+
+
+def test_iter_records_stats_when_stopped_early(streaming_bigquery):
+    _, stats = streaming_bigquery
+    assert len(list(streamed_campaigns(2))) == 2
+
+    [record] = stats.recent()
+    assert record["source"] == "bigquery" and record["job_id"] == "job-1"
+    assert record["view"] == "streamed_campaigns"
+    assert 20 <= record["rows"] < 50
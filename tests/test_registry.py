@@ -0,0 +1,150 @@
+"""Tests del registro versionado de modelos (promocion, rollback, poda)."""
+import json
+import stat
+import threading
+
+import pytest
+
+from src.config import settings
+from src.modeling import registry
+
+CHANNEL = "google_ads"
+
+
+@pytest.fixture(autouse=True)
+def registry_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "model_registry_dir", str(tmp_path / "registry"))
+    monkeypatch.setattr(settings, "model_registry_keep", 10)
+    return tmp_path / "registry"
+
+
+def _register(tag: str, promote: bool = True, parent_version: str = None) -> str:
+    def write_artifact(path):
+        path.write_bytes(tag.encode())
+
+    return registry.register_model(CHANNEL, "ridge", write_artifact, {"tag": tag}, promote=promote, parent_version=parent_version)
+
+
+def test_register_creates_immutable_version(registry_dir):
+    version = _register("a")
+    manifest = registry.load_manifest(CHANNEL, version)
+
+    assert registry.current_version(CHANNEL) == version
+    assert registry.list_versions(CHANNEL) == [version]
+    assert manifest["tag"] == "a" and manifest["model_type"] == "ridge"
+    assert registry.artifact_path(CHANNEL, version).read_bytes() == b"a"
+    for path in (registry_dir / CHANNEL / version).iterdir():
+        assert not path.stat().st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+
+def test_failed_write_leaves_no_version(registry_dir):
+    _register("a")
+
+    def broken(path):
+        path.write_bytes(b"partial")
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        registry.register_model(CHANNEL, "ridge", broken, {})
+    assert len(registry.list_versions(CHANNEL)) == 1
+    assert not [p for p in (registry_dir / CHANNEL).iterdir() if p.name.startswith(".tmp-")]
+
+
+def test_register_without_promote_keeps_current():
+    a = _register("a")
+    b = _register("b", promote=False)
+    assert registry.current_version(CHANNEL) == a
+    registry.promote_version(CHANNEL, b)
+    assert registry.current_version(CHANNEL) == b
+
+
+def test_promote_unknown_version_fails():
+    _register("a")
+    with pytest.raises(ValueError):
+        registry.promote_version(CHANNEL, "no-existe")
+
+
+def test_rollback_walks_history():
+    a, b, c = _register("a"), _register("b"), _register("c")
+
+    assert registry.rollback(CHANNEL) == b
+    assert registry.current_version(CHANNEL) == b
+    # Un segundo rollback sigue retrocediendo (no vuelve a c)
+    assert registry.rollback(CHANNEL) == a
+    assert registry.current_version(CHANNEL) == a
+    with pytest.raises(ValueError):
+        registry.rollback(CHANNEL)
+
+    stack, rolled_back = registry.promotion_history(CHANNEL)
+    assert stack == [a]
+    assert rolled_back == {b, c}
+
+
+def test_rollback_after_new_promotion():
+    a, b = _register("a"), _register("b")
+    registry.rollback(CHANNEL)
+    c = _register("c")
+
+    # b fue retirada: el rollback desde c vuelve a a
+    assert registry.rollback(CHANNEL) == a
+    # Re-promover una version retirada la vuelve elegible
+    registry.promote_version(CHANNEL, b)
+    registry.promote_version(CHANNEL, c)
+    assert registry.rollback(CHANNEL) == b
+
+
+def test_rollback_skips_pruned_versions():
+    *_, c = [_register(tag) for tag in "abc"]
+    registry.prune_versions(CHANNEL, keep=1)
+
+    assert registry.list_versions(CHANNEL) == [c]
+    with pytest.raises(ValueError):
+        registry.rollback(CHANNEL)
+
+
+def test_rollback_log_entries(registry_dir):
+    _register("a")
+    b = _register("b")
+    a = registry.rollback(CHANNEL)
+
+    with open(registry_dir / CHANNEL / registry.PROMOTIONS_LOG) as f:
+        entries = [json.loads(line) for line in f]
+    assert [entry["rollback"] for entry in entries] == [False, False, True]
+    assert entries[-1]["version"] == a and entries[-1]["previous"] == b
+
+
+def test_prune_protects_active_and_parent():
+    a = _register("a")
+    b = _register("b", parent_version=a)
+    c, d, e = [_register(tag, promote=False) for tag in "cde"]
+
+    # Se conservan las 2 mas recientes; b (activa) y a (su padre) nunca se borran
+    assert registry.prune_versions(CHANNEL, keep=2) == [c]
+    assert registry.list_versions(CHANNEL) == [a, b, d, e]
+
+
+def test_pointer_is_always_a_complete_version(registry_dir):
+    """Los lectores de CURRENT nunca ven un puntero vacio o a medias."""
+    versions = [_register(tag) for tag in "abc"]
+    stop = threading.Event()
+    seen, errors = set(), []
+
+    def reader():
+        while not stop.is_set():
+            version = registry.current_version(CHANNEL)
+            if version not in versions:
+                errors.append(version)
+            seen.add(version)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(200):
+        registry.promote_version(CHANNEL, versions[i % 3])
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert seen <= set(versions)
+    assert not [p for p in (registry_dir / CHANNEL).iterdir() if p.name.startswith(".tmp-")]
@@ -0,0 +1,163 @@
+"""Tests del circuit breaker y de la lectura stale con BigQuery caido."""
+import time
+
+import pandas as pd
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from src.config import settings
+from src.data import bigquery_client
+from src.data.cache import QueryResultCache
+from src.data.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+QUERY = "SELECT campaign_id, cost FROM t"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    return fake
+
+
+def test_breaker_state_transitions(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=30)
+    assert breaker.state == CLOSED
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    # Una sola prueba a la vez
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=30)
+    breaker.before_call()
+    breaker.record_failure()
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+class FakeClient:
+    def __init__(self, error):
+        self.error = error
+
+    def query(self, *args, **kwargs):
+        raise self.error
+
+
+@pytest.fixture
+def bigquery_down(tmp_path, monkeypatch, clock):
+    """BigQuery simulado con un cache de resultados en tmp_path."""
+    breaker = CircuitBreaker("bigquery", failure_threshold=2, reset_seconds=60)
+    cache = QueryResultCache(tmp_path, ttl_seconds=60)
+    monkeypatch.setattr(bigquery_client, "bq_breaker", breaker)
+    monkeypatch.setattr(bigquery_client, "get_query_cache", lambda: cache)
+    monkeypatch.setattr(settings, "query_backend", "bigquery")
+    monkeypatch.setattr(settings, "query_timeout_seconds", 0)
+
+    def fail_with(error):
+        monkeypatch.setattr(bigquery_client, "get_bigquery_client", lambda: FakeClient(error))
+
+    return breaker, cache, fail_with
+
+
+@pytest.mark.parametrize("error", [
+    google_exceptions.ServiceUnavailable("down"),
+    google_exceptions.InternalServerError("boom"),
+    ConnectionError("reset"),
+    TimeoutError("slow"),
+])
+def test_transient_errors_open_breaker(bigquery_down, error):
+    breaker, _, fail_with = bigquery_down
+    fail_with(error)
+    for _ in range(2):
+        with pytest.raises(type(error)):
+            bigquery_client.execute_query(QUERY, use_cache=False)
+    assert breaker.state == OPEN
+
+
+@pytest.mark.parametrize("error", [
+    google_exceptions.BadRequest("syntax error"),
+    google_exceptions.Forbidden("denied"),
+    ValueError("bad param"),
+])
+def test_query_errors_do_not_count(bigquery_down, error):
+    breaker, _, fail_with = bigquery_down
+    fail_with(error)
+    for _ in range(3):
+        with pytest.raises(type(error)):
+            bigquery_client.execute_query(QUERY, use_cache=False)
+    assert breaker.snapshot() == {"name": "bigquery", "state": CLOSED, "consecutive_failures": 0}
+
+
+def test_query_error_releases_half_open_probe(bigquery_down, clock):
+    breaker, _, fail_with = bigquery_down
+    fail_with(google_exceptions.ServiceUnavailable("down"))
+    for _ in range(2):
+        with pytest.raises(google_exceptions.ServiceUnavailable):
+            bigquery_client.execute_query(QUERY, use_cache=False)
+
+    clock.now += 60
+    fail_with(google_exceptions.BadRequest("syntax error"))
+    with pytest.raises(google_exceptions.BadRequest):
+        bigquery_client.execute_query(QUERY, use_cache=False)
+    # La prueba termino: el siguiente llamador puede volver a probar
+    breaker.before_call()
+
+
+def test_serves_stale_while_open(bigquery_down, monkeypatch):
+    breaker, cache, fail_with = bigquery_down
+    cached = pd.DataFrame({"campaign_id": ["c1"], "cost": [10.0]})
+    cache.set(QUERY, cached)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+
+    fail_with(google_exceptions.ServiceUnavailable("down"))
+    for _ in range(2):
+        df = bigquery_client.execute_query(QUERY)
+        assert df.attrs["stale"] is True
+    assert breaker.state == OPEN
+
+    # Con el circuito abierto no se llama a BigQuery y se sigue sirviendo el cache
+    fail_with(AssertionError("BigQuery no deberia consultarse"))
+    df = bigquery_client.execute_query(QUERY)
+    pd.testing.assert_frame_equal(df, cached)
+    assert df.attrs["stale"] is True
+    assert df.attrs["stale_age_seconds"] >= 120
+
+
+def test_open_breaker_without_cache_raises(bigquery_down):
+    breaker, _, fail_with = bigquery_down
+    fail_with(google_exceptions.ServiceUnavailable("down"))
+    for _ in range(2):
+        with pytest.raises(google_exceptions.ServiceUnavailable):
+            bigquery_client.execute_query(QUERY)
+    with pytest.raises(CircuitOpenError):
+        bigquery_client.execute_query(QUERY)
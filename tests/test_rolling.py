@@ -0,0 +1,156 @@
+"""Tests de las features de historial: estado incremental vs calculo completo."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.config import settings
+from src.modeling import predict
+from src.modeling.rolling import (
+    HISTORY_FILE,
+    ROLLING_FEATURES,
+    STATE_FILE,
+    RollingState,
+    compute_rolling_features,
+    load_rolling_state,
+    update_rolling_features,
+)
+
+KEYS = ["date", "campaign_id"]
+
+
+@pytest.fixture
+def daily_df():
+    """80 dias, 6 campanas, dias sin datos y varias filas por (date, campaign_id)."""
+    rng = np.random.default_rng(3)
+    dates = pd.date_range("2024-01-01", periods=80, freq="D")
+    rows = []
+    for date in dates:
+        if date.day == 15:
+            continue  # dia completo sin datos
+        for campaign in range(6):
+            if rng.random() < 0.25:
+                continue
+            for _ in range(rng.integers(1, 3)):
+                cost = float(rng.choice([0.0, rng.gamma(2.0, 20.0)], p=[0.1, 0.9]))
+                rows.append({
+                    "date": date,
+                    "campaign_id": f"c{campaign}",
+                    "impressions": int(rng.integers(100, 5000)),
+                    "clicks": int(rng.integers(0, 100)),
+                    "cost": cost,
+                    "revenue": cost * float(rng.gamma(2.0, 1.5)),
+                })
+    return pd.DataFrame(rows)
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.astype({"campaign_id": str})
+    df["date"] = pd.to_datetime(df["date"]).astype("datetime64[ns]")
+    return df.sort_values(KEYS).reset_index(drop=True)[KEYS + ROLLING_FEATURES]
+
+
+def _step_all(state: RollingState, df: pd.DataFrame) -> pd.DataFrame:
+    daily = df.groupby(KEYS, sort=True)[["impressions", "clicks", "cost", "revenue"]].sum().reset_index()
+    return pd.concat([state.step(day_df) for _, day_df in daily.groupby("date", sort=True)], ignore_index=True)
+
+
+def test_step_from_empty_state_matches_full_computation(daily_df):
+    stepped = _step_all(RollingState(), daily_df)
+    pd.testing.assert_frame_equal(_sorted(stepped), _sorted(compute_rolling_features(daily_df)))
+
+
+def test_step_after_from_daily_matches_full_computation(daily_df):
+    cutoff = pd.Timestamp("2024-02-10")
+    state = RollingState.from_daily(daily_df[daily_df["date"] <= cutoff])
+    stepped = _step_all(state, daily_df[daily_df["date"] > cutoff])
+
+    full = compute_rolling_features(daily_df)
+    expected = full[pd.to_datetime(full["date"]) > cutoff]
+    pd.testing.assert_frame_equal(_sorted(stepped), _sorted(expected))
+
+
+def test_state_save_load_roundtrip(daily_df, tmp_path):
+    state = RollingState.from_daily(daily_df)
+    state.save(tmp_path / "state.npz")
+    loaded = RollingState.load(tmp_path / "state.npz")
+
+    assert loaded.campaign_ids == state.campaign_ids
+    assert loaded.last_day == state.last_day
+    pd.testing.assert_frame_equal(loaded.features_for(state.campaign_ids), state.features_for(state.campaign_ids))
+
+
+def test_step_rejects_processed_day(daily_df):
+    state = RollingState.from_daily(daily_df)
+    last_day = daily_df[daily_df["date"] == daily_df["date"].max()]
+    with pytest.raises(ValueError):
+        state.step(last_day)
+
+
+@pytest.fixture
+def feature_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "feature_store_dir", str(tmp_path))
+    return tmp_path / "rolling"
+
+
+def test_incremental_update_matches_rebuild(daily_df, feature_store):
+    cutoff = pd.Timestamp("2024-02-20")
+    update_rolling_features(daily_df[daily_df["date"] <= cutoff])
+    incremental = update_rolling_features(daily_df)
+    rebuilt = update_rolling_features(daily_df, rebuild=True)
+    pd.testing.assert_frame_equal(_sorted(incremental), _sorted(rebuilt))
+
+
+def test_update_after_empty_state_consumes_all_rows(daily_df, feature_store):
+    # El primer sync no trajo filas: queda un estado sin last_date
+    update_rolling_features(daily_df.iloc[:0])
+    history = update_rolling_features(daily_df)
+    pd.testing.assert_frame_equal(_sorted(history), _sorted(compute_rolling_features(daily_df)))
+
+
+def test_history_is_trimmed_to_input_window(daily_df, feature_store):
+    update_rolling_features(daily_df[daily_df["date"] <= pd.Timestamp("2024-02-20")])
+    window = daily_df[daily_df["date"] >= pd.Timestamp("2024-01-20")]
+    history = update_rolling_features(window)
+
+    full = compute_rolling_features(daily_df)
+    expected = full[pd.to_datetime(full["date"]) >= pd.Timestamp("2024-01-20")]
+    pd.testing.assert_frame_equal(_sorted(history), _sorted(expected))
+    persisted = pd.read_parquet(feature_store / HISTORY_FILE)
+    assert persisted["date"].min() == pd.Timestamp("2024-01-20")
+
+
+@pytest.mark.parametrize("stale_file", [STATE_FILE, HISTORY_FILE])
+def test_update_recovers_from_partial_write(daily_df, feature_store, stale_file):
+    """Un update que murio entre las dos escrituras deja un archivo de la version anterior."""
+    update_rolling_features(daily_df[daily_df["date"] <= pd.Timestamp("2024-02-20")])
+    previous = (feature_store / stale_file).read_bytes()
+    update_rolling_features(daily_df)
+    (feature_store / stale_file).write_bytes(previous)
+
+    history = update_rolling_features(daily_df)
+    assert not history.duplicated(KEYS).any()
+    pd.testing.assert_frame_equal(_sorted(history), _sorted(compute_rolling_features(daily_df)))
+    assert load_rolling_state().last_date == daily_df["date"].max()
+
+
+def test_predict_caches_state_until_file_changes(daily_df, feature_store, monkeypatch):
+    monkeypatch.setattr(settings, "model_reload_interval", 0)
+    loads = []
+    original_load = RollingState.load.__func__
+    monkeypatch.setattr(RollingState, "load", classmethod(lambda cls, path: loads.append(path) or original_load(cls, path)))
+    predict.reset_model_cache()
+    try:
+        assert predict.load_rolling_state_cached().last_day is None
+        update_rolling_features(daily_df[daily_df["date"] <= pd.Timestamp("2024-02-20")])
+        loads.clear()
+
+        first = predict.load_rolling_state_cached()
+        assert first.last_date == pd.Timestamp("2024-02-20")
+        # Sin cambios en el archivo no se vuelve a leer
+        assert predict.load_rolling_state_cached() is first
+        assert len(loads) == 1
+
+        update_rolling_features(daily_df)
+        assert predict.load_rolling_state_cached().last_date == daily_df["date"].max()
+    finally:
+        predict.reset_model_cache()
@@ -0,0 +1,80 @@
+"""Tests de la coalescencia de queries identicas en vuelo (SingleFlight)."""
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src.config import settings
+from src.data import bigquery_client
+
+CALLERS = 8
+
+
+@pytest.fixture
+def slow_fetch(monkeypatch):
+    """Reemplaza el fetch por uno lento que cuenta ejecuciones."""
+    calls = []
+    release = threading.Event()
+
+    def fetch(query, params=None):
+        calls.append(query)
+        release.wait(timeout=5)
+        return pd.DataFrame({"a": [1, 2, 3]})
+
+    monkeypatch.setattr(bigquery_client, "_fetch_dataframe", fetch)
+    monkeypatch.setattr(settings, "query_cache_enabled", False)
+    monkeypatch.setattr(settings, "query_timeout_seconds", 0)
+    return calls, release
+
+
+def _run_concurrently(query, n):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(bigquery_client.execute_query(query))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_identical_calls_execute_once(slow_fetch):
+    calls, release = slow_fetch
+    threads, results, errors = _run_concurrently("SELECT 1", CALLERS)
+
+    # Todos los hilos quedan esperando al lider antes de liberar el fetch
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert not errors
+    assert len(calls) == 1
+    assert len(results) == CALLERS
+    # Cada llamador recibe su propia copia del frame
+    assert len({id(df) for df in results}) == CALLERS
+    for df in results:
+        pd.testing.assert_frame_equal(df, results[0])
+
+
+def test_different_queries_are_not_coalesced(slow_fetch):
+    calls, release = slow_fetch
+    release.set()
+    bigquery_client.execute_query("SELECT 1")
+    bigquery_client.execute_query("SELECT 2")
+    assert len(calls) == 2
+
+
+def test_leader_error_propagates_and_releases_key(slow_fetch, monkeypatch):
+    def failing(query, params=None):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(bigquery_client, "_fetch_dataframe", failing)
+    with pytest.raises(RuntimeError):
+        bigquery_client.execute_query("SELECT 1")
+    assert bigquery_client._inflight.peek(bigquery_client.make_cache_key("SELECT 1")) is None
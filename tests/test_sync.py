@@ -0,0 +1,108 @@
+"""Tests del sync incremental: watermarks, re-estimaciones y lock del store."""
+import threading
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from src.config import settings
+from src.data import sync
+from src.data.views import SOURCE_CHANNELS
+
+from tests.conftest import END_DATE
+
+
+class FakeWarehouse:
+    """Fuentes en memoria que responden a la query de `_daily_facts_query`."""
+
+    def __init__(self, days: int):
+        self.tables = {}
+        for source, channel in SOURCE_CHANNELS.items():
+            dates = pd.date_range(end=pd.Timestamp(END_DATE), periods=days, freq="D")
+            self.tables[source] = pd.DataFrame({
+                "date": dates,
+                "campaign_id": "c1",
+                "campaign_name": "Campana 1",
+                "channel": channel,
+                "campaign_status": "ENABLED",
+                "device": "MOBILE",
+                "impressions": 100,
+                "clicks": 10,
+                "cost": 5.0,
+                "conversions": 1.0,
+                "revenue": 20.0,
+            })
+        self.calls = []
+
+    def execute_query(self, query, params=None, use_cache=True):
+        params = params or {}
+        source = next(s for s in SOURCE_CHANNELS if s in query)
+        self.calls.append((source, params.get("start_date")))
+        df = self.tables[source]
+        if "start_date" in params:
+            df = df[df["date"] >= pd.Timestamp(params["start_date"])]
+        return df.copy()
+
+
+@pytest.fixture
+def warehouse(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "sync_store_dir", str(tmp_path / "store"))
+    monkeypatch.setattr(settings, "sync_restatement_days", 3)
+    fake = FakeWarehouse(days=20)
+    monkeypatch.setattr(sync, "execute_query", fake.execute_query)
+    return fake
+
+
+def test_restated_day_is_replaced_not_duplicated(warehouse):
+    sync.sync_all(force=True)
+    facts = sync.load_daily_facts()
+    assert len(facts) == 40
+    assert all(since is None for _, since in warehouse.calls)
+
+    # Meta re-estima un dia dentro de la ventana de re-estimacion
+    restated = pd.Timestamp(END_DATE - timedelta(days=1))
+    table = warehouse.tables["meta_ads_insights_daily"]
+    table.loc[table["date"] == restated, "revenue"] = 99.0
+
+    sync.sync_all(force=True)
+    facts = sync.load_daily_facts()
+
+    assert len(facts) == 40
+    assert not facts.duplicated(["date", "channel", "campaign_id", "device"]).any()
+    day = facts[(facts["channel"] == "meta_ads") & (facts["date"] == restated)]
+    assert day["revenue"].tolist() == [99.0]
+    # El segundo sync solo pidio los dias desde watermark - SYNC_RESTATEMENT_DAYS
+    expected_since = END_DATE - timedelta(days=3)
+    assert [since for _, since in warehouse.calls[2:]] == [expected_since, expected_since]
+
+
+def test_new_days_advance_watermark(warehouse):
+    sync.sync_all(force=True)
+    for source, table in warehouse.tables.items():
+        extra = table.tail(1).assign(date=table["date"].max() + pd.Timedelta(days=1))
+        warehouse.tables[source] = pd.concat([table, extra], ignore_index=True)
+
+    sync.sync_all(force=True)
+    state = sync.load_state()
+    assert set(state["watermarks"].values()) == {(END_DATE + timedelta(days=1)).isoformat()}
+    assert len(sync.load_daily_facts()) == 42
+
+
+def test_recent_sync_is_skipped(warehouse, monkeypatch):
+    monkeypatch.setattr(settings, "sync_min_interval_seconds", 300)
+    assert len(sync.sync_all()) == 2
+    assert sync.sync_all() == []
+    assert len(warehouse.calls) == 2
+
+
+def test_sync_waits_for_store_lock(warehouse):
+    """Con el lock tomado por otro (flock es por descriptor), sync_all espera."""
+    done = threading.Event()
+    with sync._store_lock():
+        worker = threading.Thread(target=lambda: (sync.sync_all(force=True), done.set()))
+        worker.start()
+        assert not done.wait(0.3)
+        assert warehouse.calls == []
+    worker.join(timeout=10)
+    assert done.is_set()
+    assert len(warehouse.calls) == 2
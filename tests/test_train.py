@@ -0,0 +1,149 @@
+"""Tests del entrenamiento por canal: pool de procesos y actualizacion incremental."""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from src.config import settings
+from src.modeling import registry, train
+from src.modeling.features import FeatureTransformer, build_features_dataframe, get_feature_columns, get_target_column
+from src.modeling.train import HYPERPARAMS_XGBOOST, train_channel_model, train_channels_parallel, train_xgboost, update_channel_model
+
+LOOKBACK = 55
+CHANNELS = ["google_ads", "meta_ads"]
+
+
+@pytest.fixture
+def features_df(duckdb_backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "model_registry_dir", str(tmp_path / "registry"))
+    df = build_features_dataframe(LOOKBACK)
+    assert set(df["channel"].unique()) == set(CHANNELS)
+    return df
+
+
+def test_parallel_training_matches_sequential(features_df):
+    sequential = {channel: train_channel_model(features_df, channel) for channel in CHANNELS}
+    parallel = train_channels_parallel(features_df, CHANNELS, max_workers=2)
+
+    for channel in CHANNELS:
+        expected, result = sequential[channel], parallel[channel]
+        assert result["status"] == expected["status"] == "trained"
+        assert result["best_model"]["name"] == expected["best_model"]["name"]
+        for key in ["xgboost_metrics", "ridge_metrics", "baseline_metrics"]:
+            np.testing.assert_allclose(result[key]["test"]["rmse"], expected[key]["test"]["rmse"], rtol=1e-5, err_msg=key)
+
+        # Cada camino registro y promovio su propia version del canal
+        assert set(registry.list_versions(channel)) == {expected["model_version"], result["model_version"]}
+        assert registry.current_version(channel) == result["model_version"]
+        assert registry.load_manifest(channel, result["model_version"])["model_type"] == result["model_type"]
+
+
+# =============================================================================
+# ACTUALIZACION INCREMENTAL
+# =============================================================================
+CHANNEL = "google_ads"
+HOLDOUT_DAYS = 5
+
+
+def _register_base(df: pd.DataFrame, until: pd.Timestamp) -> str:
+    """Version XGBoost entrenada hasta `until`, con los atributos que deja finalize_channel_model."""
+    df_channel = df[(df["channel"] == CHANNEL) & (df["date"] <= until)]
+    features = [f for f in get_feature_columns() if f != "is_google_ads"]
+    transformer = FeatureTransformer(features).fit(df_channel)
+    X, y = transformer.transform(df_channel), df_channel[get_target_column()].values
+    hyperparams = {**HYPERPARAMS_XGBOOST, "n_estimators": 40}
+    model, _ = train_xgboost(X, y, X, y, hyperparams)
+    model.get_booster().set_attr(
+        feature_transformer=transformer.to_json(),
+        hyperparams=json.dumps(hyperparams),
+        trained_until=str(until.date()),
+        incremental_updates="0",
+    )
+    return registry.register_model(CHANNEL, "xgboost", lambda path: model.save_model(str(path)), {
+        "features": features,
+        "hyperparams": hyperparams,
+        "trained_until": str(until.date()),
+    })
+
+
+def _booster(version: str) -> xgb.Booster:
+    booster = xgb.Booster()
+    booster.load_model(str(registry.artifact_path(CHANNEL, version)))
+    return booster
+
+
+@pytest.fixture
+def incremental(features_df, monkeypatch):
+    """Modelo base sin los ultimos 15 dias; el holdout son los ultimos HOLDOUT_DAYS."""
+    monkeypatch.setattr(settings, "incremental_holdout_days", HOLDOUT_DAYS)
+    monkeypatch.setattr(settings, "incremental_guard", "current")
+    monkeypatch.setattr(settings, "incremental_max_degradation", 10.0)
+    monkeypatch.setattr(train, "train_channel_model", lambda *args, **kwargs: pytest.fail("re-entrenamiento inesperado"))
+    dates = np.sort(features_df.loc[features_df["channel"] == CHANNEL, "date"].unique())
+    base_version = _register_base(features_df, pd.Timestamp(dates[-15]))
+    return base_version, pd.Timestamp(dates[-HOLDOUT_DAYS - 1])
+
+
+@pytest.mark.parametrize("mode", ["continue", "refresh"])
+def test_update_registers_child_version(features_df, incremental, mode):
+    base_version, last_fit_date = incremental
+    base_trees = _booster(base_version).num_boosted_rounds()
+
+    result = update_channel_model(features_df, CHANNEL, mode=mode, extra_rounds=10)
+
+    assert result["status"] == "updated" and result["update"]["mode"] == mode
+    version = result["model_version"]
+    assert version != base_version and registry.current_version(CHANNEL) == version
+    manifest = registry.load_manifest(CHANNEL, version)
+    assert manifest["parent_version"] == base_version
+    assert manifest["trained_until"] == str(last_fit_date.date())
+
+    booster = _booster(version)
+    assert booster.attr("incremental_updates") == "1"
+    assert booster.attr("trained_until") == str(last_fit_date.date())
+    assert booster.num_boosted_rounds() == base_trees + (10 if mode == "continue" else 0)
+
+
+def test_update_without_new_data_is_up_to_date(features_df, incremental):
+    update_channel_model(features_df, CHANNEL)
+    versions = registry.list_versions(CHANNEL)
+
+    result = update_channel_model(features_df, CHANNEL)
+
+    assert result == {"status": "up_to_date", "trained_until": str(incremental[1].date())}
+    assert registry.list_versions(CHANNEL) == versions
+
+
+def test_full_guard_registers_its_reference_model(features_df, incremental, monkeypatch):
+    monkeypatch.setattr(settings, "incremental_guard", "full")
+    # Ninguna actualizacion pasa el guard: se registra el modelo completo del guard
+    monkeypatch.setattr(settings, "incremental_max_degradation", -1.0)
+    base_version, last_fit_date = incremental
+
+    result = update_channel_model(features_df, CHANNEL, mode="continue")
+
+    assert result["status"] == "updated"
+    assert result["update"]["mode"] == "full_retrain"
+    manifest = registry.load_manifest(CHANNEL, result["model_version"])
+    assert manifest["parent_version"] is None
+    assert registry.current_version(CHANNEL) == result["model_version"]
+
+    booster = _booster(result["model_version"])
+    assert booster.num_boosted_rounds() == 40  # el modelo del guard, no el base + arboles extra
+    assert booster.attr("incremental_updates") == "0"
+    assert booster.attr("trained_until") == str(last_fit_date.date())
+    assert booster.attr("feature_transformer") is not None
+
+
+def test_current_guard_falls_back_to_full_training(features_df, incremental, monkeypatch):
+    monkeypatch.setattr(settings, "incremental_max_degradation", -1.0)
+    calls = []
+    monkeypatch.setattr(train, "train_channel_model", lambda df, channel: calls.append(channel) or {"status": "trained"})
+
+    result = update_channel_model(features_df, CHANNEL, mode="continue")
+
+    assert calls == [CHANNEL]
+    assert result["update"]["mode"] == "full_retrain"
+    assert len(registry.list_versions(CHANNEL)) == 1
@@ -0,0 +1,35 @@
+"""Tests del shim de dialecto BigQuery -> DuckDB (translate_sql)."""
+from src.data.duckdb_backend import execute_arrow, translate_sql
+
+
+def test_table_reference_is_unqualified():
+    sql = "SELECT * FROM `my-project.dataset.gads_campaign`"
+    assert translate_sql(sql) == "SELECT * FROM gads_campaign"
+
+
+def test_safe_offset_becomes_one_based_index():
+    sql = "SELECT arr[SAFE_OFFSET(0)], arr[ safe_offset( 2 ) ] FROM t"
+    assert translate_sql(sql) == "SELECT arr[1], arr[3] FROM t"
+
+
+def test_int64_and_float64_types():
+    sql = "SELECT CAST(a AS INT64), CAST(b AS float64), my_int64_col FROM t"
+    assert translate_sql(sql) == "SELECT CAST(a AS BIGINT), CAST(b AS DOUBLE), my_int64_col FROM t"
+
+
+def test_in_unnest_and_params():
+    sql = "SELECT * FROM t WHERE id IN UNNEST(@ids) AND d >= @start_date"
+    assert translate_sql(sql) == "SELECT * FROM t WHERE id IN (SELECT UNNEST($ids)) AND d >= $start_date"
+
+
+def test_translated_sql_runs_on_duckdb(duckdb_backend):
+    sql = """
+        SELECT
+            [10, 20][SAFE_OFFSET(1)] AS second,
+            [10, 20][SAFE_OFFSET(5)] AS missing,
+            CAST('7' AS INT64) AS n,
+            3 IN UNNEST(@ids) AS found,
+            SAFE_DIVIDE(1, 0) AS ratio
+    """
+    row = execute_arrow(sql, {"ids": [1, 2, 3]}).to_pylist()[0]
+    assert row == {"second": 20, "missing": None, "n": 7, "found": True, "ratio": None}
@@ -0,0 +1,107 @@
+"""Tests de la busqueda de hiperparametros: folds temporales, poda y resultado."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.modeling.train import HYPERPARAMS_XGBOOST
+from src.modeling.tuning import MIN_TRAIN_DAYS, PARAM_SPACE, MedianPruner, rolling_origin_folds, search_hyperparameters
+
+FEATURES = ["impressions", "clicks", "cost", "ctr", "cpc", "day_of_week", "log_cost"]
+
+
+@pytest.fixture
+def synthetic_df():
+    """60 dias x 10 filas con un ROAS que depende de ctr y cpc."""
+    rng = np.random.default_rng(11)
+    dates = np.repeat(pd.date_range("2024-01-01", periods=60, freq="D"), 10)
+    n = len(dates)
+    impressions = rng.integers(500, 5000, n)
+    clicks = rng.binomial(impressions, rng.uniform(0.01, 0.05, n))
+    cost = clicks * rng.uniform(0.2, 1.5, n)
+    ctr = clicks / impressions
+    roas = np.clip(50 * ctr + 2 / (1 + cost / np.maximum(clicks, 1)) + rng.normal(0, 0.2, n), 0, None)
+    return pd.DataFrame({
+        "date": dates,
+        "impressions": impressions,
+        "clicks": clicks,
+        "cost": cost,
+        "day_of_week": dates.dayofweek + 1,
+        "month": dates.month,
+        "roas": roas,
+    })
+
+
+# =============================================================================
+# FOLDS
+# =============================================================================
+@pytest.mark.parametrize("n_folds,horizon", [(3, None), (4, 7), (10, 5)])
+def test_rolling_origin_folds_never_validate_on_the_past(synthetic_df, n_folds, horizon):
+    dates = synthetic_df["date"]
+    folds = rolling_origin_folds(dates, n_folds, horizon)
+    assert 0 < len(folds) <= n_folds
+
+    first_valid_dates = []
+    for train_mask, valid_mask in folds:
+        assert train_mask.any() and valid_mask.any()
+        assert not (train_mask & valid_mask).any()
+        first_valid = dates[valid_mask].min()
+        assert dates[train_mask].max() < first_valid
+        assert dates[train_mask].nunique() >= MIN_TRAIN_DAYS
+        first_valid_dates.append(first_valid)
+
+    # Los cortes avanzan hacia el presente y el ultimo fold valida con el ultimo dia
+    assert first_valid_dates == sorted(set(first_valid_dates))
+    assert dates[folds[-1][1]].max() == dates.max()
+
+
+def test_rolling_origin_folds_require_enough_dates(synthetic_df):
+    dates = synthetic_df.loc[synthetic_df["date"] < pd.Timestamp("2024-01-10"), "date"]
+    with pytest.raises(ValueError):
+        rolling_origin_folds(dates, n_folds=3)
+
+
+# =============================================================================
+# PODA
+# =============================================================================
+def test_median_pruner_waits_for_startup_trials():
+    pruner = MedianPruner(n_startup_trials=3)
+    # Aunque cada valor empeore, los primeros trials de cada paso no se podan
+    assert [pruner.should_prune(0, value) for value in [1.0, 2.0, 3.0]] == [False, False, False]
+    assert not pruner.should_prune(1, 100.0)
+
+
+def test_median_pruner_prunes_above_median():
+    pruner = MedianPruner(n_startup_trials=3)
+    for value in [1.0, 2.0, 3.0]:
+        pruner.should_prune(0, value)
+
+    assert pruner.should_prune(0, 2.5)  # mediana 2.0
+    assert not pruner.should_prune(0, 1.5)  # mediana 2.25 tras registrar 2.5
+    assert not pruner.should_prune(0, 2.0)  # igual a la mediana: sigue
+    # Cada paso tiene su propia historia
+    assert not pruner.should_prune(1, 2.5)
+
+
+# =============================================================================
+# BUSQUEDA
+# =============================================================================
+def test_search_never_worse_than_base_params(synthetic_df):
+    result = search_hyperparameters(synthetic_df, FEATURES, HYPERPARAMS_XGBOOST, n_trials=6, n_folds=3, max_workers=2)
+
+    assert result["folds"] == 3 and result["trials"] == 6
+    assert result["completed"] + result["pruned"] == 6
+    # El trial 0 es la configuracion base y siempre completa todos los folds
+    assert result["base_cv_rmse"] is not None
+    assert result["best_cv_rmse"] <= result["base_cv_rmse"]
+    assert result["top_trials"][0]["trial"] == result["best_trial"]
+    assert set(PARAM_SPACE) | {"n_estimators"} <= set(result["best_params"])
+    assert result["best_params"]["n_estimators"] >= 1
+
+
+def test_search_with_single_trial_returns_base_params(synthetic_df):
+    result = search_hyperparameters(synthetic_df, FEATURES, HYPERPARAMS_XGBOOST, n_trials=1, n_folds=3, max_workers=1)
+
+    assert result["best_trial"] == 0
+    assert result["best_cv_rmse"] == result["base_cv_rmse"]
+    for name in PARAM_SPACE:
+        assert result["best_params"][name] == HYPERPARAMS_XGBOOST[name]
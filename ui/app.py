@@ -5,7 +5,8 @@ Dashboard ejecutivo para análisis de campañas
 import streamlit as st
 import pandas as pd
 from src.agent.agent import ask
-from src.data.views import get_channel_summary, get_campaign_performance_monthly
+from src.data.resilience import collect_staleness, staleness_marker
+from src.data.views import get_channel_summary, get_campaign_performance_monthly, get_channel_kpis_daily
 from src.modeling.predict import get_prediction_summary, get_top_campaigns_by_predicted_roas
 
 # =============================================================================
@@ -205,11 +206,18 @@ st.markdown("""
 # =============================================================================
 # FUNCIONES AUXILIARES
 # =============================================================================
+def with_staleness(loader, *args, **kwargs):
+    """Ejecuta un loader y marca en df.attrs si uso datos stale del cache."""
+    with collect_staleness() as stale_reads:
+        df = loader(*args, **kwargs)
+    df.attrs.update(staleness_marker(stale_reads))
+    return df
+
 @st.cache_data(ttl=300)
 def load_channel_data():
     """Carga datos de canales con cache."""
     try:
-        return get_channel_summary()
+        return with_staleness(get_channel_summary)
     except Exception as e:
         return pd.DataFrame()
 
@@ -217,7 +225,7 @@ def load_channel_data():
 def load_top_campaigns():
     """Carga top campañas con cache."""
     try:
-        return get_top_campaigns_by_predicted_roas(top_n=5)
+        return with_staleness(get_top_campaigns_by_predicted_roas, top_n=5)
     except Exception as e:
         return pd.DataFrame()
 
@@ -225,7 +233,15 @@ def load_top_campaigns():
 def load_monthly_performance():
     """Carga rendimiento mensual con cache."""
     try:
-        return get_campaign_performance_monthly()
+        return with_staleness(get_campaign_performance_monthly)
+    except Exception as e:
+        return pd.DataFrame()
+
+@st.cache_data(ttl=300)
+def load_channel_kpis_daily(days: int = 30):
+    """Carga KPIs diarios por canal (agregados en la query) con cache."""
+    try:
+        return with_staleness(get_channel_kpis_daily, days=days)
     except Exception as e:
         return pd.DataFrame()
 
@@ -253,6 +269,10 @@ st.markdown("""
 # =============================================================================
 channel_data = load_channel_data()
 
+if channel_data.attrs.get("stale"):
+    minutes = channel_data.attrs["stale_age_seconds"] / 60
+    st.warning(f"BigQuery no responde: mostrando datos de hace {minutes:.0f} min. Se actualizarán automáticamente.")
+
 if not channel_data.empty:
     col1, col2, col3, col4 = st.columns(4)
     
@@ -430,6 +450,18 @@ with tab2:
                 }
                 for label, value in metrics_meta.items():
                     st.markdown(f"**{label}:** {value}")
+        
+        kpis_daily = load_channel_kpis_daily()
+        if not kpis_daily.empty:
+            st.markdown("#### Evolución diaria (últimos 30 días)")
+            kpis_daily = kpis_daily.astype({"channel": str})
+            col_roas, col_cost = st.columns(2)
+            with col_roas:
+                st.markdown("**ROAS**")
+                st.line_chart(kpis_daily.pivot(index="date", columns="channel", values="roas"))
+            with col_cost:
+                st.markdown("**Inversión**")
+                st.line_chart(kpis_daily.pivot(index="date", columns="channel", values="cost"))
 
 # -----------------------------------------------------------------------------
 # TAB 3: TOP CAMPAÑAS